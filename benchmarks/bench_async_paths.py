@@ -0,0 +1,189 @@
+"""
+Сравнение блокирующего (до) и асинхронного (после) пути данных для
+redirect / stats / search под конкурентной нагрузкой.
+
+"До" — копия прежних обработчиков: async def поверх синхронных Session и
+redis.Redis. "После" — рабочие обработчики из src/links.py на AsyncSession и
+redis.asyncio. Оба приложения гоняются в одном процессе через ASGITransport,
+так что любой блокирующий вызов останавливает весь event loop, как в воркере.
+
+    python -m benchmarks.bench_async_paths --links 10000 --requests 5000 \\
+        --concurrency 100 --db-latency-ms 2
+
+Нужен запущенный Redis (REDIS_URL из src/redis_client.py).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.database import get_db, get_async_db
+from src.links import cache_key_redirect, cache_key_search, cache_key_stats
+from src.main import app
+from src.models import Link
+from src.redis_client import redis_client, DEFAULT_EXPIRE
+from benchmarks.common import make_sessions, seed_links, summarize, temp_database
+
+
+def build_legacy_app(session_factory) -> FastAPI:
+    legacy = FastAPI()
+
+    def legacy_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @legacy.get("/links/{short_code}")
+    async def redirect_link(short_code: str, db: Session = Depends(legacy_get_db)):
+        cached_url = redis_client.get(cache_key_redirect(short_code))
+        if cached_url:
+            return {"Redirect": cached_url.decode()}
+        link = db.query(Link).filter(
+            (Link.short_code == short_code) & (Link.is_active == True)
+        ).first()
+        if not link:
+            raise HTTPException(status_code=404, detail="Link not found")
+        redis_client.setex(cache_key_redirect(short_code), DEFAULT_EXPIRE, link.original_url)
+        link.clicks += 1
+        db.commit()
+        return {"Redirect": link.original_url}
+
+    @legacy.get("/links/{short_code}/stats")
+    async def get_link_stats(short_code: str, db: Session = Depends(legacy_get_db)):
+        cached_stats = redis_client.get(cache_key_stats(short_code))
+        if cached_stats:
+            return json.loads(cached_stats)
+        link = db.query(Link).filter_by(short_code=short_code).first()
+        if not link:
+            raise HTTPException(status_code=404, detail="Link not found")
+        stats_data = {"original_url": link.original_url, "clicks": link.clicks}
+        redis_client.setex(cache_key_stats(short_code), 60, json.dumps(stats_data))
+        return stats_data
+
+    @legacy.get("/links/search/")
+    async def search_links(original_url: str, db: Session = Depends(legacy_get_db)):
+        cached_result = redis_client.get(cache_key_search(original_url))
+        if cached_result:
+            return json.loads(cached_result)
+        links = db.query(Link).filter(Link.original_url == original_url).all()
+        result = [{"short_code": link.short_code} for link in links]
+        redis_client.setex(cache_key_search(original_url), DEFAULT_EXPIRE, json.dumps(result))
+        return result
+
+    return legacy
+
+
+def add_db_latency(engine, latency: float):
+    # Имитация медленного запроса: sleep выполняется там же, где и сам запрос
+    if latency <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def slow_query(*args):
+        time.sleep(latency)
+
+
+async def run_load(asgi_app, paths: list[str], concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=asgi_app)
+    latencies: dict[str, list[float]] = {}
+    queue = list(paths)
+    random.shuffle(queue)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            while queue:
+                path = queue.pop()
+                endpoint = "search" if "search" in path else "stats" if path.endswith("/stats") else "redirect"
+                start = time.perf_counter()
+                await client.get(path)
+                latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    result = {name: summarize(values, elapsed) for name, values in latencies.items()}
+    result["total"] = summarize([v for values in latencies.values() for v in values], elapsed)
+    return result
+
+
+def build_paths(codes: list[str], total: int) -> list[str]:
+    paths = []
+    for _ in range(total):
+        roll = random.random()
+        code = random.choice(codes)
+        if roll < 0.7:
+            paths.append(f"/links/{code}")
+        elif roll < 0.9:
+            paths.append(f"/links/{code}/stats")
+        else:
+            paths.append(f"/links/search/?original_url=https://example.com/{random.randrange(1000)}")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--warmup", type=int, default=500, help="запросов на прогрев пулов")
+    parser.add_argument("--json", help="куда сохранить результаты")
+    args = parser.parse_args()
+
+    sync_url, async_url = temp_database()
+    # Пул под конкурентность: иначе "до" упирается в ожидание соединения прямо в event loop
+    engine, session_factory, async_engine, async_session_factory = make_sessions(
+        sync_url, async_url, pool_size=args.concurrency
+    )
+    codes = seed_links(engine, args.links)
+    add_db_latency(engine, args.db_latency_ms / 1000)
+    add_db_latency(async_engine.sync_engine, args.db_latency_ms / 1000)
+
+    async def bench_get_async_db():
+        async with async_session_factory() as db:
+            yield db
+
+    def bench_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = bench_get_db
+    app.dependency_overrides[get_async_db] = bench_get_async_db
+
+    paths = build_paths(codes, args.requests)
+
+    async def run_all():
+        results = {}
+        for name, asgi_app in (("before", build_legacy_app(session_factory)), ("after", app)):
+            redis_client.flushdb()
+            await run_load(asgi_app, build_paths(codes, args.warmup), args.concurrency)
+            redis_client.flushdb()
+            results[name] = await run_load(asgi_app, paths, args.concurrency)
+        await async_engine.dispose()
+        return results
+
+    results = asyncio.run(run_all())
+
+    print(f"{'mode':<8}{'endpoint':<10}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        for endpoint, summary in sorted(result.items()):
+            print(f"{name:<8}{endpoint:<10}{summary['throughput_rps']:>10}"
+                  f"{summary['p50_ms']:>10}{summary['p99_ms']:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
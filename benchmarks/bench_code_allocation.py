@@ -0,0 +1,123 @@
+"""
+Пропускная способность создания ссылок при 1M / 10M / 100M существующих
+записей: прежний цикл generate_short_code + SELECT против аренды блоков ID
+в CodeAllocator.
+
+База наполняется случайными 6-символьными кодами (так их выдавал прежний
+генератор) и дозаполняется до следующего размера, поэтому размеры идут по
+возрастанию. 100M строк в SQLite — это десятки минут и ~10 ГБ на диске.
+
+    python -m benchmarks.bench_code_allocation --sizes 1000000,10000000 --creates 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import string
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from src.allocator import CodeAllocator
+from src.models import Link
+from src.utils import generate_short_code
+from benchmarks.common import Timer, make_sessions, temp_database
+
+ALPHABET = string.ascii_letters + string.digits
+
+
+def seed_random_codes(path: str, start: int, stop: int, chunk: int = 200_000):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    now = datetime.utcnow().isoformat(sep=" ")
+    for offset in range(start, stop, chunk):
+        rows = [
+            ("".join(random.choices(ALPHABET, k=6)), f"https://example.com/{i}", now, 0, 1)
+            for i in range(offset, min(stop, offset + chunk))
+        ]
+        conn.executemany(
+            "INSERT OR IGNORE INTO links (short_code, original_url, created_at, clicks, is_active) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+    conn.close()
+
+
+async def create_with_retry_loop(session_factory, creates: int) -> dict:
+    queries = 0
+    with Timer() as timer:
+        for i in range(creates):
+            async with session_factory() as db:
+                short_code = generate_short_code()
+                queries += 1
+                while (await db.execute(select(Link.id).filter_by(short_code=short_code))).first():
+                    short_code = generate_short_code()
+                    queries += 1
+                db.add(Link(original_url=f"https://bench.example/{i}", short_code=short_code))
+                await db.commit()
+    return {"creates_per_sec": round(creates / timer.elapsed, 1), "existence_queries": queries}
+
+
+async def create_with_allocator(session_factory, engine, creates: int) -> dict:
+    allocator = CodeAllocator()
+    retries = 0
+    with Timer() as timer:
+        for i in range(creates):
+            async with session_factory() as db:
+                db_link = Link(
+                    original_url=f"https://bench.example/{i}",
+                    short_code=(await allocator.allocate(engine))[0]
+                )
+                while True:
+                    db.add(db_link)
+                    try:
+                        await db.commit()
+                        break
+                    except IntegrityError:
+                        await db.rollback()
+                        retries += 1
+                        db_link.short_code = (await allocator.allocate(engine))[0]
+    return {"creates_per_sec": round(creates / timer.elapsed, 1), "collision_retries": retries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000000,10000000,100000000")
+    parser.add_argument("--creates", type=int, default=2000)
+    parser.add_argument("--json", help="куда сохранить результаты")
+    args = parser.parse_args()
+
+    sync_url, async_url = temp_database("allocation.db")
+    engine, _, async_engine, async_session_factory = make_sessions(sync_url, async_url)
+    path = sync_url.removeprefix("sqlite:///")
+
+    results = {}
+    seeded = 0
+    for size in sorted(int(value) for value in args.sizes.split(",")):
+        with Timer() as seed_timer:
+            seed_random_codes(path, seeded, size)
+        seeded = size
+
+        async def measure():
+            return {
+                "retry_loop": await create_with_retry_loop(async_session_factory, args.creates),
+                "allocator": await create_with_allocator(async_session_factory, async_engine, args.creates),
+            }
+
+        results[size] = asyncio.run(measure())
+        results[size]["seed_seconds"] = round(seed_timer.elapsed, 1)
+        print(f"{size:>12,} links: retry loop {results[size]['retry_loop']['creates_per_sec']:>8}/s, "
+              f"allocator {results[size]['allocator']['creates_per_sec']:>8}/s")
+
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
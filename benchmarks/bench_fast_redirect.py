@@ -0,0 +1,140 @@
+"""
+Пропускная способность редиректа одного воркера с быстрым путём
+(src/fast_redirect.py) и без него — через полный роутинг FastAPI.
+
+Запросы подаются прямо в ASGI-приложение, без HTTP-сервера и клиента:
+меряется работа самого воркера на запрос. Кэш прогревается заранее;
+сценарий l1 — попадания в L1, redis — L1 отключён и URL каждый раз
+читается из Redis. Клики записываются в Redis в обоих режимах.
+
+    python -m benchmarks.bench_fast_redirect --links 1000 --requests 20000 --concurrency 50
+    python -m benchmarks.bench_fast_redirect --status 302 --json fast-redirect.json
+
+Нужен запущенный Redis (REDIS_URL из src/redis_client.py).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from src import fast_redirect, links
+from src.database import get_async_db
+from src.local_cache import redirect_cache
+from src.main import app
+from src.redis_client import redis_client
+from benchmarks.common import make_sessions, seed_links, summarize, temp_database
+
+
+def request_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"user-agent", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def call(path: str) -> int:
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(request_scope(path), receive, send)
+    return status
+
+
+async def run_load(paths: list[str], concurrency: int) -> dict:
+    queue = list(paths)
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            path = queue.pop()
+            start = time.perf_counter()
+            status = await call(path)
+            latencies.append(time.perf_counter() - start)
+            if status != links.REDIRECT_STATUS:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result["errors"] = errors
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--status", type=int, default=links.REDIRECT_STATUS, help="REDIRECT_STATUS for the run")
+    parser.add_argument("--json", help="куда сохранить результаты")
+    args = parser.parse_args()
+
+    sync_url, async_url = temp_database()
+    engine, _, async_engine, async_session_factory = make_sessions(sync_url, async_url)
+    codes = seed_links(engine, args.links)
+
+    async def bench_get_async_db():
+        async with async_session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = bench_get_async_db
+    links.REDIRECT_STATUS = args.status
+    paths = [f"/links/{random.choice(codes)}" for _ in range(args.requests)]
+
+    async def run_all():
+        redis_client.flushdb()
+        # Прогрев: каждый код один раз через обработчик, дальше он в Redis
+        for code in codes:
+            await call(f"/links/{code}")
+        results = {}
+        l1_maxsize = redirect_cache.maxsize
+        for scenario in ("l1", "redis"):
+            # maxsize 0: set() тут же вытесняет запись, каждый запрос идёт в Redis
+            redirect_cache.maxsize = l1_maxsize if scenario == "l1" else 0
+            for mode, enabled in (("route", False), ("fast", True)):
+                fast_redirect.FAST_REDIRECT_ENABLED = enabled
+                await run_load(paths[:len(paths) // 10], args.concurrency)
+                results[f"{scenario}/{mode}"] = await run_load(paths, args.concurrency)
+            route = results[f"{scenario}/route"]["throughput_rps"]
+            fast = results[f"{scenario}/fast"]["throughput_rps"]
+            results[f"{scenario}/speedup"] = round(fast / route, 2) if route else None
+        redirect_cache.maxsize = l1_maxsize
+        await async_engine.dispose()
+        return results
+
+    results = asyncio.run(run_all())
+    engine.dispose()
+
+    print(f"{'scenario':<14}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, summary in results.items():
+        if name.endswith("/speedup"):
+            print(f"{name:<14}{summary:>10}x")
+        else:
+            print(f"{name:<14}{summary['throughput_rps']:>10}{summary['p50_ms']:>10}{summary['p99_ms']:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
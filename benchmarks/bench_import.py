@@ -0,0 +1,77 @@
+"""
+Скорость импорта ссылок (src/importer.py) во временную SQLite-базу:
+генерируется файл CSV или NDJSON, затем он импортируется при каждой
+политике конфликтов. Для skip и overwrite файл импортируется второй раз
+поверх уже загруженных строк.
+
+    python -m benchmarks.bench_import --rows 200000 --format csv --chunk-size 5000
+
+Нужен запущенный Redis (REDIS_URL из src/redis_client.py).
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from src import importer
+from src.redis_client import redis_client
+from benchmarks.common import make_sessions, temp_database
+
+
+def write_inventory(path: str, rows: int, import_format: str, prefix: str = "imp"):
+    expires_at = (datetime.utcnow() + timedelta(days=30)).isoformat()
+    with open(path, "w", newline="") as output:
+        if import_format == "csv":
+            writer = csv.writer(output)
+            writer.writerow(["short_code", "original_url", "expires_at", "clicks"])
+            for i in range(rows):
+                writer.writerow([f"{prefix}{i}", f"https://example.com/page/{i % 5000}", expires_at, i % 7])
+        else:
+            for i in range(rows):
+                output.write(json.dumps({
+                    "short_code": f"{prefix}{i}",
+                    "original_url": f"https://example.com/page/{i % 5000}",
+                    "expires_at": expires_at,
+                    "clicks": i % 7,
+                }) + "\n")
+
+
+async def run_import(session_factory, path: str, import_format: str, on_conflict: str, chunk_size: int) -> dict:
+    async with session_factory() as db:
+        report = await importer.import_links(
+            db,
+            importer.read_file_lines(path),
+            import_format,
+            on_conflict,
+            chunk_size=chunk_size
+        )
+    stats = report.stats()
+    return {key: stats[key] for key in ("rows", "inserted", "updated", "skipped", "elapsed_s", "rows_per_s")}
+
+
+async def main(args):
+    path = os.path.join(tempfile.mkdtemp(prefix="shortener-import-"), f"links.{args.format}")
+    write_inventory(path, args.rows, args.format)
+
+    results = {}
+    for on_conflict, passes in (("skip", 2), ("overwrite", 2), ("fail", 1)):
+        redis_client.flushall()
+        sync_url, async_url = temp_database()
+        engine, _, async_engine, async_sessions = make_sessions(sync_url, async_url)
+        for attempt in range(passes):
+            name = on_conflict if attempt == 0 else f"{on_conflict} (existing rows)"
+            results[name] = await run_import(async_sessions, path, args.format, on_conflict, args.chunk_size)
+        await async_engine.dispose()
+        engine.dispose()
+
+    print(json.dumps({"rows": args.rows, "format": args.format, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--format", choices=importer.FORMATS, default="csv")
+    parser.add_argument("--chunk-size", type=int, default=importer.IMPORT_CHUNK_SIZE)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""
+Пропускная способность /auth/login в зависимости от стоимости bcrypt и
+размера пула процессов (src/passwords.py). Параллельно с входами идут
+редиректы из L1 — их задержка показывает, не мешает ли хеширование
+остальному трафику воркера. Отклонённые по переполнению очереди запросы
+(503) считаются отдельно.
+
+    python -m benchmarks.bench_login --rounds 10,12 --pool-sizes 1,2,4 --logins 200
+
+Нужен запущенный Redis (REDIS_URL из src/redis_client.py).
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from sqlalchemy import insert
+from src import passwords
+from src.database import get_async_db
+from src.main import app
+from src.models import User
+from src.redis_client import redis_client
+from benchmarks.common import make_sessions, seed_links, summarize, temp_database
+
+
+async def run_load(client, logins: int, concurrency: int, code: str) -> dict:
+    login_latencies, redirect_latencies = [], []
+    shed = 0
+    remaining = list(range(logins))
+
+    async def login_worker():
+        nonlocal shed
+        while remaining:
+            i = remaining.pop()
+            start = time.perf_counter()
+            response = await client.post("/auth/login", data={
+                "username": f"user{i % 50}@bench.example",
+                "password": "password123"
+            })
+            if response.status_code == 503:
+                shed += 1
+            else:
+                login_latencies.append(time.perf_counter() - start)
+
+    async def redirect_worker():
+        while remaining:
+            start = time.perf_counter()
+            await client.get(f"/links/{code}")
+            redirect_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.001)
+
+    start = time.perf_counter()
+    await asyncio.gather(redirect_worker(), *(login_worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "login": summarize(login_latencies, elapsed),
+        "redirect": summarize(redirect_latencies, elapsed),
+        "shed": shed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", default="10,12")
+    parser.add_argument("--pool-sizes", default="1,2,4")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--json", help="куда сохранить результаты")
+    args = parser.parse_args()
+
+    sync_url, async_url = temp_database("login.db")
+    engine, _, async_engine, async_session_factory = make_sessions(sync_url, async_url, pool_size=args.concurrency)
+    code = seed_links(engine, 1)[0]
+
+    async def bench_get_async_db():
+        async with async_session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = bench_get_async_db
+
+    async def run_all():
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for rounds in (int(value) for value in args.rounds.split(",")):
+                # Хеши с нужной стоимостью, чтобы вход не тратил время на апгрейд
+                hashed = passwords.hash_password_sync("password123", rounds)
+                with engine.begin() as conn:
+                    conn.execute(User.__table__.delete())
+                    conn.execute(insert(User.__table__), [
+                        {"email": f"user{i}@bench.example", "hashed_password": hashed, "is_active": True}
+                        for i in range(50)
+                    ])
+                passwords.BCRYPT_ROUNDS = rounds
+                for pool_size in (int(value) for value in args.pool_sizes.split(",")):
+                    passwords.shutdown_executor()
+                    passwords.HASH_POOL_SIZE = pool_size
+                    result = await run_load(client, args.logins, args.concurrency, code)
+                    results[f"rounds={rounds},pool={pool_size}"] = result
+                    print(f"rounds {rounds:>3} pool {pool_size:>3}: "
+                          f"{result['login']['throughput_rps']:>8} logins/s, "
+                          f"login p99 {result['login']['p99_ms']:>9} ms, "
+                          f"redirect p99 {result['redirect']['p99_ms']:>8} ms, shed {result['shed']}")
+        passwords.shutdown_executor()
+        await async_engine.dispose()
+        return results
+
+    redis_client.flushdb()
+    results = asyncio.run(run_all())
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Микробенчмарки горячих функций сервиса с отслеживанием регрессий.
+
+run замеряет каждый случай (время на вызов: медиана и минимум по повторам)
+и сохраняет результат в JSON; ORM-запросы редиректа идут к временной
+SQLite-базе, наполненной --links ссылками. compare сравнивает результат с
+сохранённым эталоном и завершается с кодом 1, если какой-то случай
+замедлился больше порога.
+
+    python -m benchmarks.bench_micro run --output benchmarks/results/micro.json
+    python -m benchmarks.bench_micro run --save-baseline
+    python -m benchmarks.bench_micro compare benchmarks/results/micro.json --threshold 0.15
+    python -m benchmarks.bench_micro run --filter jwt --compare benchmarks/results/micro_baseline.json
+
+Redis не нужен.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+import pydantic
+import sqlalchemy
+from jose import jwt
+from src import admission, metrics, profiler
+from src.links import active_link_query, cache_key_search
+from src.schemas import LinkCreate, LinkStats
+from src.security import ALGORITHM, SECRET_KEY, create_access_token
+from src.utils import generate_short_code, handle_expiration
+from benchmarks.common import make_sessions, seed_links, temp_database
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "micro_baseline.json")
+DEFAULT_THRESHOLD = 0.15
+
+cases: dict[str, Callable] = {}
+async_cases: dict[str, Callable] = {}
+
+
+def case(name: str):
+    def register(fn):
+        cases[name] = fn
+        return fn
+    return register
+
+
+def async_case(name: str):
+    # Цикл замера крутится внутри корутины: run_until_complete на каждый
+    # вызов мерил бы event loop, а не запрос
+    def register(fn):
+        async_cases[name] = fn
+        return fn
+    return register
+
+
+future = datetime.utcnow() + timedelta(days=30)
+link_payload = {
+    "original_url": "https://example.com/some/path?utm_source=bench",
+    "custom_alias": "bench-alias",
+    "expires_at": future.isoformat(),
+}
+link_payload_json = json.dumps(link_payload)
+stats_payload = {
+    "original_url": "https://example.com/some/path",
+    "created_at": datetime.utcnow().isoformat(),
+    "clicks": 42,
+    "unique_visitors": 17,
+    "last_accessed": datetime.utcnow().isoformat(),
+    "expires_at": future.isoformat(),
+}
+token = create_access_token({"sub": "bench@example.com"})
+request_stats = metrics.RequestStats()
+
+
+@case("utils.generate_short_code")
+def bench_generate_short_code():
+    generate_short_code()
+
+
+@case("utils.handle_expiration.default")
+def bench_handle_expiration_default():
+    handle_expiration(None)
+
+
+@case("utils.handle_expiration.date_only")
+def bench_handle_expiration_date_only():
+    handle_expiration(datetime(2030, 1, 1))
+
+
+@case("utils.handle_expiration.explicit")
+def bench_handle_expiration_explicit():
+    handle_expiration(future)
+
+
+@case("schemas.LinkCreate.validate")
+def bench_link_create():
+    LinkCreate.model_validate(link_payload)
+
+
+@case("schemas.LinkCreate.validate_json")
+def bench_link_create_json():
+    LinkCreate.model_validate_json(link_payload_json)
+
+
+@case("schemas.LinkStats.validate")
+def bench_link_stats():
+    LinkStats.model_validate(stats_payload)
+
+
+@case("links.cache_key_search.normalized")
+def bench_cache_key_search_normalized():
+    cache_key_search("https://example.com/some/path?q=1")
+
+
+@case("links.cache_key_search.needs_normalizing")
+def bench_cache_key_search_slow():
+    cache_key_search("HTTPS://Example.COM:443/some/path?q=1#frag")
+
+
+@case("security.jwt_encode")
+def bench_jwt_encode():
+    create_access_token({"sub": "bench@example.com"})
+
+
+@case("security.jwt_decode")
+def bench_jwt_decode():
+    jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+@case("metrics.record_request")
+def bench_metrics_record_request():
+    metrics.record_request("GET", "/links/{short_code}", 200, 0.0042, request_stats)
+
+
+@case("metrics.record_cache_lookup")
+def bench_metrics_record_cache_lookup():
+    metrics.record_cache_lookup("redirect:abc123", "hit")
+
+
+@case("admission.route_class")
+def bench_admission_route_class():
+    admission.controller.route_class("POST", "/projects/42/links:batch")
+
+
+class ExecutionContextStub:
+    pass
+
+
+@case("profiler.statement_hooks.unprofiled")
+def bench_profiler_hooks():
+    context = ExecutionContextStub()
+    profiler.start_statement_timer(None, None, "SELECT 1", (), context, False)
+    profiler.record_statement(None, None, "SELECT 1", (), context, False)
+
+
+@async_case("orm.redirect_lookup.hit")
+def bench_redirect_hit(session_factory, codes: list[str]):
+    async def run(number: int):
+        async with session_factory() as db:
+            for code in random.choices(codes, k=number):
+                (await db.execute(active_link_query(code))).scalars().first()
+    return run
+
+
+@async_case("orm.redirect_lookup.miss")
+def bench_redirect_miss(session_factory, codes: list[str]):
+    async def run(number: int):
+        async with session_factory() as db:
+            for i in range(number):
+                (await db.execute(active_link_query(f"missing{i}"))).scalars().first()
+    return run
+
+
+def calibrate(run_batch: Callable[[int], float], min_time: float) -> int:
+    # Подбираем число вызовов, чтобы один повтор длился не меньше min_time
+    number = 1
+    while True:
+        elapsed = run_batch(number)
+        if elapsed >= min_time:
+            return number
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+
+
+def measure(run_batch: Callable[[int], float], repeat: int, min_time: float) -> dict:
+    number = calibrate(run_batch, min_time)
+    per_call = [run_batch(number) / number for _ in range(repeat)]
+    median = statistics.median(per_call)
+    return {
+        "median_ns": round(median * 1e9, 1),
+        "min_ns": round(min(per_call) * 1e9, 1),
+        "stdev_pct": round(statistics.pstdev(per_call) / median * 100, 2) if median else 0.0,
+        "ops_per_s": round(1 / median, 1) if median else 0.0,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def sync_batch(fn: Callable) -> Callable[[int], float]:
+    def run_batch(number: int) -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - started
+    return run_batch
+
+
+def async_batch(loop: asyncio.AbstractEventLoop, run: Callable) -> Callable[[int], float]:
+    def run_batch(number: int) -> float:
+        started = time.perf_counter()
+        loop.run_until_complete(run(number))
+        return time.perf_counter() - started
+    return run_batch
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args) -> dict:
+    selected = lambda name: not args.filter or any(part in name for part in args.filter.split(","))
+    results = {}
+
+    for name, fn in cases.items():
+        if selected(name):
+            results[name] = measure(sync_batch(fn), args.repeat, args.min_time)
+            print(f"{name}: {results[name]['median_ns']} ns", file=sys.stderr)
+
+    if any(selected(name) for name in async_cases):
+        sync_url, async_url = temp_database()
+        engine, _, async_engine, async_sessions = make_sessions(sync_url, async_url)
+        codes = seed_links(engine, args.links)
+        loop = asyncio.new_event_loop()
+        try:
+            for name, factory in async_cases.items():
+                if selected(name):
+                    run = factory(async_sessions, codes)
+                    results[name] = measure(async_batch(loop, run), args.repeat, args.min_time)
+                    print(f"{name}: {results[name]['median_ns']} ns", file=sys.stderr)
+        finally:
+            loop.run_until_complete(async_engine.dispose())
+            loop.close()
+            engine.dispose()
+
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "pydantic": pydantic.VERSION,
+            "seeded_links": args.links,
+        },
+        "results": results,
+    }
+
+
+def write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as output:
+        json.dump(data, output, indent=2)
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> tuple[list[dict], list[str]]:
+    # Регрессия — когда медленнее стали и медиана, и минимум: одиночный
+    # выброс на шумной машине не должен валить проверку
+    rows, regressions = [], []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append({"case": name, "baseline_ns": None, "current_ns": result["median_ns"], "change": None})
+            continue
+        change = result["median_ns"] / base["median_ns"] - 1
+        min_change = result["min_ns"] / base["min_ns"] - 1
+        regressed = change > threshold and min_change > threshold
+        rows.append({
+            "case": name,
+            "baseline_ns": base["median_ns"],
+            "current_ns": result["median_ns"],
+            "change": round(change * 100, 1),
+            "regressed": regressed,
+        })
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_comparison(rows: list[dict], threshold: float):
+    width = max((len(row["case"]) for row in rows), default=4)
+    print(f"{'case':<{width}}  {'baseline ns':>12}  {'current ns':>12}  {'change':>8}")
+    for row in rows:
+        baseline = f"{row['baseline_ns']:.1f}" if row["baseline_ns"] is not None else "-"
+        change = f"{row['change']:+.1f}%" if row["change"] is not None else "new"
+        flag = "  REGRESSION" if row.get("regressed") else ""
+        print(f"{row['case']:<{width}}  {baseline:>12}  {row['current_ns']:>12.1f}  {change:>8}{flag}")
+    print(f"threshold: +{threshold * 100:.0f}%")
+
+
+def compare(baseline_path: str, current: dict, threshold: float) -> int:
+    with open(baseline_path) as source:
+        baseline = json.load(source)
+    rows, regressions = compare_results(baseline, current, threshold)
+    print_comparison(rows, threshold)
+    if regressions:
+        print(f"regressions: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "micro.json"))
+    run_parser.add_argument("--save-baseline", action="store_true", help=f"also write {BASELINE_PATH}")
+    run_parser.add_argument("--compare", metavar="BASELINE", help="compare with a stored baseline after the run")
+    run_parser.add_argument("--filter", help="comma-separated substrings of case names")
+    run_parser.add_argument("--links", type=int, default=100_000, help="links seeded into the SQLite database")
+    run_parser.add_argument("--repeat", type=int, default=7)
+    run_parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--baseline", default=BASELINE_PATH)
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        with open(args.current) as source:
+            return compare(args.baseline, json.load(source), args.threshold)
+
+    current = run_suite(args)
+    write_json(args.output, current)
+    if args.save_baseline:
+        write_json(BASELINE_PATH, current)
+    print(json.dumps(current["results"], indent=2))
+    if args.compare:
+        return compare(args.compare, current, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
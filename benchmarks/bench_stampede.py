@@ -0,0 +1,124 @@
+"""
+Нагрузочный сценарий "горячий ключ истёк": ключ прогревается, затем запись в
+Redis и L1 удаляются, и N одновременных запросов приходят на пустой кэш.
+Считаются SQL-запросы к links на промахе — со склейкой промахов
+(src/singleflight.py) и без неё.
+
+    python -m benchmarks.bench_stampede --concurrency 200 --rounds 5 --db-latency-ms 5
+
+Нужен запущенный Redis (REDIS_URL из src/redis_client.py).
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from sqlalchemy import event
+from src import singleflight
+from src.database import get_async_db
+from src.links import cache_key_redirect, cache_key_stats
+from src.local_cache import redirect_cache
+from src.main import app
+from src.redis_client import redis_client
+from benchmarks.common import make_sessions, seed_links, summarize, temp_database
+
+
+def count_link_queries(engine) -> dict:
+    counter = {"queries": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, *args):
+        if "FROM links" in statement:
+            counter["queries"] += 1
+
+    return counter
+
+
+def add_db_latency(engine, latency: float):
+    if latency <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def slow_query(*args):
+        time.sleep(latency)
+
+
+async def stampede(client, path: str, expire_key: str, code: str, concurrency: int, counter: dict) -> dict:
+    await client.get(path)
+    redis_client.delete(expire_key)
+    redirect_cache.invalidate(code)
+    counter["queries"] = 0
+
+    latencies = []
+
+    async def hit():
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        return response.status_code
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(hit() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"db_queries": counter["queries"], "errors": sum(s != 200 for s in statuses),
+            **summarize(latencies, elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0)
+    parser.add_argument("--json", help="куда сохранить результаты")
+    args = parser.parse_args()
+
+    sync_url, async_url = temp_database("stampede.db")
+    engine, _, async_engine, async_session_factory = make_sessions(sync_url, async_url, pool_size=20)
+    code = seed_links(engine, 1)[0]
+    counter = count_link_queries(async_engine.sync_engine)
+    add_db_latency(async_engine.sync_engine, args.db_latency_ms / 1000)
+
+    async def bench_get_async_db():
+        async with async_session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = bench_get_async_db
+
+    scenarios = {
+        "redirect": (f"/links/{code}", cache_key_redirect(code)),
+        "stats": (f"/links/{code}/stats", cache_key_stats(code)),
+    }
+
+    async def run_all():
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for enabled in (False, True):
+                singleflight.SINGLE_FLIGHT_ENABLED = enabled
+                mode = "single_flight" if enabled else "no_coalescing"
+                for name, (path, key) in scenarios.items():
+                    rounds = [
+                        await stampede(client, path, key, code, args.concurrency, counter)
+                        for _ in range(args.rounds)
+                    ]
+                    results.setdefault(mode, {})[name] = rounds[-1] | {
+                        "db_queries_per_round": [r["db_queries"] for r in rounds]
+                    }
+        await async_engine.dispose()
+        return results
+
+    redis_client.flushdb()
+    results = asyncio.run(run_all())
+
+    print(f"{'mode':<15}{'endpoint':<10}{'queries/round':>16}{'p99 ms':>10}")
+    for mode, result in results.items():
+        for name, summary in result.items():
+            print(f"{mode:<15}{name:<10}{str(summary['db_queries_per_round']):>16}{summary['p99_ms']:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from src.database import Base
+from src.models import Link
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+def temp_database(name: str = "bench.db") -> tuple[str, str]:
+    path = os.path.join(tempfile.mkdtemp(prefix="shortener-bench-"), name)
+    return f"sqlite:///{path}", f"sqlite+aiosqlite:///{path}"
+
+
+def make_sessions(sync_url: str, async_url: str, pool_size: int = 5):
+    engine = create_engine(
+        sync_url,
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size
+    )
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(async_url, pool_size=pool_size)
+    return (
+        engine,
+        sessionmaker(autocommit=False, autoflush=False, bind=engine),
+        async_engine,
+        async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False),
+    )
+
+
+def seed_links(engine, count: int, chunk: int = 50_000, prefix: str = "b") -> list[str]:
+    codes = []
+    expires_at = datetime.utcnow() + timedelta(days=30)
+    created_at = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(0, count, chunk):
+            rows = [
+                {
+                    "short_code": f"{prefix}{i}",
+                    "original_url": f"https://example.com/{i % 1000}",
+                    "created_at": created_at,
+                    "expires_at": expires_at,
+                    "clicks": 0,
+                    "is_active": True,
+                }
+                for i in range(start, min(count, start + chunk))
+            ]
+            conn.execute(insert(Link.__table__), rows)
+            codes.extend(row["short_code"] for row in rows)
+    return codes
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import re
+import time
+from collections import deque
+from typing import Optional
+from src import metrics
+
+# Контроль допуска до роутинга: у каждого класса маршрутов свой предел
+# одновременных запросов и очередь с ограниченным ожиданием. Редиректы не
+# ограничиваются, по ним меряется задержка: пока её скользящее среднее выше
+# REDIRECT_LATENCY_BUDGET, остальные классы работают в урезанных пределах
+# (pressure_limit) и не встают в очередь — сразу 503 с Retry-After
+ADMISSION_ENABLED = True
+REDIRECT_CLASS = "redirect"
+DEFAULT_CLASS = "default"
+REDIRECT_LATENCY_BUDGET = 0.05
+LATENCY_EWMA_ALPHA = 0.2
+# Без свежих редиректов перегрузка не держится дольше этого
+OVERLOAD_HOLD = 5.0
+
+# limit=None — без ограничения; pressure_limit=None — класс не урезается
+ROUTE_CLASS_LIMITS = {
+    REDIRECT_CLASS: {"limit": None},
+    "auth": {"limit": 8, "pressure_limit": 2, "max_queue": 32, "queue_timeout": 1.0, "retry_after": 2},
+    "bulk": {"limit": 4, "pressure_limit": 1, "max_queue": 8, "queue_timeout": 2.0, "retry_after": 5},
+    "listing": {"limit": 16, "pressure_limit": 4, "max_queue": 32, "queue_timeout": 0.5, "retry_after": 1},
+    DEFAULT_CLASS: {"limit": 64, "pressure_limit": 32, "max_queue": 128, "queue_timeout": 1.0, "retry_after": 1},
+}
+
+# Классы определяются по методу и пути, до роутинга FastAPI
+ROUTE_CLASS_RULES = [
+    ("GET", re.compile(r"/links/[^/]+"), REDIRECT_CLASS),
+    ("POST", re.compile(r"/auth/(login|register)"), "auth"),
+    ("POST", re.compile(r"/links/(shorten/batch(/stream)?|import)"), "bulk"),
+    ("POST", re.compile(r"/projects/\d+/links:batch(-remove)?"), "bulk"),
+    ("GET", re.compile(r"/links/(archive/(export)?|search/)"), "listing"),
+    ("GET", re.compile(r"/projects/\d+"), "listing"),
+]
+EXEMPT_PATHS = {"/metrics", "/status"}
+
+rejected = metrics.register(metrics.Counter(
+    "admission_rejected_total", "Requests shed by admission control", ("route_class", "reason")
+))
+queue_wait = metrics.register(metrics.Histogram(
+    "admission_queue_seconds", "Time admitted requests waited for a slot", ("route_class",), metrics.POOL_WAIT_BUCKETS
+))
+
+
+class RouteClass:
+    def __init__(
+            self,
+            name: str,
+            limit: Optional[int],
+            pressure_limit: Optional[int] = None,
+            max_queue: int = 0,
+            queue_timeout: float = 0.0,
+            retry_after: int = 1
+    ):
+        self.name = name
+        self.limit = limit
+        self.pressure_limit = pressure_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.waiters: deque = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: dict[str, int] = {}
+
+    def capacity(self, overloaded: bool) -> Optional[int]:
+        if overloaded and self.pressure_limit is not None:
+            return self.pressure_limit
+        return self.limit
+
+    async def acquire(self, overloaded: bool) -> Optional[str]:
+        # None — слот получен, иначе причина отказа
+        capacity = self.capacity(overloaded)
+        self._wake(capacity)
+        if capacity is None or (self.in_flight < capacity and not self.waiters):
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+        if overloaded and self.pressure_limit is not None:
+            return self.reject("overload")
+        if len(self.waiters) >= self.max_queue:
+            return self.reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.queued += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # Слот мог прийти в момент срабатывания таймаута — тогда он наш
+            if not waiter.done() or waiter.cancelled():
+                return self.reject("queue_timeout")
+        except asyncio.CancelledError:
+            # Запрос отменён (клиент отключился), когда _wake уже отдал ему
+            # слот: без release класс потерял бы его навсегда
+            if waiter.done() and not waiter.cancelled():
+                self.release(overloaded)
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                self._discard(waiter)
+        queue_wait.observe(time.perf_counter() - started, self.name)
+        self.admitted += 1
+        return None
+
+    def release(self, overloaded: bool):
+        self.in_flight -= 1
+        self._wake(self.capacity(overloaded))
+
+    def _wake(self, capacity: Optional[int]):
+        # Слот переходит первому в очереди: in_flight растёт здесь, а не у него
+        while self.waiters and (capacity is None or self.in_flight < capacity):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+
+    def reject(self, reason: str) -> str:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        rejected.inc(self.name, reason)
+        return reason
+
+    def _discard(self, waiter):
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def stats(self, overloaded: bool) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued_now": len(self.waiters),
+            "limit": self.capacity(overloaded),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+        }
+
+
+class AdmissionController:
+    def __init__(self, limits: dict, latency_budget: float = REDIRECT_LATENCY_BUDGET):
+        self.classes = {name: RouteClass(name, **options) for name, options in limits.items()}
+        self.latency_budget = latency_budget
+        self.redirect_latency: Optional[float] = None
+        self.last_redirect_at = 0.0
+        self.overloads = 0
+
+    @property
+    def overloaded(self) -> bool:
+        if self.redirect_latency is None or self.redirect_latency <= self.latency_budget:
+            return False
+        return time.monotonic() - self.last_redirect_at < OVERLOAD_HOLD
+
+    def record_redirect(self, elapsed: float):
+        was_overloaded = self.overloaded
+        if self.redirect_latency is None:
+            self.redirect_latency = elapsed
+        else:
+            self.redirect_latency += LATENCY_EWMA_ALPHA * (elapsed - self.redirect_latency)
+        self.last_redirect_at = time.monotonic()
+        if self.overloaded and not was_overloaded:
+            self.overloads += 1
+
+    def route_class(self, method: str, path: str) -> Optional[RouteClass]:
+        if path in EXEMPT_PATHS:
+            return None
+        for rule_method, pattern, name in ROUTE_CLASS_RULES:
+            if method == rule_method and pattern.fullmatch(path):
+                return self.classes[name]
+        return self.classes[DEFAULT_CLASS]
+
+    def stats(self) -> dict:
+        overloaded = self.overloaded
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "overloaded": overloaded,
+            "overloads": self.overloads,
+            "redirect_latency_ms": round(self.redirect_latency * 1000, 3) if self.redirect_latency is not None else None,
+            "latency_budget_ms": self.latency_budget * 1000,
+            "classes": {name: route_class.stats(overloaded) for name, route_class in self.classes.items()},
+        }
+
+
+controller = AdmissionController(ROUTE_CLASS_LIMITS)
+
+metrics.register(metrics.Callback(
+    "admission_in_flight", "Requests being served per route class", ("route_class",),
+    lambda: {(name,): route_class.in_flight for name, route_class in controller.classes.items()}
+))
+metrics.register(metrics.Callback(
+    "admission_queue_length", "Requests waiting for a slot per route class", ("route_class",),
+    lambda: {(name,): len(route_class.waiters) for name, route_class in controller.classes.items()}
+))
+metrics.register(metrics.Callback(
+    "admission_overloaded", "1 while redirect latency is over its budget", (),
+    lambda: {(): int(controller.overloaded)}
+))
+
+
+def overload_response(route_class: RouteClass, reason: str) -> tuple[dict, dict]:
+    body = json.dumps({"detail": "Service is overloaded, retry later", "reason": reason}).encode()
+    return {
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(route_class.retry_after).encode()),
+        ],
+    }, {"type": "http.response.body", "body": body}
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, admission: AdmissionController = controller):
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        if not ADMISSION_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_class = self.admission.route_class(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await route_class.acquire(self.admission.overloaded)
+        if reason is not None:
+            start, body = overload_response(route_class, reason)
+            await send(start)
+            await send(body)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if route_class.name == REDIRECT_CLASS:
+                self.admission.record_redirect(time.perf_counter() - started)
+            route_class.release(self.admission.overloaded)
@@ -0,0 +1,102 @@
+import asyncio
+import math
+import string
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models import CodeSequence
+
+# Коды выдаются из арендованных в БД блоков ID, без проверок существования
+CODE_LENGTH = 6
+CODE_ALPHABET = string.ascii_letters + string.digits
+CODE_OBFUSCATE = True
+CODE_BLOCK_SIZE = 1000
+CODE_SEQUENCE_NAME = "links"
+
+
+class CodeSpaceExhausted(Exception):
+    pass
+
+
+def encode_id(value: int, length: int = CODE_LENGTH, alphabet: str = CODE_ALPHABET) -> str:
+    base = len(alphabet)
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, base)
+        chars.append(alphabet[digit])
+    if value:
+        raise CodeSpaceExhausted(f"ID does not fit into {length} characters")
+    return "".join(reversed(chars))
+
+
+def permutation_params(space: int) -> tuple[int, int]:
+    # Множитель около space/φ, взаимно простой с размером пространства:
+    # x -> (a*x + b) mod space — биекция, соседние ID дают непохожие коды
+    multiplier = int(space * 0.6180339887) | 1
+    while math.gcd(multiplier, space) != 1:
+        multiplier += 2
+    return multiplier, space // 3
+
+
+class CodeAllocator:
+    def __init__(
+            self,
+            length: int = CODE_LENGTH,
+            alphabet: str = CODE_ALPHABET,
+            obfuscate: bool = CODE_OBFUSCATE,
+            block_size: int = CODE_BLOCK_SIZE,
+            sequence: str = CODE_SEQUENCE_NAME
+    ):
+        self.length = length
+        self.alphabet = alphabet
+        self.obfuscate = obfuscate
+        self.block_size = block_size
+        self.sequence = sequence
+        self.space = len(alphabet) ** length
+        self.multiplier, self.offset = permutation_params(self.space)
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    def encode(self, value: int) -> str:
+        if value >= self.space:
+            raise CodeSpaceExhausted(f"All {self.space} codes of length {self.length} are used")
+        if self.obfuscate:
+            value = (value * self.multiplier + self.offset) % self.space
+        return encode_id(value, self.length, self.alphabet)
+
+    async def lease_block(self, bind, size: int) -> tuple[int, int]:
+        # Аренда в отдельной транзакции: откат запроса не должен вернуть блок
+        while True:
+            async with AsyncSession(bind) as db:
+                end = (await db.execute(
+                    update(CodeSequence)
+                    .where(CodeSequence.name == self.sequence)
+                    .values(next_value=CodeSequence.next_value + size)
+                    .returning(CodeSequence.next_value)
+                )).scalar()
+                if end is None:
+                    db.add(CodeSequence(name=self.sequence, next_value=size))
+                    end = size
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Строку последовательности одновременно создал другой воркер
+                    continue
+            return end - size, end
+
+    async def allocate(self, bind, count: int = 1) -> list[str]:
+        ids = []
+        async with self._lock:
+            while len(ids) < count:
+                if self._next >= self._end:
+                    self._next, self._end = await self.lease_block(
+                        bind, max(self.block_size, count - len(ids))
+                    )
+                take = min(count - len(ids), self._end - self._next)
+                ids.extend(range(self._next, self._next + take))
+                self._next += take
+        return [self.encode(value) for value in ids]
+
+
+code_allocator = CodeAllocator()
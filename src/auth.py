@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from src import schemas, models, security
-from src.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src import schemas, models, security, passwords
+from src.database import get_async_db
 from fastapi.security import OAuth2PasswordRequestForm
 
 
@@ -12,43 +13,54 @@ router = APIRouter(
 
 
 @router.post("/register", response_model=schemas.Token)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(
+        select(models.User.id).where(models.User.email == user.email)
+    )).first()
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
 
-    hashed_password = security.get_password_hash(user.password.get_secret_value())
+    hashed_password = await passwords.hash_password(user.password.get_secret_value())
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password
     )
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
 
     access_token = security.create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not db_user or not security.verify_password(
+    db_user = (await db.execute(
+        select(models.User).where(models.User.email == form_data.username)
+    )).scalars().first()
+    verified, new_hash = False, None
+    if db_user:
+        verified, new_hash = await passwords.verify_and_update(
             form_data.password,
             db_user.hashed_password
-    ):
+        )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Хеш со старой стоимостью пересчитан — сохраняем новый
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+
     access_token = security.create_access_token(data={"sub": db_user.email})
     return {"access_token": access_token, "token_type": "bearer"}
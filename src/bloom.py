@@ -0,0 +1,143 @@
+import hashlib
+import math
+from sqlalchemy import select
+from src.database import SessionLocal
+from src.models import Link
+from src.redis_client import acquire_job_lock, redis_client, release_job_lock
+from src import cache
+from src.cache import CacheUnavailable
+
+# Bloom-фильтр существующих коротких кодов в битовой строке Redis
+BLOOM_CAPACITY = 1_000_000
+BLOOM_ERROR_RATE = 0.001
+BLOOM_REBUILD_INTERVAL = 6 * 60 * 60
+BLOOM_REBUILD_CHUNK = 10_000
+# Как часто воркер дописывает коды, не попавшие в фильтр при сбое Redis
+BLOOM_SYNC_INTERVAL = 10
+
+BLOOM_KEY = "bloom:short_codes"
+BLOOM_READY_KEY = "bloom:short_codes:ready"
+BLOOM_REBUILD_KEY = "bloom:short_codes:rebuild"
+# Биты кодов, добавленных с начала последней перестройки: при подмене
+# фильтра они вливаются в новый одной транзакцией с RENAME
+BLOOM_DELTA_KEY = "bloom:short_codes:delta"
+BLOOM_LOCK_KEY = "bloom:short_codes:lock"
+BLOOM_LOCK_TTL = 600
+
+
+def bloom_size(capacity: int, error_rate: float) -> tuple[int, int]:
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+BLOOM_BITS, BLOOM_HASHES = bloom_size(BLOOM_CAPACITY, BLOOM_ERROR_RATE)
+_unsynced_codes: set[str] = set()
+
+
+def bloom_offsets(short_code: str, bits: int = BLOOM_BITS, hashes: int = BLOOM_HASHES) -> list[int]:
+    # Двойное хеширование: k позиций из одного 128-битного дайджеста
+    digest = hashlib.blake2b(short_code.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+def queue_contains(pipe, short_code: str):
+    pipe.exists(BLOOM_READY_KEY)
+    for offset in bloom_offsets(short_code):
+        pipe.getbit(BLOOM_KEY, offset)
+
+
+def contains_from_results(results: list) -> bool:
+    ready, *bits = results
+    # Пока фильтр не построен, ничего не отбрасываем
+    if not ready:
+        return True
+    return all(bits)
+
+
+async def bloom_contains(short_code: str) -> bool:
+    results = await cache.run(lambda pipe: queue_contains(pipe, short_code))
+    return results is None or contains_from_results(results)
+
+
+def queue_setbits(pipe, key: str, short_codes):
+    for short_code in short_codes:
+        for offset in bloom_offsets(short_code):
+            pipe.setbit(key, offset, 1)
+
+
+def queue_add(pipe, short_codes):
+    # Живой фильтр и дельта пишутся одной транзакцией: перестройка либо
+    # вольёт эти биты при подмене, либо подменит фильтр раньше, и они лягут
+    # уже в новый
+    queue_setbits(pipe, BLOOM_KEY, short_codes)
+    queue_setbits(pipe, BLOOM_DELTA_KEY, short_codes)
+
+
+async def bloom_add(*short_codes: str):
+    # Коды, которые не удалось записать при сбое Redis, дописываются со
+    # следующим вызовом или фоновой sync_unsynced_codes
+    codes = set(short_codes) | _unsynced_codes
+    if not codes:
+        return
+
+    try:
+        await cache.execute(lambda pipe: queue_add(pipe, codes), transaction=True)
+    except CacheUnavailable:
+        _unsynced_codes.update(codes)
+    else:
+        _unsynced_codes.difference_update(codes)
+
+
+def sync_unsynced_codes() -> int:
+    # Пока коды только в памяти этого воркера, остальные отвечают по ним 404:
+    # дописываем их, как только Redis снова доступен, не дожидаясь новых ссылок
+    codes = set(_unsynced_codes)
+    if not codes:
+        return 0
+    pipe = redis_client.pipeline(transaction=True)
+    queue_add(pipe, codes)
+    try:
+        pipe.execute()
+    except cache.CACHE_ERRORS:
+        return 0
+    _unsynced_codes.difference_update(codes)
+    return len(codes)
+
+
+def rebuild_bloom_filter(session_factory=SessionLocal, chunk_size: int = BLOOM_REBUILD_CHUNK) -> int:
+    lock_token = acquire_job_lock(BLOOM_LOCK_KEY, BLOOM_LOCK_TTL)
+    if lock_token is None:
+        return 0
+
+    try:
+        # Всё, что добавлено до сброса дельты, уже в БД и попадёт в выборку
+        redis_client.delete(BLOOM_REBUILD_KEY, BLOOM_DELTA_KEY)
+        redis_client.setbit(BLOOM_REBUILD_KEY, BLOOM_BITS - 1, 0)
+
+        count = 0
+        with session_factory() as db:
+            codes = db.execute(
+                select(Link.short_code).execution_options(yield_per=chunk_size)
+            ).scalars()
+            pipe = redis_client.pipeline(transaction=False)
+            for short_code in codes:
+                for offset in bloom_offsets(short_code):
+                    pipe.setbit(BLOOM_REBUILD_KEY, offset, 1)
+                count += 1
+                if count % chunk_size == 0:
+                    pipe.execute()
+            pipe.execute()
+
+        # Коды, созданные во время выборки, — из дельты
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.bitop("OR", BLOOM_REBUILD_KEY, BLOOM_REBUILD_KEY, BLOOM_DELTA_KEY)
+        pipe.rename(BLOOM_REBUILD_KEY, BLOOM_KEY)
+        pipe.delete(BLOOM_DELTA_KEY)
+        pipe.set(BLOOM_READY_KEY, count)
+        pipe.execute()
+        return count
+    finally:
+        release_job_lock(BLOOM_LOCK_KEY, lock_token)
@@ -0,0 +1,221 @@
+import asyncio
+import time
+from typing import Callable, Optional
+from redis.exceptions import RedisError, WatchError
+from src.redis_client import async_redis_client
+from src import metrics
+
+# Доступ обработчиков к Redis: связанные команды одним конвейером и
+# предохранитель, который при сбоях Redis отправляет запросы сразу в БД
+CACHE_OPERATION_TIMEOUT = 0.5
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 5.0
+
+CACHE_ERRORS = (RedisError, OSError, asyncio.TimeoutError)
+
+
+class CacheUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.short_circuited = 0
+        self.opened = 0
+        self.last_error: Optional[str] = None
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.short_circuited += 1
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            # Пока пробный запрос не вернулся, остальные идут мимо кэша
+            if self._probe_in_flight:
+                self.short_circuited += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+
+    def record_failure(self, error: BaseException):
+        self.failures += 1
+        if isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+        self.last_error = repr(error)
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        self._probe_in_flight = False
+
+    def reset(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "short_circuited": self.short_circuited,
+            "opened": self.opened,
+            "last_error": self.last_error,
+        }
+
+
+breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+metrics.register(metrics.Callback(
+    "redis_breaker_open", "1 while the Redis circuit breaker is not closed", ("state",),
+    lambda: {(breaker.state,): int(breaker.state != CircuitBreaker.CLOSED)}
+))
+
+
+async def execute(build: Callable, transaction: bool = False) -> list:
+    # build(pipe) ставит команды в очередь; результат — список их ответов
+    if not breaker.allow():
+        raise CacheUnavailable("circuit open")
+    pipe = async_redis_client.pipeline(transaction=transaction)
+    build(pipe)
+    try:
+        results = await asyncio.wait_for(pipe.execute(), CACHE_OPERATION_TIMEOUT)
+    except CACHE_ERRORS as e:
+        breaker.record_failure(e)
+        raise CacheUnavailable(repr(e)) from e
+    except BaseException:
+        # Отменённый запрос ничего не говорит о здоровье Redis
+        breaker.release_probe()
+        raise
+    breaker.record_success()
+    return results
+
+
+async def run(build: Callable, default=None):
+    try:
+        return await execute(build)
+    except CacheUnavailable:
+        return default
+
+
+async def lookup(key: str, build: Callable) -> Optional[tuple[bytes, Optional[float]]]:
+    # Значение и остаток TTL; исход поиска — в метрики по пространству ключа
+    try:
+        value, ttl_ms = await execute(build)
+    except CacheUnavailable:
+        metrics.record_cache_lookup(key, "unavailable")
+        return None
+    if not value:
+        metrics.record_cache_lookup(key, "miss")
+        return None
+    metrics.record_cache_lookup(key, "hit")
+    return value, ttl_ms / 1000 if ttl_ms > 0 else None
+
+
+async def get_with_ttl(key: str) -> Optional[tuple[bytes, Optional[float]]]:
+    return await lookup(key, lambda pipe: (pipe.get(key), pipe.pttl(key)))
+
+
+async def hget_with_ttl(key: str, field: str) -> Optional[tuple[bytes, Optional[float]]]:
+    return await lookup(key, lambda pipe: (pipe.hget(key, field), pipe.pttl(key)))
+
+
+async def setex(key: str, ttl: int, value):
+    await run(lambda pipe: pipe.setex(key, ttl, value))
+
+
+async def delete(*keys: str):
+    if keys:
+        await run(lambda pipe: pipe.delete(*keys))
+
+
+async def delete_if_equals(key: str, value: bytes) -> bool:
+    # Сравнение и удаление одной транзакцией: если ключ поменяли после GET,
+    # WATCH сорвёт EXEC и чужое значение останется
+    if not breaker.allow():
+        return False
+
+    async def compare_and_delete() -> bool:
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            await pipe.watch(key)
+            if await pipe.get(key) != value:
+                await pipe.unwatch()
+                return False
+            pipe.multi()
+            pipe.delete(key)
+            await pipe.execute()
+            return True
+
+    try:
+        deleted = await asyncio.wait_for(compare_and_delete(), CACHE_OPERATION_TIMEOUT)
+    except WatchError:
+        deleted = False
+    except CACHE_ERRORS as e:
+        breaker.record_failure(e)
+        return False
+    except BaseException:
+        breaker.release_probe()
+        raise
+    breaker.record_success()
+    return deleted
+
+
+async def extend_ttl(key: str, ttl: int) -> bool:
+    # EXPIRE ... GT/NX появились только в Redis 7: читаем TTL и продлеваем
+    # под WATCH. Если ключ поменяли между TTL и EXEC, читаем заново
+    if not breaker.allow():
+        return False
+
+    async def read_and_extend() -> bool:
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    # -1 — ключ без TTL, -2 — ключа нет
+                    current = await pipe.ttl(key)
+                    if current == -2 or current >= ttl:
+                        await pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.expire(key, ttl)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    try:
+        extended = await asyncio.wait_for(read_and_extend(), CACHE_OPERATION_TIMEOUT)
+    except CACHE_ERRORS as e:
+        breaker.record_failure(e)
+        return False
+    except BaseException:
+        breaker.release_probe()
+        raise
+    breaker.record_success()
+    return extended
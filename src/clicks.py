@@ -0,0 +1,300 @@
+import hashlib
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import bindparam, case, delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+from src.database import SessionLocal
+from src.models import ClickRollup, Link
+from src.redis_client import acquire_job_lock, redis_client, release_job_lock
+from src import cache
+
+# Клики копятся в Redis и периодически сбрасываются в БД пачками
+CLICK_FLUSH_INTERVAL = 5
+CLICK_FLUSH_BATCH_SIZE = 500
+
+PENDING_CLICKS_KEY = "clicks:pending"
+PENDING_ACCESS_KEY = "clicks:last_accessed"
+FLUSH_LOCK_KEY = "clicks:flush-lock"
+FLUSH_LOCK_TTL = 60
+
+# Поминутные счётчики кликов: хеш clicks:ts:{минута} (поле — код) и множество
+# минут, ещё не свёрнутых в click_rollups
+CLICK_ROLLUP_INTERVAL = 60
+PENDING_MINUTES_KEY = "clicks:ts:pending"
+ROLLUP_LOCK_KEY = "clicks:rollup-lock"
+ROLLUP_LOCK_TTL = 300
+
+GRANULARITIES = ("minute", "hour", "day")
+BUCKET_SIZES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+# Мелкие бакеты нужны только для недавних графиков, суточные хранятся всегда
+ROLLUP_RETENTION = {
+    "minute": timedelta(days=2),
+    "hour": timedelta(days=90),
+}
+
+# Уникальные посетители: HyperLogLog на ссылку (~12 КБ независимо от трафика)
+# и по дню, чтобы считать диапазоны объединением
+UNIQUE_DAY_RETENTION = 90 * 24 * 3600
+
+links_table = Link.__table__
+rollups_table = ClickRollup.__table__
+
+apply_clicks_stmt = (
+    update(links_table)
+    .where(links_table.c.short_code == bindparam("b_code"))
+    .values(
+        clicks=links_table.c.clicks + bindparam("b_delta"),
+        last_accessed=case(
+            (links_table.c.last_accessed > bindparam("b_accessed"), links_table.c.last_accessed),
+            else_=bindparam("b_accessed")
+        )
+    )
+)
+
+
+upsert_rollup_stmt = insert(rollups_table)
+upsert_rollup_stmt = upsert_rollup_stmt.on_conflict_do_update(
+    index_elements=[rollups_table.c.short_code, rollups_table.c.granularity, rollups_table.c.bucket],
+    set_={"clicks": rollups_table.c.clicks + upsert_rollup_stmt.excluded.clicks}
+)
+
+
+def delete_rollups_stmt(short_codes):
+    # Свёртки привязаны к коду, а не к строке ссылки: без удаления код,
+    # выданный заново, унаследовал бы чужую историю кликов
+    return delete(rollups_table).where(rollups_table.c.short_code.in_(short_codes))
+
+
+def live_codes(db, short_codes: list[str], batch_size: int) -> set[str]:
+    live = set()
+    for start in range(0, len(short_codes), batch_size):
+        live.update(db.execute(
+            select(links_table.c.short_code)
+            .where(links_table.c.short_code.in_(short_codes[start:start + batch_size]))
+        ).scalars())
+    return live
+
+
+def minute_key(minute: int) -> str:
+    return f"clicks:ts:{minute}"
+
+
+def visitors_key(short_code: str) -> str:
+    return f"uv:{short_code}"
+
+
+def daily_visitors_key(short_code: str, day: datetime) -> str:
+    return f"uv:{short_code}:{day:%Y%m%d}"
+
+
+def daily_visitors_keys(short_code: str, since: Optional[datetime]) -> list[str]:
+    # Дневные HLL существуют только с создания ссылки и не старше срока
+    # хранения: ключи перечисляются без SCAN по всему Redis
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    day = today - timedelta(seconds=UNIQUE_DAY_RETENTION)
+    if since is not None and since > day:
+        day = since.replace(hour=0, minute=0, second=0, microsecond=0)
+    keys = []
+    while day <= today:
+        keys.append(daily_visitors_key(short_code, day))
+        day += timedelta(days=1)
+    return keys
+
+
+def visitor_fingerprint(ip: Optional[str], user_agent: Optional[str]) -> str:
+    return hashlib.sha1(f"{ip or ''}|{user_agent or ''}".encode()).hexdigest()
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def record_click(short_code: str, visitor: Optional[str] = None):
+    # При недоступном Redis поднимает CacheUnavailable: клик пишет вызывающий
+    now = time.time()
+    minute = int(now // 60)
+
+    def build(pipe):
+        pipe.hincrby(PENDING_CLICKS_KEY, short_code, 1)
+        pipe.hset(PENDING_ACCESS_KEY, short_code, now)
+        pipe.hincrby(minute_key(minute), short_code, 1)
+        pipe.sadd(PENDING_MINUTES_KEY, minute)
+        if visitor:
+            day = int(now // 86400) * 86400
+            day_key = daily_visitors_key(short_code, datetime.utcfromtimestamp(day))
+            pipe.pfadd(visitors_key(short_code), visitor)
+            pipe.pfadd(day_key, visitor)
+            # Срок от начала дня одинаков для всех кликов: EXPIREAT без NX
+            # (Redis 7) ставит его каждый раз одним и тем же
+            pipe.expireat(day_key, day + UNIQUE_DAY_RETENTION)
+
+    await cache.execute(build)
+
+
+async def unique_visitors(*short_codes: str) -> list[Optional[int]]:
+    if not short_codes:
+        return []
+    counts = await cache.run(lambda pipe: [pipe.pfcount(visitors_key(code)) for code in short_codes])
+    return counts or [None] * len(short_codes)
+
+
+async def unique_visitors_between(short_code: str, start: datetime, end: datetime) -> Optional[int]:
+    # PFCOUNT по нескольким ключам считает объединение, не сохраняя его
+    days = []
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day <= end:
+        days.append(daily_visitors_key(short_code, day))
+        day += timedelta(days=1)
+    counts = await cache.run(lambda pipe: pipe.pfcount(*days))
+    return counts[0] if counts else None
+
+
+async def pending_clicks(short_code: str) -> tuple[int, Optional[datetime]]:
+    count, accessed = await cache.run(lambda pipe: (
+        pipe.hget(PENDING_CLICKS_KEY, short_code),
+        pipe.hget(PENDING_ACCESS_KEY, short_code)
+    ), default=(None, None))
+    return (
+        int(count) if count else 0,
+        datetime.utcfromtimestamp(float(accessed)) if accessed else None
+    )
+
+
+def drain_pending_clicks() -> list[dict]:
+    # HGETALL + DEL в одной транзакции: клики, пришедшие после, попадут в следующий сброс
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hgetall(PENDING_CLICKS_KEY)
+    pipe.hgetall(PENDING_ACCESS_KEY)
+    pipe.delete(PENDING_CLICKS_KEY, PENDING_ACCESS_KEY)
+    counts, accessed, _ = pipe.execute()
+
+    now = time.time()
+    return [
+        {
+            "b_code": code.decode(),
+            "b_delta": int(count),
+            "b_accessed": datetime.utcfromtimestamp(float(accessed.get(code, now)))
+        }
+        for code, count in counts.items()
+    ]
+
+
+def restore_pending_clicks(rows: list[dict]):
+    pipe = redis_client.pipeline(transaction=False)
+    for row in rows:
+        pipe.hincrby(PENDING_CLICKS_KEY, row["b_code"], row["b_delta"])
+        pipe.hsetnx(
+            PENDING_ACCESS_KEY,
+            row["b_code"],
+            (row["b_accessed"] - datetime(1970, 1, 1)).total_seconds()
+        )
+    pipe.execute()
+
+
+def flush_clicks(session_factory=SessionLocal, batch_size: int = CLICK_FLUSH_BATCH_SIZE) -> int:
+    # Один воркер сбрасывает клики за раз
+    lock_token = acquire_job_lock(FLUSH_LOCK_KEY, FLUSH_LOCK_TTL)
+    if lock_token is None:
+        return 0
+
+    try:
+        rows = drain_pending_clicks()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            try:
+                with session_factory() as db:
+                    db.execute(apply_clicks_stmt, batch)
+                    db.commit()
+            except Exception:
+                restore_pending_clicks(rows[start:])
+                raise
+        return len(rows)
+    finally:
+        release_job_lock(FLUSH_LOCK_KEY, lock_token)
+
+
+def drain_minute_buckets(before_minute: int) -> dict[int, dict[str, int]]:
+    # Текущая минута ещё пишется; опоздавший клик по свёрнутой минуте заново
+    # попадёт в множество и сложится при следующей свёртке
+    minutes = sorted(
+        minute for minute in (int(value) for value in redis_client.smembers(PENDING_MINUTES_KEY))
+        if minute < before_minute
+    )
+    if not minutes:
+        return {}
+
+    pipe = redis_client.pipeline(transaction=True)
+    for minute in minutes:
+        pipe.hgetall(minute_key(minute))
+    pipe.delete(*(minute_key(minute) for minute in minutes))
+    pipe.srem(PENDING_MINUTES_KEY, *minutes)
+    results = pipe.execute()
+
+    return {
+        minute: {code.decode(): int(count) for code, count in counts.items()}
+        for minute, counts in zip(minutes, results)
+        if counts
+    }
+
+
+def restore_minute_buckets(buckets: dict[int, dict[str, int]]):
+    pipe = redis_client.pipeline(transaction=False)
+    for minute, counts in buckets.items():
+        for short_code, count in counts.items():
+            pipe.hincrby(minute_key(minute), short_code, count)
+        pipe.sadd(PENDING_MINUTES_KEY, minute)
+    pipe.execute()
+
+
+def rollup_rows(buckets: dict[int, dict[str, int]]) -> list[dict]:
+    totals = defaultdict(int)
+    for minute, counts in buckets.items():
+        moment = datetime.utcfromtimestamp(minute * 60)
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(moment, granularity)
+            for short_code, count in counts.items():
+                totals[(short_code, granularity, bucket)] += count
+    return [
+        {"short_code": short_code, "granularity": granularity, "bucket": bucket, "clicks": count}
+        for (short_code, granularity, bucket), count in totals.items()
+    ]
+
+
+def rollup_clicks(session_factory=SessionLocal, batch_size: int = CLICK_FLUSH_BATCH_SIZE) -> int:
+    lock_token = acquire_job_lock(ROLLUP_LOCK_KEY, ROLLUP_LOCK_TTL)
+    if lock_token is None:
+        return 0
+
+    try:
+        buckets = drain_minute_buckets(int(time.time() // 60))
+        rows = rollup_rows(buckets)
+        try:
+            with session_factory() as db:
+                # Клики по ссылкам, удалённым после клика, не сворачиваем
+                live = live_codes(db, sorted({row["short_code"] for row in rows}), batch_size)
+                rows = [row for row in rows if row["short_code"] in live]
+                for start in range(0, len(rows), batch_size):
+                    db.execute(upsert_rollup_stmt, rows[start:start + batch_size])
+                now = datetime.utcnow()
+                for granularity, retention in ROLLUP_RETENTION.items():
+                    db.execute(delete(rollups_table).where(
+                        (rollups_table.c.granularity == granularity) &
+                        (rollups_table.c.bucket < now - retention)
+                    ))
+                db.commit()
+        except Exception:
+            restore_minute_buckets(buckets)
+            raise
+        return len(rows)
+    finally:
+        release_job_lock(ROLLUP_LOCK_KEY, lock_token)
@@ -1,15 +1,55 @@
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from src import metrics, profiler
+
+# Профиль запроса и лог медленных запросов — на всех движках процесса,
+# включая тестовые и движки бенчмарков
+profiler.instrument(Engine)
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./data/shortener.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./data/shortener.db"
+
+
+class TimedQueuePool(QueuePool):
+    # Ожидание соединения из пула — в гистограмму db_pool_checkout_seconds
+    metrics_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe_pool_checkout(self.metrics_label, time.perf_counter() - started)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    poolclass=TimedQueuePool
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=TimedAsyncQueuePool)
+metrics.register(metrics.Callback(
+    "db_pool_checked_out", "Connections currently checked out of the pool", ("pool",),
+    lambda: {("sync",): engine.pool.checkedout(), ("async",): async_engine.pool.checkedout()}
+))
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -21,6 +61,34 @@ def get_db():
         db.close()
 
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def add_missing_columns(bind=engine) -> set[str]:
+    # Новые столбцы в уже созданных таблицах: SQLite умеет только ADD COLUMN.
+    # Возвращает добавленные как "таблица.столбец" — их может понадобиться заполнить
+    existing = inspect(bind)
+    added = set()
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not existing.has_table(table.name):
+                continue
+            present = {column["name"] for column in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                    added.add(f"{table.name}.{column.name}")
+    return added
+
 
+def init_db(bind=engine) -> set[str]:
+    Base.metadata.create_all(bind=bind)
+    added = add_missing_columns(bind)
+    # create_all не трогает существующие таблицы: индексы добавляем отдельно
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    return added
@@ -0,0 +1,123 @@
+from datetime import datetime
+from sqlalchemy import delete, insert, literal, select
+from src.clicks import daily_visitors_keys, delete_rollups_stmt, flush_clicks, visitors_key
+from src.database import SessionLocal
+from src.links import cache_key_redirect, cache_key_stats, cache_key_search
+from src.local_cache import broadcast_invalidation
+from src.models import ArchivedLink, Link, link_project_association
+from src.projects import unlink_counts_stmt
+from src.redis_client import acquire_job_lock, redis_client, release_job_lock
+from src import cache
+
+# Просроченные ссылки архивируются фоновой задачей пачками
+EXPIRY_SWEEP_INTERVAL = 60
+EXPIRY_SWEEP_BATCH_SIZE = 1000
+
+SWEEP_LOCK_KEY = "expiry:sweep-lock"
+SWEEP_LOCK_TTL = 600
+SWEEP_PROGRESS_KEY = "expiry:progress"
+
+links_table = Link.__table__
+archived_table = ArchivedLink.__table__
+ARCHIVED_COLUMNS = [
+    "original_url", "short_code", "custom_alias", "created_at",
+    "expires_at", "clicks", "last_accessed", "user_id",
+]
+
+
+def archive_batch(db, ids: list[int], archived_at: datetime):
+    db.execute(
+        insert(archived_table).from_select(
+            ARCHIVED_COLUMNS + ["archived_at"],
+            select(
+                *(links_table.c[name] for name in ARCHIVED_COLUMNS),
+                literal(archived_at, archived_table.c.archived_at.type)
+            )
+            .where(links_table.c.id.in_(ids))
+        )
+    )
+    db.execute(unlink_counts_stmt(ids))
+    db.execute(delete_rollups_stmt(select(links_table.c.short_code).where(links_table.c.id.in_(ids))))
+    db.execute(delete(link_project_association).where(link_project_association.c.link_id.in_(ids)))
+    db.execute(delete(links_table).where(links_table.c.id.in_(ids)))
+
+
+def evict_cached_links(short_codes: list[str], original_urls: list[str], created_at: list[datetime]):
+    pipe = redis_client.pipeline(transaction=False)
+    for short_code, since in zip(short_codes, created_at):
+        pipe.delete(
+            cache_key_redirect(short_code),
+            cache_key_stats(short_code),
+            visitors_key(short_code),
+            *daily_visitors_keys(short_code, since)
+        )
+    for search_key in {cache_key_search(url) for url in original_urls}:
+        pipe.delete(search_key)
+    pipe.execute()
+    broadcast_invalidation(*short_codes)
+
+
+def sweep_expired_links(session_factory=SessionLocal, batch_size: int = EXPIRY_SWEEP_BATCH_SIZE) -> int:
+    lock_token = acquire_job_lock(SWEEP_LOCK_KEY, SWEEP_LOCK_TTL)
+    if lock_token is None:
+        return 0
+
+    now = datetime.utcnow()
+    archived = 0
+    batches = 0
+    redis_client.hset(SWEEP_PROGRESS_KEY, mapping={
+        "running": 1,
+        "started_at": now.isoformat(),
+        "cutoff": now.isoformat(),
+        "archived_in_run": 0,
+        "batches_in_run": 0,
+    })
+    try:
+        # Накопленные клики должны попасть в строку до её переноса в архив
+        flush_clicks(session_factory)
+
+        while True:
+            with session_factory() as db:
+                rows = db.execute(
+                    select(
+                        links_table.c.id, links_table.c.short_code,
+                        links_table.c.original_url, links_table.c.created_at
+                    )
+                    .where(links_table.c.expires_at < now)
+                    .order_by(links_table.c.expires_at)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                archive_batch(db, [row.id for row in rows], now)
+                db.commit()
+
+            evict_cached_links(
+                [row.short_code for row in rows],
+                [row.original_url for row in rows],
+                [row.created_at for row in rows]
+            )
+            archived += len(rows)
+            batches += 1
+            redis_client.hset(SWEEP_PROGRESS_KEY, mapping={
+                "archived_in_run": archived,
+                "batches_in_run": batches,
+            })
+            redis_client.hincrby(SWEEP_PROGRESS_KEY, "archived_total", len(rows))
+
+        redis_client.hset(SWEEP_PROGRESS_KEY, mapping={
+            "finished_at": datetime.utcnow().isoformat(),
+            "last_error": "",
+        })
+        return archived
+    except Exception as e:
+        redis_client.hset(SWEEP_PROGRESS_KEY, "last_error", repr(e))
+        raise
+    finally:
+        redis_client.hset(SWEEP_PROGRESS_KEY, "running", 0)
+        release_job_lock(SWEEP_LOCK_KEY, lock_token)
+
+
+async def sweeper_progress() -> dict:
+    progress, = await cache.run(lambda pipe: pipe.hgetall(SWEEP_PROGRESS_KEY), default=({},))
+    return {key.decode(): value.decode() for key, value in progress.items()}
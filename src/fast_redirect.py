@@ -0,0 +1,105 @@
+import json
+from typing import Optional
+from src import http_cache, links, metrics
+from src.cache import CacheUnavailable
+from src.clicks import record_click, visitor_fingerprint
+from src.local_cache import redirect_cache, L1_TTL
+from src.singleflight import should_refresh_early
+
+# Быстрый путь GET /links/{short_code} до роутинга FastAPI: код из L1 или
+# Redis отдаётся готовым ответом без зависимостей, сессии БД и
+# jsonable_encoder. Промах, ранний пересчёт кэша и недоступный Redis уходят
+# в обычный обработчик links.redirect_link, который ответит так же
+FAST_REDIRECT_ENABLED = True
+PATH_PREFIX = "/links/"
+
+JSON_HEADERS = [(b"content-type", b"application/json")]
+EMPTY_BODY = {"type": "http.response.body", "body": b""}
+
+fast_path_requests = metrics.register(metrics.Counter(
+    "redirect_fast_path_total", "Redirect requests by fast path outcome", ("result",)
+))
+
+# Для меток метрик и профиля: быстрый путь отвечает за тот же маршрут
+redirect_route = next(route for route in links.router.routes if getattr(route, "endpoint", None) is links.redirect_link)
+
+
+def short_code_from(scope) -> Optional[str]:
+    # Всё, что обычный роутинг отдал бы redirect_link: один сегмент после /links/
+    if scope["type"] != "http" or scope["method"] != "GET":
+        return None
+    path = scope["path"]
+    if not path.startswith(PATH_PREFIX):
+        return None
+    short_code = path[len(PATH_PREFIX):]
+    if not short_code or "/" in short_code:
+        return None
+    return short_code
+
+
+def request_visitor(scope) -> str:
+    user_agent = None
+    for name, value in scope["headers"]:
+        if name == b"user-agent":
+            user_agent = value.decode("latin-1")
+            break
+    client = scope.get("client")
+    return visitor_fingerprint(client[0] if client else None, user_agent)
+
+
+def build_response(url: str, ttl: Optional[float]) -> tuple[dict, dict]:
+    status = links.REDIRECT_STATUS
+    cache_control = (b"cache-control", http_cache.redirect_cache_control(ttl).encode())
+    if status == 200:
+        body = json.dumps({"Redirect": url}, ensure_ascii=False, separators=(",", ":")).encode()
+        headers = JSON_HEADERS + [(b"content-length", str(len(body)).encode()), cache_control]
+        return {"type": "http.response.start", "status": 200, "headers": headers}, \
+            {"type": "http.response.body", "body": body}
+    headers = [(b"location", links.location_header(url).encode()), (b"content-length", b"0"), cache_control]
+    return {"type": "http.response.start", "status": status, "headers": headers}, EMPTY_BODY
+
+
+async def cached_url(short_code: str) -> tuple[Optional[str], Optional[float], str]:
+    cached = redirect_cache.get_with_ttl(short_code)
+    if cached:
+        return *cached, "l1"
+
+    cached = await links.read_cached_redirect(short_code)
+    if not cached:
+        return None, None, "miss"
+    url, ttl = cached
+    if ttl and should_refresh_early(links.cache_key_redirect(short_code), ttl):
+        return None, None, "refresh"
+    redirect_cache.set(short_code, url, min(L1_TTL, ttl) if ttl else None)
+    return url, ttl, "redis"
+
+
+class FastRedirectMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        short_code = short_code_from(scope) if FAST_REDIRECT_ENABLED else None
+        if short_code is None:
+            await self.app(scope, receive, send)
+            return
+
+        url, ttl, result = await cached_url(short_code)
+        if url is not None:
+            try:
+                await record_click(short_code, request_visitor(scope))
+            except CacheUnavailable:
+                # Клик без Redis пишется в БД — это дело обычного обработчика
+                url, result = None, "cache_unavailable"
+
+        fast_path_requests.inc(result)
+        if url is None:
+            if result == "miss":
+                scope.setdefault("state", {})[links.FAST_PATH_MISS] = True
+            await self.app(scope, receive, send)
+            return
+
+        scope["route"] = redirect_route
+        start, body = build_response(url, ttl)
+        await send(start)
+        await send(body)
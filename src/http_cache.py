@@ -0,0 +1,76 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+
+# Заголовки HTTP-кэширования и условные запросы (If-None-Match -> 304).
+# Редирект кэшируется не дольше записи L1/Redis, которая его отдала: та, в
+# свою очередь, не переживает expires_at ссылки. Владелец может поменять
+# адрес в любой момент, поэтому срок ещё и ограничен REDIRECT_MAX_AGE;
+# 0 — кэшировать нельзя, каждый клик доходит до сервиса.
+# private: повторные клики из того же браузера не считаются, но CDN не
+# отдаёт чужой редирект мимо статистики уникальных посетителей
+REDIRECT_MAX_AGE = 60
+REDIRECT_CACHE_SCOPE = "private"
+# Статистика и так отдаётся из Redis до STATS_EXPIRE секунд: столько же её
+# можно держать браузеру и CDN
+STATS_MAX_AGE = 60
+# Личные списки (архив, проекты): хранить можно, но каждый раз сверяя ETag
+PRIVATE_REVALIDATE = "private, no-cache"
+NO_CACHE = "no-cache"
+
+
+def etag(*parts) -> str:
+    digest = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\x00")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    # If-None-Match сравнивается слабо: префикс W/ не учитывается
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = tag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def max_age(limit: int, ttl: Optional[float]) -> int:
+    return limit if ttl is None else max(0, min(limit, int(ttl)))
+
+
+def redirect_cache_control(ttl: Optional[float]) -> str:
+    seconds = max_age(REDIRECT_MAX_AGE, ttl)
+    return f"{REDIRECT_CACHE_SCOPE}, max-age={seconds}" if seconds else NO_CACHE
+
+
+def stats_cache_control(ttl: Optional[float]) -> str:
+    seconds = max_age(STATS_MAX_AGE, ttl)
+    return f"public, max-age={seconds}" if seconds else NO_CACHE
+
+
+def not_modified(request: Request, tag: str, cache_control: str, headers: Optional[dict] = None) -> Optional[Response]:
+    if not etag_matches(request.headers.get("if-none-match"), tag):
+        return None
+    return Response(status_code=304, headers={"etag": tag, "cache-control": cache_control, **(headers or {})})
+
+
+def json_response(payload: bytes, tag: str, cache_control: str, headers: Optional[dict] = None) -> Response:
+    # Готовые байты: response_model и jsonable_encoder уже не нужны
+    return Response(
+        payload,
+        media_type="application/json",
+        headers={"etag": tag, "cache-control": cache_control, **(headers or {})}
+    )
+
+
+def conditional_json(
+        request: Request,
+        payload: bytes,
+        tag: str,
+        cache_control: str,
+        headers: Optional[dict] = None
+) -> Response:
+    return not_modified(request, tag, cache_control, headers) or json_response(payload, tag, cache_control, headers)
@@ -0,0 +1,520 @@
+import argparse
+import asyncio
+import csv
+import json
+import string
+import sys
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Literal, NamedTuple, Optional
+from urllib.parse import urlsplit
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_async_db, async_engine, init_db, AsyncSessionLocal
+from src.links import cache_key_redirect, cache_key_stats, cache_key_search, cache_key_notfound
+from src.links import BATCH_INSERT_CHUNK
+from src.models import Link
+from src.schemas import CurrentUser
+from src.security import get_current_user
+from src.utils import handle_expiration, url_hash, NORMALIZED_URL
+from src.redis_client import DEFAULT_EXPIRE
+from src.local_cache import publish_invalidation
+from src.bloom import bloom_add
+from src import cache
+
+# Импорт готовых ссылок из CSV/NDJSON: файл читается потоком, строки
+# проверяются и вставляются пачками, каждая пачка — отдельная транзакция
+IMPORT_CHUNK_SIZE = 10_000
+IMPORT_WARM_BATCH = 1000
+IMPORT_PROGRESS_KEY = "import:progress"
+MAX_IMPORT_ERRORS = 100
+MAX_CODE_LENGTH = 64
+
+FORMATS = ("csv", "ndjson")
+CONFLICT_POLICIES = ("skip", "overwrite", "fail")
+CODE_CHARS = frozenset(string.ascii_letters + string.digits + "-_")
+# Коды, совпадающие с путями API, редирект никогда не получит
+RESERVED_CODES = frozenset({"shorten", "search", "archive", "import"})
+OVERWRITE_COLUMNS = ("original_url", "url_hash", "created_at", "expires_at", "clicks", "is_active")
+
+links_table = Link.__table__
+
+
+class ImportConflict(Exception):
+    def __init__(self, short_codes: list[str]):
+        super().__init__(f"Short codes already exist: {', '.join(short_codes)}")
+        self.short_codes = short_codes
+
+
+class ImportReport:
+    def __init__(self, on_conflict: str):
+        self.on_conflict = on_conflict
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.chunks = 0
+        self.errors: list[dict] = []
+        self.conflicts: list[str] = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def reject(self, row: int, detail: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append({"row": row, "detail": detail})
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def stats(self) -> dict:
+        elapsed = self.elapsed or time.perf_counter() - self.started
+        return {
+            "on_conflict": self.on_conflict,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "invalid": self.invalid,
+            "chunks": self.chunks,
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_s": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "errors": self.errors,
+            "conflicts": self.conflicts,
+        }
+
+
+def parse_datetime(value) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    moment = datetime.fromisoformat(value)
+    # В БД время хранится в UTC без зоны
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+class ImportRow(NamedTuple):
+    # Порядок полей совпадает со столбцами INSERT_COLUMNS
+    short_code: str
+    original_url: str
+    url_hash: str
+    created_at: str
+    expires_at: str
+    clicks: int
+    is_active: bool
+    user_id: Optional[int]
+
+
+INSERT_COLUMNS = ImportRow._fields
+
+
+def format_datetime(moment: datetime) -> str:
+    # Тот же формат, в котором DateTime хранит время в SQLite
+    return moment.isoformat(sep=" ", timespec="microseconds")
+
+
+def validate_row(record: dict, user_id: Optional[int], created_at: str, default_expires_at: str) -> ImportRow:
+    # Проверки дешёвые и без pydantic: на миллионах строк модель на каждую строку не по карману
+    short_code = record.get("short_code")
+    if not short_code or not isinstance(short_code, str):
+        raise ValueError("short_code is required")
+    if len(short_code) > MAX_CODE_LENGTH or not CODE_CHARS.issuperset(short_code):
+        raise ValueError("short_code must be up to 64 letters, digits, '-' or '_'")
+    if short_code in RESERVED_CODES:
+        raise ValueError("short_code is reserved")
+
+    original_url = record.get("original_url")
+    if not original_url or not isinstance(original_url, str):
+        raise ValueError("original_url is required")
+    if not NORMALIZED_URL.fullmatch(original_url):
+        parts = urlsplit(original_url)
+        if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+            raise ValueError("original_url must be an absolute http(s) URL")
+
+    clicks = record.get("clicks")
+    clicks = int(clicks) if clicks not in (None, "") else 0
+    if clicks < 0:
+        raise ValueError("clicks must not be negative")
+
+    record_created_at = parse_datetime(record.get("created_at"))
+    expires_at = parse_datetime(record.get("expires_at"))
+    return ImportRow(
+        short_code,
+        original_url,
+        url_hash(original_url),
+        format_datetime(record_created_at) if record_created_at else created_at,
+        format_datetime(expires_at) if expires_at else default_expires_at,
+        clicks,
+        True,
+        user_id,
+    )
+
+
+def validate_chunk(chunk: list[tuple[int, dict]], user_id: Optional[int], report: ImportReport) -> list[ImportRow]:
+    created_at = format_datetime(datetime.utcnow())
+    default_expires_at = format_datetime(handle_expiration(None))
+    rows = []
+    for row, record in chunk:
+        try:
+            rows.append(validate_row(record, user_id, created_at, default_expires_at))
+        except (ValueError, TypeError) as e:
+            report.reject(row, str(e))
+    report.rows += len(chunk)
+    return rows
+
+
+async def read_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for data in chunks:
+        *lines, buffer = (buffer + data).split(b"\n")
+        for line in lines:
+            yield line.decode()
+    if buffer:
+        yield buffer.decode()
+
+
+async def read_records(
+        lines: AsyncIterator[str],
+        import_format: str,
+        report: ImportReport,
+        chunk_size: int = IMPORT_CHUNK_SIZE
+) -> AsyncIterator[list[tuple[int, dict]]]:
+    # Пачки пар (номер строки данных, запись); нечитаемые строки сразу в отчёт
+    chunk = []
+    header = None
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        if import_format == "csv" and header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+            missing = {"short_code", "original_url"} - set(header)
+            if missing:
+                raise ValueError(f"CSV header is missing columns: {', '.join(sorted(missing))}")
+            continue
+
+        row += 1
+        try:
+            if import_format == "csv":
+                record = dict(zip(header, next(csv.reader([line]))))
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+        except (ValueError, csv.Error) as e:
+            report.rows += 1
+            report.reject(row, str(e))
+            continue
+
+        chunk.append((row, record))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def find_existing(db: AsyncSession, short_codes: list[str]) -> dict[str, tuple[str, Optional[int]]]:
+    existing = {}
+    for start in range(0, len(short_codes), BATCH_INSERT_CHUNK):
+        rows = await db.execute(
+            select(links_table.c.short_code, links_table.c.original_url, links_table.c.user_id)
+            .where(links_table.c.short_code.in_(short_codes[start:start + BATCH_INSERT_CHUNK]))
+        )
+        for short_code, original_url, user_id in rows:
+            existing[short_code] = (original_url, user_id)
+    return existing
+
+
+def insert_sql(on_conflict: str, owner_id: Optional[int] = None) -> str:
+    # Пачки пишутся executemany драйвера: обработка параметров в SQLAlchemy
+    # на каждую строку обходится дороже самой вставки в SQLite
+    sql = (
+        f"INSERT INTO {links_table.name} ({', '.join(INSERT_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(INSERT_COLUMNS))})"
+    )
+    if on_conflict == "skip":
+        sql += " ON CONFLICT (short_code) DO NOTHING"
+    elif on_conflict == "overwrite":
+        sql += " ON CONFLICT (short_code) DO UPDATE SET " + ", ".join(
+            f"{name} = excluded.{name}" for name in OVERWRITE_COLUMNS
+        )
+        # Через API перезаписываются только свои ссылки
+        if owner_id is not None:
+            sql += f" WHERE {links_table.name}.user_id = {int(owner_id)}"
+    return sql
+
+
+class ChunkResult:
+    def __init__(self):
+        self.inserted: list[ImportRow] = []
+        self.updated: list[ImportRow] = []
+        self.skipped: list[ImportRow] = []
+        self.stale_urls: set[str] = set()
+
+
+async def classify_chunk(
+        db: AsyncSession,
+        rows: list[ImportRow],
+        on_conflict: str,
+        owner_id: Optional[int] = None
+) -> ChunkResult:
+    # Кто будет вставлен, а кто перезаписан, известно заранее по существующим
+    # кодам: RETURNING с executemany драйвер не поддерживает
+    result = ChunkResult()
+    existing = await find_existing(db, [row.short_code for row in rows])
+    for row in rows:
+        current = existing.get(row.short_code)
+        if current is None:
+            result.inserted.append(row)
+            # Повтор кода внутри пачки — такой же конфликт, как с уже сохранённой строкой
+            existing[row.short_code] = (row.original_url, row.user_id)
+        elif on_conflict == "overwrite" and (owner_id is None or current[1] == owner_id):
+            result.updated.append(row)
+            result.stale_urls.add(current[0])
+        else:
+            result.skipped.append(row)
+    if on_conflict == "fail" and result.skipped:
+        raise ImportConflict(sorted({row.short_code for row in result.skipped})[:MAX_IMPORT_ERRORS])
+    return result
+
+
+async def insert_rows(db: AsyncSession, rows: list[ImportRow], on_conflict: str, owner_id: Optional[int] = None):
+    connection = await db.connection()
+    try:
+        await connection.exec_driver_sql(insert_sql(on_conflict, owner_id), rows)
+    except IntegrityError:
+        # Код успел занять параллельный запрос
+        raise ImportConflict([])
+
+
+def redirect_expire(row: ImportRow, now: datetime) -> int:
+    return min(DEFAULT_EXPIRE, int((datetime.fromisoformat(row.expires_at) - now).total_seconds()))
+
+
+async def warm_cache(result: ChunkResult, warm_redirects: bool):
+    # Новые коды попадают в Bloom-фильтр и выходят из негативного кэша,
+    # перезаписанные — сбрасываются в Redis и L1 всех воркеров
+    now = datetime.utcnow()
+    for start in range(0, len(result.inserted), IMPORT_WARM_BATCH):
+        batch = result.inserted[start:start + IMPORT_WARM_BATCH]
+        await bloom_add(*(row.short_code for row in batch))
+        await cache.delete(
+            *(cache_key_notfound(row.short_code) for row in batch),
+            *{cache_key_search(row.original_url) for row in batch}
+        )
+
+    for start in range(0, len(result.updated), IMPORT_WARM_BATCH):
+        batch = result.updated[start:start + IMPORT_WARM_BATCH]
+        await cache.delete(
+            *(key for row in batch for key in (cache_key_redirect(row.short_code), cache_key_stats(row.short_code))),
+            *{cache_key_search(row.original_url) for row in batch}
+        )
+        await publish_invalidation(*(row.short_code for row in batch))
+
+    stale = list(result.stale_urls)
+    for start in range(0, len(stale), IMPORT_WARM_BATCH):
+        await cache.delete(*{cache_key_search(url) for url in stale[start:start + IMPORT_WARM_BATCH]})
+
+    if warm_redirects:
+        rows = result.inserted + result.updated
+        for start in range(0, len(rows), IMPORT_WARM_BATCH):
+            batch = [
+                (row, expire) for row in rows[start:start + IMPORT_WARM_BATCH]
+                if (expire := redirect_expire(row, now)) > 0
+            ]
+            await cache.run(lambda pipe: [
+                pipe.setex(cache_key_redirect(row.short_code), expire, row.original_url)
+                for row, expire in batch
+            ])
+
+
+async def save_progress(mapping: dict):
+    await cache.run(lambda pipe: pipe.hset(IMPORT_PROGRESS_KEY, mapping=mapping))
+
+
+async def import_progress() -> dict:
+    progress, = await cache.run(lambda pipe: pipe.hgetall(IMPORT_PROGRESS_KEY), default=({},))
+    return {key.decode(): value.decode() for key, value in progress.items()}
+
+
+async def import_links(
+        db: AsyncSession,
+        lines: AsyncIterator[str],
+        import_format: str = "csv",
+        on_conflict: str = "skip",
+        user_id: Optional[int] = None,
+        owner_only: bool = False,
+        warm_redirects: bool = False,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        progress: Optional[Callable[[ImportReport], None]] = None
+) -> ImportReport:
+    report = ImportReport(on_conflict)
+    await cache.delete(IMPORT_PROGRESS_KEY)
+    await save_progress({
+        "running": 1,
+        "started_at": datetime.utcnow().isoformat(),
+        "format": import_format,
+        "on_conflict": on_conflict,
+    })
+    owner_id = user_id if owner_only else None
+    pending: Optional[tuple[asyncio.Task, ChunkResult]] = None
+
+    async def finish_chunk(task: asyncio.Task, result: ChunkResult):
+        try:
+            await task
+        except ImportConflict as e:
+            await db.rollback()
+            report.conflicts = e.short_codes
+            raise
+        await db.commit()
+        report.inserted += len(result.inserted)
+        report.updated += len(result.updated)
+        report.skipped += len(result.skipped)
+        if result.skipped and len(report.conflicts) < MAX_IMPORT_ERRORS:
+            report.conflicts.extend(row.short_code for row in result.skipped[:MAX_IMPORT_ERRORS - len(report.conflicts)])
+        await warm_cache(result, warm_redirects)
+
+        report.chunks += 1
+        await save_progress({
+            "rows": report.rows,
+            "inserted": report.inserted,
+            "updated": report.updated,
+            "skipped": report.skipped,
+            "invalid": report.invalid,
+        })
+        if progress:
+            progress(report)
+
+    try:
+        # Пока SQLite в потоке драйвера пишет одну пачку, следующая читается и проверяется
+        async for chunk in read_records(lines, import_format, report, chunk_size):
+            rows = validate_chunk(chunk, user_id, report)
+            if pending:
+                written, pending = pending, None
+                await finish_chunk(*written)
+            if rows:
+                try:
+                    result = await classify_chunk(db, rows, on_conflict, owner_id)
+                except ImportConflict as e:
+                    report.conflicts = e.short_codes
+                    raise
+                pending = asyncio.create_task(insert_rows(db, rows, on_conflict, owner_id)), result
+                # Даём задаче дойти до передачи пачки в поток драйвера
+                await asyncio.sleep(0)
+        if pending:
+            written, pending = pending, None
+            await finish_chunk(*written)
+
+        report.finish()
+        await save_progress({"finished_at": datetime.utcnow().isoformat(), "last_error": ""})
+        return report
+    except Exception as e:
+        report.finish()
+        await save_progress({"last_error": repr(e)})
+        raise
+    finally:
+        if pending:
+            pending[0].cancel()
+            await asyncio.gather(pending[0], return_exceptions=True)
+            await db.rollback()
+        await save_progress({"running": 0, "rows_per_s": report.stats()["rows_per_s"]})
+
+
+router = APIRouter(prefix="/links")
+
+
+@router.post("/import")
+async def import_links_endpoint(
+        request: Request,
+        import_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+        on_conflict: Literal["skip", "overwrite", "fail"] = "skip",
+        warm: bool = False,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: CurrentUser = Depends(get_current_user)
+):
+    # Тело запроса — сам файл; импортированные ссылки принадлежат пользователю
+    try:
+        report = await import_links(
+            db,
+            read_lines(request.stream()),
+            import_format,
+            on_conflict,
+            user_id=current_user.id,
+            owner_only=True,
+            warm_redirects=warm
+        )
+    except ImportConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    return report.stats()
+
+
+async def read_file_lines(path: str) -> AsyncIterator[str]:
+    # Синхронное чтение локального файла: event loop CLI больше ничем не занят
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")) as source:
+        for line in source:
+            yield line.rstrip("\r\n")
+
+
+def print_progress(report: ImportReport):
+    stats = report.stats()
+    print(
+        f"{stats['rows']} rows, {stats['inserted']} inserted, {stats['updated']} updated, "
+        f"{stats['skipped']} skipped, {stats['invalid']} invalid, {stats['rows_per_s']} rows/s",
+        file=sys.stderr
+    )
+
+
+async def run_import(args: argparse.Namespace, session_factory=AsyncSessionLocal) -> ImportReport:
+    import_format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    async with session_factory() as db:
+        return await import_links(
+            db,
+            read_file_lines(args.path),
+            import_format,
+            args.on_conflict,
+            user_id=args.user_id,
+            warm_redirects=args.warm_redirects,
+            chunk_size=args.chunk_size,
+            progress=None if args.quiet else print_progress
+        )
+
+
+async def then_dispose_engine(job: Awaitable):
+    # Соединения aiosqlite держат свои потоки: без dispose процесс не завершится
+    try:
+        return await job
+    finally:
+        await async_engine.dispose()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import short links from CSV or NDJSON")
+    parser.add_argument("path", help="file to import, '-' for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="by default guessed from the file extension")
+    parser.add_argument("--on-conflict", choices=CONFLICT_POLICIES, default="skip")
+    parser.add_argument("--user-id", type=int, help="owner of the imported links")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--warm-redirects", action="store_true", help="prefill the redirect cache")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Столбцы и индексы, добавленные после создания базы
+    init_db()
+    try:
+        report = asyncio.run(then_dispose_engine(run_import(args)))
+    except (ImportConflict, ValueError) as e:
+        print(f"import failed: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(report.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import Optional
-from src.database import get_db
-from src.models import User
-from src.schemas import LinkCreate, LinkResponse, LinkUpdate, LinkStats
-from src.utils import generate_short_code, handle_expiration
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import bindparam, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+from typing import Literal, Optional
+from src.database import get_async_db, SessionLocal
+from src.schemas import LinkCreate, LinkResponse, LinkUpdate, LinkStats, BatchLinkResult, CurrentUser
+from src.schemas import ClickTimeseries
+from src.utils import handle_expiration, url_hash
+from src.allocator import code_allocator
+from src.projects import unlink_counts_stmt
 from src.security import get_current_user, get_optional_user
 from src.schemas import ArchivedLinkStats
-from src.models import Link, ArchivedLink
+from src.models import Link, ArchivedLink, ClickRollup
+import csv
+import io
 import json
-import hashlib
-from src.redis_client import redis_client, DEFAULT_EXPIRE
+import tempfile
+from urllib.parse import quote
+from src.redis_client import DEFAULT_EXPIRE
+from src import cache, http_cache
+from src.cache import CacheUnavailable
+from src.clicks import record_click, pending_clicks, bucket_start, delete_rollups_stmt, BUCKET_SIZES
+from src.clicks import visitor_fingerprint, visitors_key, daily_visitors_keys, unique_visitors, unique_visitors_between
+from src.local_cache import redirect_cache, publish_invalidation, L1_TTL
+from src.bloom import bloom_add, queue_contains, contains_from_results
+from src.singleflight import coalesce, refresh_in_background, should_refresh_early
 
 
 def cache_key_redirect(short_code: str) -> str:
@@ -23,11 +40,78 @@ def cache_key_stats(short_code: str) -> str:
 
 
 def cache_key_search(original_url: str) -> str:
-    url_hash = hashlib.md5(original_url.encode()).hexdigest()
-    return f"search:{url_hash}"
+    # Все страницы выдачи по адресу — поля одного хеша, сбрасываются одним DEL
+    return f"search:{url_hash(original_url)}"
+
+
+def cache_key_notfound(short_code: str) -> str:
+    return f"notfound:{short_code}"
+
+
+NEGATIVE_EXPIRE = 30
+STATS_EXPIRE = 60
+MAX_CODE_ATTEMPTS = 5
+BULK_SPARE_CODES = 10
+MAX_BATCH_SIZE = 1000
+BATCH_INSERT_CHUNK = 500
+STREAM_SPOOL_SIZE = 1024 * 1024
+MAX_SEARCH_PAGE = 1000
+URL_HASH_BACKFILL_BATCH = 5000
+ARCHIVE_PAGE_SIZE = 100
+MAX_ARCHIVE_PAGE = 1000
+ARCHIVE_EXPORT_CHUNK = 1000
+ARCHIVE_EXPORT_COLUMNS = [
+    "short_code", "original_url", "created_at", "expires_at",
+    "clicks", "last_accessed", "archived_at",
+]
+MAX_TIMESERIES_POINTS = 1500
+DEFAULT_TIMESERIES_POINTS = 60
+# 200 с телом {"Redirect": url} — прежний ответ API; 301/302/307/308 —
+# настоящий редирект с Location. Этот же ответ отдаёт src/fast_redirect.py
+REDIRECT_STATUS = 200
+# В Location только ASCII: остальное процент-кодируется, уже закодированное не трогаем
+LOCATION_SAFE = ":/?#[]@!$&'()*+,;=%~"
+FAST_PATH_MISS = "redirect_cache_miss"
+
+links_table = Link.__table__
+
+
+async def is_known_code(short_code: str) -> bool:
+    # Отсекаем несуществующие коды без обращения к БД
+    results = await cache.run(lambda pipe: (
+        pipe.exists(cache_key_notfound(short_code)),
+        queue_contains(pipe, short_code)
+    ))
+    # Без Redis отсечь нечем — решает БД
+    if results is None:
+        return True
+    notfound, *bloom_results = results
+    return not notfound and contains_from_results(bloom_results)
+
+
+async def with_ttl(load) -> tuple[object, None]:
+    # Загрузчики возвращают значение, а читатели кэша — пару (значение, TTL)
+    return await load, None
+
+
+async def remember_unknown_code(short_code: str):
+    await cache.setex(cache_key_notfound(short_code), NEGATIVE_EXPIRE, 1)
+
+
+async def count_click(db: AsyncSession, short_code: str, visitor: str):
+    try:
+        await record_click(short_code, visitor)
+    except CacheUnavailable:
+        # Redis недоступен: клик сразу пишем в БД
+        await db.execute(
+            update(links_table)
+            .where(links_table.c.short_code == short_code)
+            .values(clicks=links_table.c.clicks + 1, last_accessed=datetime.utcnow())
+        )
+        await db.commit()
 
 
-def check_link_ownership(link: Link, user: Optional[User]):
+def check_link_ownership(link: Link, user: Optional[CurrentUser]):
     if link.user_id is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -43,19 +127,19 @@ def check_link_ownership(link: Link, user: Optional[User]):
 router = APIRouter(prefix="/links")
 
 @router.post("/shorten", response_model=LinkResponse)
-def create_short_link(
+async def create_short_link(
     link: LinkCreate,
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_optional_user)  
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)  
 ):
 
     expires_at = handle_expiration(link.expires_at)
 
     if link.custom_alias:
-        existing = db.query(Link).filter(
+        existing = (await db.execute(select(Link).where(
             (Link.short_code == link.custom_alias) |
             (Link.custom_alias == link.custom_alias)
-        ).first()
+        ))).scalars().first()
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
@@ -63,21 +147,41 @@ def create_short_link(
             )
         short_code = link.custom_alias
     else:
-        short_code = generate_short_code()
-        while db.query(Link).filter_by(short_code=short_code).first():
-            short_code = generate_short_code()
+        short_code = (await code_allocator.allocate(db.bind))[0]
 
     db_link = Link(
         original_url=str(link.original_url),
         short_code=short_code,
-        custom_alias=link.custom_alias,
+        custom_alias=link.custom_alias or None,
         expires_at=expires_at,
         user_id=current_user.id if current_user else None  
     )
 
-    db.add(db_link)
-    db.commit()
-    db.refresh(db_link)
+    # Выданный код заранее не проверяем: редкое совпадение с чужим алиасом
+    # ловит уникальный индекс, и код выдаётся заново
+    for attempt in range(MAX_CODE_ATTEMPTS):
+        db.add(db_link)
+        try:
+            await db.commit()
+            break
+        except IntegrityError:
+            await db.rollback()
+            if link.custom_alias:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Alias already exists"
+                )
+            if attempt == MAX_CODE_ATTEMPTS - 1:
+                raise
+            short_code = (await code_allocator.allocate(db.bind))[0]
+            db_link.short_code = short_code
+    await db.refresh(db_link)
+
+    await bloom_add(short_code)
+    await cache.delete(
+        cache_key_notfound(short_code),
+        cache_key_search(db_link.original_url)
+    )
 
     return {
         **link.dict(),
@@ -86,156 +190,599 @@ def create_short_link(
     }
 
 
-@router.get("/{short_code}")
-async def redirect_link(short_code: str, db: Session = Depends(get_db)):
-    # Проверяем кэш
-    cached_url = redis_client.get(cache_key_redirect(short_code))
-    if cached_url:
-        return {"Redirect": cached_url.decode()}
+async def find_taken_aliases(db: AsyncSession, aliases: list[str]) -> set[str]:
+    taken = set()
+    for start in range(0, len(aliases), BATCH_INSERT_CHUNK):
+        chunk = aliases[start:start + BATCH_INSERT_CHUNK]
+        rows = await db.execute(select(Link.short_code, Link.custom_alias).where(
+            Link.short_code.in_(chunk) | Link.custom_alias.in_(chunk)
+        ))
+        for short_code, custom_alias in rows:
+            taken.update(code for code in (short_code, custom_alias) if code)
+    return taken
+
+
+async def insert_link_rows(db: AsyncSession, rows: list[dict]) -> set[str]:
+    # Строки с занятыми кодами пропускаются, RETURNING говорит, что вставлено
+    inserted = set()
+    for start in range(0, len(rows), BATCH_INSERT_CHUNK):
+        chunk = rows[start:start + BATCH_INSERT_CHUNK]
+        result = await db.execute(
+            insert(links_table).on_conflict_do_nothing().returning(links_table.c.short_code),
+            chunk
+        )
+        inserted.update(result.scalars().all())
+    return inserted
+
+
+async def create_links_bulk(
+        db: AsyncSession,
+        items: list[tuple[int, LinkCreate]],
+        user_id: Optional[int]
+) -> list[dict]:
+    results = {}
+    aliases = [item.custom_alias for _, item in items if item.custom_alias]
+    taken = await find_taken_aliases(db, aliases) if aliases else set()
+
+    # Запасные коды на совпадения с чужими алиасами выдаются заранее: после
+    # первого INSERT сессия держит запись в БД, и аренда блока в отдельной
+    # транзакции упёрлась бы в неё ("database is locked" на SQLite)
+    generated = [index for index, item in items if not item.custom_alias]
+    spare = min(len(generated), BULK_SPARE_CODES)
+    codes = iter(await code_allocator.allocate(db.bind, len(generated) + spare))
+
+    created_at = datetime.utcnow()
+    rows = {}
+    for index, item in items:
+        if item.custom_alias:
+            if item.custom_alias in taken:
+                results[index] = {"index": index, "status": "conflict", "detail": "Alias already exists"}
+                continue
+            # Повтор алиаса внутри пачки — тоже конфликт
+            taken.add(item.custom_alias)
+        rows[index] = {
+            "original_url": str(item.original_url),
+            "url_hash": url_hash(str(item.original_url)),
+            "short_code": item.custom_alias or next(codes),
+            "custom_alias": item.custom_alias or None,
+            "created_at": created_at,
+            "expires_at": handle_expiration(item.expires_at),
+            "clicks": 0,
+            "is_active": True,
+            "user_id": user_id,
+        }
+
+    pending = rows
+    for attempt in range(MAX_CODE_ATTEMPTS):
+        inserted = await insert_link_rows(db, list(pending.values()))
+        retry = {}
+        for index, row in pending.items():
+            if row["short_code"] in inserted:
+                results[index] = {
+                    "index": index,
+                    "status": "created",
+                    "short_url": row["short_code"],
+                    "original_url": row["original_url"],
+                    "created_at": created_at,
+                }
+            elif row["custom_alias"] or attempt == MAX_CODE_ATTEMPTS - 1:
+                results[index] = {"index": index, "status": "conflict", "detail": "Alias already exists"}
+            else:
+                retry[index] = row
+        # Сгенерированный код совпал с чужим алиасом — выдаём следующий из запаса
+        pending = {}
+        for index, row in retry.items():
+            short_code = next(codes, None)
+            if short_code is None:
+                results[index] = {"index": index, "status": "conflict", "detail": "Alias already exists"}
+                continue
+            row["short_code"] = short_code
+            pending[index] = row
+        if not pending:
+            break
+
+    await db.commit()
+
+    created = [result for result in results.values() if result["status"] == "created"]
+    if created:
+        await bloom_add(*(result["short_url"] for result in created))
+        await cache.delete(
+            *(cache_key_notfound(result["short_url"]) for result in created),
+            *{cache_key_search(result["original_url"]) for result in created}
+        )
+
+    return [results[index] for index, _ in items]
+
+
+@router.post("/shorten/batch", response_model=list[BatchLinkResult], response_model_exclude_none=True)
+async def create_short_links_batch(
+    links: list[LinkCreate],
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)
+):
+    if len(links) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch size exceeds {MAX_BATCH_SIZE} links"
+        )
 
-    link = db.query(Link).filter(
+    return await create_links_bulk(
+        db,
+        list(enumerate(links)),
+        current_user.id if current_user else None
+    )
+
+
+@router.post("/shorten/batch/stream")
+async def create_short_links_stream(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)
+):
+    # NDJSON на входе и выходе; результаты копятся во временном файле,
+    # так что память не зависит от размера загрузки
+    user_id = current_user.id if current_user else None
+    output = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_SIZE, mode="w+")
+    chunk = []
+    index = 0
+
+    async def accept(line: bytes):
+        nonlocal index
+        if not line.strip():
+            return
+        try:
+            chunk.append((index, LinkCreate.model_validate_json(line)))
+        except ValidationError as e:
+            output.write(json.dumps({
+                "index": index,
+                "status": "invalid",
+                "detail": e.errors(include_url=False, include_context=False, include_input=False)
+            }, default=str) + "\n")
+        index += 1
+        if len(chunk) >= MAX_BATCH_SIZE:
+            await flush_chunk()
+
+    async def flush_chunk():
+        for result in await create_links_bulk(db, chunk, user_id):
+            output.write(BatchLinkResult(**result).model_dump_json(exclude_none=True) + "\n")
+        chunk.clear()
+
+    buffer = b""
+    async for data in request.stream():
+        *lines, buffer = (buffer + data).split(b"\n")
+        for line in lines:
+            await accept(line)
+    await accept(buffer)
+    if chunk:
+        await flush_chunk()
+
+    output.seek(0)
+
+    def read_results():
+        with output:
+            yield from output
+
+    return StreamingResponse(read_results(), media_type="application/x-ndjson")
+
+
+async def read_cached_redirect(short_code: str) -> Optional[tuple[str, Optional[float]]]:
+    cached = await cache.get_with_ttl(cache_key_redirect(short_code))
+    if not cached:
+        return None
+    cached_url, ttl = cached
+    return cached_url.decode(), ttl
+
+
+def active_link_query(short_code: str):
+    return select(Link).where(
         (Link.short_code == short_code) &
         (Link.is_active == True)
-    ).first()
+    )
+
+
+async def load_redirect(db: AsyncSession, short_code: str) -> tuple[str, float]:
+    link = (await db.execute(active_link_query(short_code))).scalars().first()
 
     if not link:
+        await remember_unknown_code(short_code)
         raise HTTPException(status_code=404, detail="Link not found")
 
-    if link.expires_at and link.expires_at < datetime.utcnow():
-        archived_link = ArchivedLink(
-            original_url=link.original_url,
-            short_code=link.short_code,
-            created_at=link.created_at,
-            expires_at=link.expires_at,
-            clicks=link.clicks,
-            last_accessed=link.last_accessed,
-            user_id=link.user_id
-        )
-        db.add(archived_link)
-        db.delete(link)
-        db.commit()
-        # Очищаем кэш
-        redis_client.delete(cache_key_redirect(short_code))
-        raise HTTPException(status_code=410, detail="Link expired and archived")
+    # Архивирует просроченные ссылки фоновая задача (src/expiry.py)
+    expire = DEFAULT_EXPIRE
+    if link.expires_at:
+        expire = min(expire, int((link.expires_at - datetime.utcnow()).total_seconds()))
+        if expire <= 0:
+            raise HTTPException(status_code=410, detail="Link expired")
 
     # Обновляем кэш
-    redis_client.setex(
+    await cache.setex(
         cache_key_redirect(short_code),
-        DEFAULT_EXPIRE,
+        expire,
         link.original_url
     )
+    return link.original_url, expire
+
 
-    # Обновляем статистику
-    link.clicks += 1
-    link.last_accessed = datetime.utcnow()
-    db.commit()
+def location_header(url: str) -> str:
+    return quote(url, safe=LOCATION_SAFE)
 
-    return {"Redirect": link.original_url}
+
+def redirect_response(url: str, ttl: Optional[float]) -> Response:
+    headers = {"cache-control": http_cache.redirect_cache_control(ttl)}
+    if REDIRECT_STATUS == 200:
+        return JSONResponse({"Redirect": url}, headers=headers)
+    headers["location"] = location_header(url)
+    return Response(status_code=REDIRECT_STATUS, headers=headers)
+
+
+@router.get("/{short_code}")
+async def redirect_link(short_code: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    visitor = visitor_fingerprint(
+        request.client.host if request.client else None,
+        request.headers.get("user-agent")
+    )
+
+    # Проверяем L1-кэш воркера, затем Redis
+    cached_l1 = redirect_cache.get_with_ttl(short_code)
+    if cached_l1:
+        await count_click(db, short_code, visitor)
+        return redirect_response(*cached_l1)
+
+    cache_key = cache_key_redirect(short_code)
+    # Быстрый путь (src/fast_redirect.py) уже спросил Redis и получил промах
+    fast_path_missed = getattr(request.state, FAST_PATH_MISS, False)
+    cached = None if fast_path_missed else await read_cached_redirect(short_code)
+    if cached:
+        url, ttl = cached
+        if ttl and should_refresh_early(cache_key, ttl):
+            refresh_in_background(db.bind, cache_key, lambda session: load_redirect(session, short_code))
+    else:
+        if not await is_known_code(short_code):
+            raise HTTPException(status_code=404, detail="Link not found")
+        # Одновременные промахи по одному коду идут в БД одним запросом
+        url, ttl = await coalesce(
+            cache_key,
+            lambda: load_redirect(db, short_code),
+            lambda: read_cached_redirect(short_code)
+        )
+
+    # L1 не должен пережить запись в Redis, ограниченную сроком жизни ссылки
+    redirect_cache.set(short_code, url, min(L1_TTL, ttl) if ttl else None)
+
+    # Статистика копится в Redis и сбрасывается в БД фоновой задачей
+    await count_click(db, short_code, visitor)
+
+    return redirect_response(url, ttl)
 
 
 @router.put("/{short_code}")
-def update_link(
+async def update_link(
         short_code: str,
         update: LinkUpdate,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
-    link = db.query(Link).filter_by(short_code=short_code).first()
+    link = (await db.execute(select(Link).filter_by(short_code=short_code))).scalars().first()
     if not link:
         raise HTTPException(status_code=404, detail="Link not found")
 
     check_link_ownership(link, current_user)
 
+    old_url = link.original_url
     link.original_url = str(update.new_url)
-    db.commit()
+    link.url_hash = url_hash(link.original_url)
+    await db.commit()
+
+    # Очищаем кэш: ссылка пропадает из выдачи по старому адресу и появляется в новой
+    await cache.delete(
+        cache_key_redirect(short_code),
+        cache_key_stats(short_code),
+        cache_key_search(old_url),
+        cache_key_search(link.original_url)
+    )
+    await publish_invalidation(short_code)
     return {"message": "Link updated successfully"}
 
 
 @router.delete("/{short_code}")
-def delete_link(
+async def delete_link(
         short_code: str,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: CurrentUser = Depends(get_current_user)
 ):
-    link = db.query(Link).filter_by(short_code=short_code).first()
+    link = (await db.execute(select(Link).filter_by(short_code=short_code))).scalars().first()
     if not link:
         raise HTTPException(status_code=404, detail="Link not found")
 
     check_link_ownership(link, current_user)
 
-    db.delete(link)
-    db.commit()
+    await db.execute(unlink_counts_stmt([link.id]))
+    await db.execute(delete_rollups_stmt([short_code]))
+    await db.delete(link)
+    await db.commit()
 
     # Очищаем кэш
-    redis_client.delete(
+    await cache.delete(
         cache_key_redirect(short_code),
-        cache_key_stats(short_code)
+        cache_key_stats(short_code),
+        cache_key_search(link.original_url),
+        visitors_key(short_code),
+        *daily_visitors_keys(short_code, link.created_at)
     )
+    await publish_invalidation(short_code)
 
     return {"message": "Link deleted"}
 
 
-@router.get("/{short_code}/stats", response_model=LinkStats)
-async def get_link_stats(short_code: str, db: Session = Depends(get_db)):
-    cache_key = cache_key_stats(short_code)
-    cached_stats = redis_client.get(cache_key)
-    if cached_stats:
-        return json.loads(cached_stats)
-
-    link = db.query(Link).filter_by(short_code=short_code).first()
+async def load_stats(db: AsyncSession, short_code: str) -> bytes:
+    link = (await db.execute(select(Link).filter_by(short_code=short_code))).scalars().first()
     if not link:
+        await remember_unknown_code(short_code)
         raise HTTPException(status_code=404, detail="Link not found")
 
+    # Учитываем клики, ещё не сброшенные в БД
+    pending, pending_accessed = await pending_clicks(short_code)
+    visitors, = await unique_visitors(short_code)
+    last_accessed = link.last_accessed
+    if pending_accessed and (last_accessed is None or pending_accessed > last_accessed):
+        last_accessed = pending_accessed
+
     stats_data = {
         "original_url": link.original_url,
         "created_at": link.created_at.isoformat(),
-        "clicks": link.clicks,
-        "last_accessed": link.last_accessed.isoformat() if link.last_accessed else None,
+        "clicks": link.clicks + pending,
+        "unique_visitors": visitors,
+        "last_accessed": last_accessed.isoformat() if last_accessed else None,
         "expires_at": link.expires_at.isoformat() if link.expires_at else None
     }
+    # В кэше — уже проверенный и сериализованный ответ: попадание отдаёт эти
+    # байты как есть, а ETag считается по ним
+    payload = LinkStats.model_validate(stats_data).model_dump_json().encode()
+
+    await cache.setex(
+        cache_key_stats(short_code),
+        STATS_EXPIRE,
+        payload
+    )
+
+    return payload
+
+
+@router.get("/{short_code}/stats", response_model=LinkStats)
+async def get_link_stats(short_code: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    cache_key = cache_key_stats(short_code)
+    cached = await cache.get_with_ttl(cache_key)
+    if cached:
+        payload, ttl = cached
+        if ttl and should_refresh_early(cache_key, ttl):
+            refresh_in_background(db.bind, cache_key, lambda session: load_stats(session, short_code))
+    else:
+        if not await is_known_code(short_code):
+            raise HTTPException(status_code=404, detail="Link not found")
+
+        payload, ttl = await coalesce(
+            cache_key,
+            lambda: with_ttl(load_stats(db, short_code)),
+            lambda: cache.get_with_ttl(cache_key)
+        )
+        ttl = ttl or STATS_EXPIRE
 
-    redis_client.setex(
-        cache_key,
-        60,
-        json.dumps(stats_data)
+    # Тело меняется вместе с clicks, last_accessed и самой ссылкой — по нему и ETag
+    return http_cache.conditional_json(
+        request, payload, http_cache.etag(payload), http_cache.stats_cache_control(ttl)
     )
 
-    return stats_data
+
+def as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("/{short_code}/stats/timeseries", response_model=ClickTimeseries)
+async def get_link_timeseries(
+        short_code: str,
+        start: Optional[datetime] = Query(None, alias="from"),
+        end: Optional[datetime] = Query(None, alias="to"),
+        granularity: Literal["minute", "hour", "day"] = "hour",
+        db: AsyncSession = Depends(get_async_db)
+):
+    if not await is_known_code(short_code):
+        raise HTTPException(status_code=404, detail="Link not found")
+    link_id = (await db.execute(select(Link.id).filter_by(short_code=short_code))).scalar()
+    if link_id is None:
+        raise HTTPException(status_code=404, detail="Link not found")
+
+    step = BUCKET_SIZES[granularity]
+    end = bucket_start(as_utc(end) or datetime.utcnow(), granularity)
+    start = bucket_start(as_utc(start) or end - step * (DEFAULT_TIMESERIES_POINTS - 1), granularity)
+    if start > end:
+        raise HTTPException(status_code=422, detail="'from' must not be later than 'to'")
+    if (end - start) / step >= MAX_TIMESERIES_POINTS:
+        raise HTTPException(status_code=422, detail=f"Range exceeds {MAX_TIMESERIES_POINTS} buckets")
+
+    # Только свёрнутые бакеты: последние минуты появляются после rollup_clicks
+    rows = await db.execute(
+        select(ClickRollup.bucket, ClickRollup.clicks).where(
+            (ClickRollup.short_code == short_code) &
+            (ClickRollup.granularity == granularity) &
+            (ClickRollup.bucket >= start) &
+            (ClickRollup.bucket <= end)
+        )
+    )
+    clicks = dict(rows.all())
+
+    points = []
+    bucket = start
+    while bucket <= end:
+        points.append({"bucket": bucket, "clicks": clicks.get(bucket, 0)})
+        bucket += step
+
+    return {
+        "short_code": short_code,
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "points": points,
+        "unique_visitors": await unique_visitors_between(short_code, start, end + step),
+    }
+
+
+def search_page_field(cursor: Optional[int], limit: Optional[int]) -> str:
+    return f"{cursor or 0}:{limit or 'all'}"
+
+
+async def read_cached_search(cache_key: str, field: str) -> Optional[tuple[dict, Optional[float]]]:
+    cached = await cache.hget_with_ttl(cache_key, field)
+    if not cached:
+        return None
+    value, ttl = cached
+    return json.loads(value), ttl
+
+
+async def load_search(
+        db: AsyncSession,
+        original_url: str,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None
+) -> dict:
+    query = select(Link).where(Link.url_hash == url_hash(original_url)).order_by(Link.id)
+    if cursor:
+        query = query.where(Link.id > cursor)
+    if limit:
+        query = query.limit(limit + 1)
+    links = (await db.execute(query)).scalars().all()
+    if not links and not cursor:
+        raise HTTPException(status_code=404, detail="Link not found")
+
+    next_cursor = None
+    if limit and len(links) > limit:
+        links = links[:limit]
+        next_cursor = links[-1].id
+
+    page = {
+        "items": [{
+            "original_url": link.original_url,
+            "short_code": link.short_code,
+            "created_at": link.created_at.isoformat(),
+            "expires_at": link.expires_at.isoformat() if link.expires_at else None
+        } for link in links],
+        "next_cursor": next_cursor,
+    }
+
+    # TTL ставится первой странице, остальные живут не дольше неё. EXPIRE NX
+    # есть только в Redis 7: TTL читается тем же конвейером, что и запись
+    cache_key = cache_key_search(original_url)
+    results = await cache.run(lambda pipe: (
+        pipe.ttl(cache_key),
+        pipe.hset(cache_key, search_page_field(cursor, limit), json.dumps(page))
+    ))
+    if results is not None and results[0] < 0:
+        await cache.run(lambda pipe: pipe.expire(cache_key, DEFAULT_EXPIRE))
+
+    return page
 
 
 @router.get("/search/")
-async def search_links(original_url: str, db: Session = Depends(get_db)):
+async def search_links(
+        original_url: str,
+        response: Response,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_SEARCH_PAGE),
+        cursor: Optional[int] = Query(None, ge=0),
+        db: AsyncSession = Depends(get_async_db)
+):
     cache_key = cache_key_search(original_url)
-    cached_result = redis_client.get(cache_key)
-    if cached_result:
-        return json.loads(cached_result)
+    field = search_page_field(cursor, limit)
+    cached = await read_cached_search(cache_key, field)
+    if cached:
+        page, ttl = cached
+        if ttl and should_refresh_early(cache_key, ttl):
+            refresh_in_background(
+                db.bind,
+                f"{cache_key}|{field}",
+                lambda session: load_search(session, original_url, cursor, limit)
+            )
+    else:
+        page, _ = await coalesce(
+            f"{cache_key}|{field}",
+            lambda: with_ttl(load_search(db, original_url, cursor, limit)),
+            lambda: read_cached_search(cache_key, field)
+        )
 
-    links = db.query(Link).filter(Link.original_url == original_url).all()
-    if not links:
-        raise HTTPException(status_code=404, detail="Link not found")
+    # Без limit выдача целиком, как раньше; курсор следующей страницы — в заголовке
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = str(page["next_cursor"])
+    return page["items"]
+
+
+def backfill_url_hashes(session_factory=SessionLocal, batch_size: int = URL_HASH_BACKFILL_BATCH) -> int:
+    # Ссылки, созданные до появления столбца url_hash
+    filled = 0
+    while True:
+        with session_factory() as db:
+            rows = db.execute(
+                select(links_table.c.id, links_table.c.original_url)
+                .where(links_table.c.url_hash.is_(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return filled
+            db.execute(
+                update(links_table).where(links_table.c.id == bindparam("b_id")),
+                [{"b_id": row.id, "url_hash": url_hash(row.original_url)} for row in rows]
+            )
+            db.commit()
+            filled += len(rows)
 
-    result = [{
-        "original_url": link.original_url,
-        "short_code": link.short_code,
-        "created_at": link.created_at.isoformat(),
-        "expires_at": link.expires_at.isoformat() if link.expires_at else None
-    } for link in links]
 
-    redis_client.setex(
-        cache_key,
-        DEFAULT_EXPIRE,
-        json.dumps(result)
-    )
+def encode_archive_cursor(archived_at: datetime, link_id: int) -> str:
+    return f"{archived_at.isoformat()}_{link_id}"
+
+
+def decode_archive_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        archived_at, link_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(archived_at), int(link_id)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
 
 
 @router.get("/archive/", response_model=list[ArchivedLinkStats])
-def get_archive(
-        db: Session = Depends(get_db),
-        user: User = Depends(get_current_user)
+async def get_archive(
+        request: Request,
+        response: Response,
+        limit: int = Query(ARCHIVE_PAGE_SIZE, ge=1, le=MAX_ARCHIVE_PAGE),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_async_db),
+        user: CurrentUser = Depends(get_current_user)
 ):
-    archived = db.query(ArchivedLink).filter(
-        ArchivedLink.user_id == user.id
-    ).order_by(ArchivedLink.archived_at.desc()).all()
+    # Курсор — последняя отданная строка (archived_at, id): страница берётся
+    # по индексу без OFFSET
+    query = (
+        select(ArchivedLink)
+        .where(ArchivedLink.user_id == user.id)
+        .order_by(ArchivedLink.archived_at.desc(), ArchivedLink.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(
+            tuple_(ArchivedLink.archived_at, ArchivedLink.id) < tuple_(*decode_archive_cursor(cursor))
+        )
+    archived = (await db.execute(query)).scalars().all()
+
+    page_headers = {}
+    if len(archived) > limit:
+        archived = archived[:limit]
+        page_headers["X-Next-Cursor"] = encode_archive_cursor(archived[-1].archived_at, archived[-1].id)
+
+    # Архив только пополняется, строки не меняются: страницу определяют id
+    tag = http_cache.etag(*(link.id for link in archived), page_headers.get("X-Next-Cursor"))
+    unchanged = http_cache.not_modified(request, tag, http_cache.PRIVATE_REVALIDATE, page_headers)
+    if unchanged:
+        return unchanged
+    response.headers.update(page_headers)
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = http_cache.PRIVATE_REVALIDATE
 
     return [
         {
@@ -248,3 +795,49 @@ def get_archive(
         }
         for link in archived
     ]
+
+
+def format_archive_row(row, export_format: str) -> str:
+    values = {
+        name: value.isoformat() if isinstance(value, datetime) else value
+        for name, value in zip(ARCHIVE_EXPORT_COLUMNS, row)
+    }
+    if export_format == "ndjson":
+        return json.dumps(values) + "\n"
+    line = io.StringIO()
+    csv.writer(line).writerow(values.values())
+    return line.getvalue()
+
+
+@router.get("/archive/export")
+async def export_archive(
+        export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+        db: AsyncSession = Depends(get_async_db),
+        user: CurrentUser = Depends(get_current_user)
+):
+    archived_table = ArchivedLink.__table__
+    query = (
+        select(*(archived_table.c[name] for name in ARCHIVE_EXPORT_COLUMNS))
+        .where(archived_table.c.user_id == user.id)
+        .order_by(archived_table.c.archived_at.desc(), archived_table.c.id.desc())
+        .execution_options(yield_per=ARCHIVE_EXPORT_CHUNK)
+    )
+    # Сессия зависимости закрывается до отправки тела: поток читает в своей
+    bind = db.bind
+
+    async def rows():
+        if export_format == "csv":
+            line = io.StringIO()
+            csv.writer(line).writerow(ARCHIVE_EXPORT_COLUMNS)
+            yield line.getvalue()
+        async with AsyncSession(bind) as session:
+            result = await session.stream(query)
+            async for partition in result.partitions():
+                yield "".join(format_archive_row(row, export_format) for row in partition)
+
+    media_type = "application/x-ndjson" if export_format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="archive.{export_format}"'}
+    )
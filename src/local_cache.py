@@ -0,0 +1,138 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Optional
+from src.redis_client import redis_client, async_pubsub_client
+from src import cache, metrics
+
+# L1-кэш редиректов в памяти воркера перед Redis
+L1_MAXSIZE = 10_000
+L1_TTL = 30
+INVALIDATION_CHANNEL = "cache:invalidate:redirect"
+RECONNECT_DELAY = 1
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        item = self.get_with_ttl(key)
+        return item[0] if item else None
+
+    def get_with_ttl(self, key: str) -> Optional[tuple[str, float]]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = item
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value, remaining
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + (ttl if ttl is not None else self.ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *keys: str):
+        for key in keys:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+redirect_cache = TTLCache(L1_MAXSIZE, L1_TTL)
+metrics.register(metrics.Callback(
+    "redirect_l1_requests_total", "In-process redirect cache lookups", ("result",),
+    lambda: {("hit",): redirect_cache.hits, ("miss",): redirect_cache.misses},
+    kind="counter"
+))
+metrics.register(metrics.Callback(
+    "redirect_l1_entries", "Entries in the in-process redirect cache", (),
+    lambda: {(): len(redirect_cache)}
+))
+_listener_task: Optional[asyncio.Task] = None
+
+
+async def publish_invalidation(*short_codes: str):
+    if not short_codes:
+        return
+    redirect_cache.invalidate(*short_codes)
+    await cache.run(lambda pipe: pipe.publish(INVALIDATION_CHANNEL, json.dumps(short_codes)))
+
+
+def broadcast_invalidation(*short_codes: str):
+    # Для фоновых задач вне event loop: L1 каждого воркера, включая текущий,
+    # очищается через подписку
+    if short_codes:
+        redis_client.publish(INVALIDATION_CHANNEL, json.dumps(short_codes))
+
+
+async def listen_for_invalidations():
+    while True:
+        pubsub = async_pubsub_client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Пока подписки не было, сообщения могли потеряться
+            redirect_cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    redirect_cache.invalidate(*json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await asyncio.sleep(RECONNECT_DELAY)
+        finally:
+            await pubsub.aclose()
+
+
+def start_invalidation_listener():
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(listen_for_invalidations())
+
+
+async def stop_invalidation_listener():
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
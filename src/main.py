@@ -1,22 +1,85 @@
 from fastapi import FastAPI
-from src.database import init_db
-from src import links, auth
-from src.projects import router as projects_router
+from fastapi.responses import Response
+from src.database import init_db, engine, SessionLocal, async_engine
+from src.redis_client import close_async_clients
+from src.scheduler import start_scheduler, shutdown_scheduler
+from src.local_cache import redirect_cache, start_invalidation_listener, stop_invalidation_listener
+from src.expiry import sweeper_progress
+from src.cache import breaker
+from src import links, auth, importer, metrics, profiler, admission
+from src.fast_redirect import FastRedirectMiddleware
+from src.passwords import shutdown_executor
+from src.projects import router as projects_router, recount_project_links
 
 app = FastAPI()
+# Последний добавленный — внешний: метрики и профиль видят и быстрый путь редиректа
+app.add_middleware(FastRedirectMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiler.ProfilerMiddleware)
+# Снаружи всех: отклонённые запросы не доходят даже до метрик маршрутов
+app.add_middleware(admission.AdmissionMiddleware)
+
+
+# База, которую старт приложения создаёт и дозаполняет; тесты подставляют свою
+startup_engine = engine
+startup_session_factory = SessionLocal
 
 
 @app.on_event("startup")
 def startup_event():
 
-    init_db()
+    added_columns = init_db(startup_engine)
+    links.backfill_url_hashes(startup_session_factory)
+    # Счётчик дальше поддерживается сам: пересчёт нужен только сразу после
+    # появления столбца, а не при каждом старте каждого воркера
+    if "projects.links_count" in added_columns:
+        recount_project_links(startup_session_factory)
+    start_scheduler()
+
+
+@app.on_event("startup")
+async def start_listeners():
+    start_invalidation_listener()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    shutdown_scheduler()
+    shutdown_executor()
 
 
+@app.on_event("shutdown")
+async def stop_listeners():
+    await stop_invalidation_listener()
+    # Соединения Redis и aiosqlite живут в event loop приложения
+    await close_async_clients()
+    await async_engine.dispose()
+
+
+app.include_router(importer.router)
 app.include_router(links.router)
 app.include_router(auth.router)
 app.include_router(projects_router)
+if profiler.PROFILE_TOKEN:
+    app.include_router(profiler.router)
 
 
 @app.get("/")
 def read_root():
     return {"message": "URL Shortener Service"}
+
+
+@app.get("/status")
+async def read_status():
+    return {
+        "redirect_cache": redirect_cache.stats(),
+        "redis_breaker": breaker.stats(),
+        "expiry_sweeper": await sweeper_progress(),
+        "importer": await importer.import_progress(),
+        "admission": admission.controller.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,219 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Метрики процесса в текстовом формате Prometheus. Запись — счётчик в
+# словаре и bisect по корзинам, без блокировок: почти всё пишется из
+# event loop, а редкая потеря инкремента из фоновых потоков допустима
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.00001, 0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+UNMATCHED_ROUTE = "unmatched"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in list(self.values.items()):
+            yield self.name, format_labels(self.labels, labels), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # Значения меток -> [счётчики корзин..., корзина +Inf, сумма]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        bounds = self.buckets + (float("inf"),)
+        for labels, series in list(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                yield f"{self.name}_bucket", format_labels(self.labels, labels, f'le="{format_value(bound)}"'), cumulative
+            yield f"{self.name}_sum", format_labels(self.labels, labels), series[-1]
+            yield f"{self.name}_count", format_labels(self.labels, labels), cumulative
+
+
+class Callback:
+    # Значения снимаются при отдаче /metrics из уже существующих счётчиков
+    def __init__(self, name: str, help: str, labels: tuple, collect: Callable[[], dict], kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self):
+        for labels, value in self.collect().items():
+            yield self.name, format_labels(self.labels, labels), value
+
+
+registry: list = []
+
+
+def register(metric):
+    registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+http_requests = register(Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+))
+http_latency = register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+))
+request_queries = register(Histogram(
+    "http_request_db_queries", "Database queries per HTTP request", ("route",), QUERY_COUNT_BUCKETS
+))
+request_db_time = register(Histogram(
+    "http_request_db_seconds", "Database time per HTTP request", ("route",), LATENCY_BUCKETS
+))
+db_queries = register(Histogram(
+    "db_query_duration_seconds", "Duration of every database statement", (), QUERY_BUCKETS
+))
+pool_wait = register(Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled connection", ("pool",), POOL_WAIT_BUCKETS
+))
+cache_requests = register(Counter(
+    "cache_requests_total", "Redis cache lookups by key namespace and result", ("namespace", "result")
+))
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Гринлеты SQLAlchemy наследуют контекст запроса, поэтому события движка
+# видят его RequestStats и в async-сессиях
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("metrics_request", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    db_queries.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def observe_pool_checkout(pool: str, seconds: float):
+    pool_wait.observe(seconds, pool)
+
+
+def cache_namespace(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def record_cache_lookup(key: str, result: str):
+    cache_requests.inc(cache_namespace(key), result)
+
+
+def record_request(method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+    http_requests.inc(method, route, status)
+    http_latency.observe(elapsed, method, route)
+    request_queries.observe(stats.queries, route)
+    request_db_time.observe(stats.db_seconds, route)
+
+
+def route_template(scope) -> str:
+    # Шаблон пути вместо самого пути: иначе по метке на каждый короткий код
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            record_request(scope["method"], route_template(scope), status, elapsed, stats)
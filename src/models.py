@@ -1,7 +1,12 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index, Table
 from sqlalchemy.orm import relationship
 from src.database import Base
+from src.utils import url_hash
+
+
+def default_url_hash(context):
+    return url_hash(context.get_current_parameters()["original_url"])
 
 
 class User(Base):
@@ -28,6 +33,28 @@ class ArchivedLink(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     archived_at = Column(DateTime, default=datetime.utcnow)
 
+    # Архив пользователя листается по (archived_at, id) от новых к старым
+    __table_args__ = (
+        Index("ix_archived_links_user_archived", "user_id", "archived_at", "id"),
+    )
+
+
+class CodeSequence(Base):
+    __tablename__ = "code_sequences"
+
+    name = Column(String, primary_key=True)
+    next_value = Column(Integer, nullable=False, default=0)
+
+
+class ClickRollup(Base):
+    __tablename__ = "click_rollups"
+
+    # Клики ссылки, сгруппированные по минутам, часам и суткам
+    short_code = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    clicks = Column(Integer, nullable=False, default=0)
+
 
 class Project(Base):
     __tablename__ = "projects"
@@ -36,6 +63,8 @@ class Project(Base):
     name = Column(String, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Поддерживается при добавлении и удалении ссылок, без COUNT по связям
+    links_count = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 # Таблица для связи многие-ко-многим
@@ -43,7 +72,10 @@ link_project_association = Table(
     'link_project_association',
     Base.metadata,
     Column('link_id', Integer, ForeignKey('links.id')),
-    Column('project_id', Integer, ForeignKey('projects.id'))
+    Column('project_id', Integer, ForeignKey('projects.id')),
+    # Страницы ссылок проекта идут по индексу (project_id, link_id)
+    Index('ix_link_project_project_link', 'project_id', 'link_id', unique=True),
+    Index('ix_link_project_link', 'link_id')
 )
 
 class Link(Base):
@@ -51,10 +83,12 @@ class Link(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     original_url = Column(String, nullable=False)
+    # Поиск по адресу идёт по индексу хеша нормализованного URL
+    url_hash = Column(String(64), index=True, default=default_url_hash)
     short_code = Column(String, unique=True, index=True)
     custom_alias = Column(String, unique=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime)
+    expires_at = Column(DateTime, index=True)
     clicks = Column(Integer, default=0)
     last_accessed = Column(DateTime)
     is_active = Column(Boolean, default=True)
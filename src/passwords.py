@@ -0,0 +1,88 @@
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# Стоимость bcrypt: хеши с меньшим числом раундов пересчитываются при входе
+BCRYPT_ROUNDS = 12
+
+# bcrypt считается в отдельных процессах, чтобы всплеск входов не занимал
+# threadpool и event loop воркера. Сверх HASH_MAX_PENDING запросы отклоняются
+HASH_POOL_SIZE = 2
+HASH_MAX_PENDING = 32
+HASH_RETRY_AFTER = 1
+# fork из многопоточного воркера (event loop, пулы соединений, планировщик)
+# копирует чужие захваченные блокировки: процессы пула запускаются начисто
+HASH_START_METHOD = "spawn"
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
+@functools.lru_cache
+def password_context(rounds: int) -> CryptContext:
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds
+    )
+
+
+def hash_password_sync(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return password_context(rounds).hash(password)
+
+
+def verify_and_update_sync(
+        password: str,
+        hashed_password: str,
+        rounds: int = BCRYPT_ROUNDS
+) -> tuple[bool, Optional[str]]:
+    return password_context(rounds).verify_and_update(password, hashed_password)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=HASH_POOL_SIZE,
+            mp_context=multiprocessing.get_context(HASH_START_METHOD)
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def pending() -> int:
+    return _pending
+
+
+async def run_in_pool(fn, *args):
+    global _pending
+    if _pending >= HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests",
+            headers={"Retry-After": str(HASH_RETRY_AFTER)},
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await run_in_pool(hash_password_sync, password, BCRYPT_ROUNDS)
+
+
+async def verify_and_update(password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return await run_in_pool(verify_and_update_sync, password, hashed_password, BCRYPT_ROUNDS)
@@ -0,0 +1,288 @@
+import hmac
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as Tally, deque
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.metrics import route_template
+
+# Профилирование отдельных запросов: SQL-запросы с временем, повторяющиеся
+# шаблоны (признак N+1) и, по желанию, сэмплы стека. Включается заголовком
+# X-Profile (1 — запросы, stacks — ещё и стек) или долей PROFILE_SAMPLE_RATE.
+# Без профиля хуки движка сводятся к чтению contextvar.
+# Заголовок и /debug/profiles/ доступны только с X-Profile-Token, равным
+# PROFILE_TOKEN: профили содержат SQL и пути чужих запросов, а сэмплер стека
+# — отдельный поток на запрос. Без токена заголовок игнорируется, а роутер
+# не подключается
+PROFILE_HEADER = b"x-profile"
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+PROFILE_TOKEN: Optional[str] = None
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_MAX_STATEMENTS = 200
+PROFILE_HISTORY = 50
+N_PLUS_ONE_THRESHOLD = 5
+SLOW_QUERY_THRESHOLD = 0.25
+STACK_SAMPLE_INTERVAL = 0.002
+STACK_TOP = 20
+STACK_DEPTH = 30
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+WHITESPACE = re.compile(r"\s+")
+
+
+def statement_pattern(statement: str) -> str:
+    # IN (?, ?, ?) разной длины — один и тот же шаблон
+    return IN_LIST.sub("?, ...", WHITESPACE.sub(" ", statement).strip())
+
+
+class StackSampler:
+    # Раз в STACK_SAMPLE_INTERVAL снимает стек потока event loop и копит
+    # свёрнутые стеки (формат flamegraph). В сэмплы попадает и код других
+    # запросов, которые loop выполнял в это время
+    def __init__(self, thread_id: int, interval: float = STACK_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Tally = Tally()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < STACK_DEPTH:
+                code = frame.f_code
+                names.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def report(self) -> dict:
+        return {
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "top": [{"stack": stack, "samples": count} for stack, count in self.stacks.most_common(STACK_TOP)],
+        }
+
+
+class Profile:
+    def __init__(self, method: str, path: str, stacks: bool = False):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.started = time.perf_counter()
+        self.elapsed: Optional[float] = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: list[dict] = []
+        self.patterns: dict[str, list] = {}
+        self.sampler = StackSampler(threading.get_ident()) if stacks else None
+
+    def record(self, statement: str, elapsed: float, executemany: bool):
+        self.queries += 1
+        self.db_seconds += elapsed
+        if len(self.statements) < PROFILE_MAX_STATEMENTS:
+            self.statements.append({
+                "sql": statement,
+                "ms": round(elapsed * 1000, 3),
+                "executemany": executemany,
+            })
+        pattern = self.patterns.setdefault(statement_pattern(statement), [0, 0.0])
+        pattern[0] += 1
+        pattern[1] += elapsed
+
+    def repeated(self) -> list[dict]:
+        return sorted((
+            {"sql": sql, "count": count, "total_ms": round(total * 1000, 3)}
+            for sql, (count, total) in self.patterns.items()
+            if count >= N_PLUS_ONE_THRESHOLD
+        ), key=lambda pattern: -pattern["count"])
+
+    def finish(self, route: str, status: int):
+        self.elapsed = time.perf_counter() - self.started
+        self.route = route
+        self.status = status
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def server_timing(self) -> str:
+        # Время до начала ответа: тело ещё может стримиться
+        elapsed = time.perf_counter() - self.started
+        db_ms = self.db_seconds * 1000
+        return (
+            f'db;dur={db_ms:.3f};desc="{self.queries} queries", '
+            f'app;dur={elapsed * 1000 - db_ms:.3f}'
+        )
+
+    def report(self) -> dict:
+        total_ms = (self.elapsed or 0) * 1000
+        db_ms = self.db_seconds * 1000
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "total_ms": round(total_ms, 3),
+            "db_ms": round(db_ms, 3),
+            # Всё, кроме SQL: обработчик, Pydantic, сериализация ответа
+            "other_ms": round(total_ms - db_ms, 3),
+            "queries": self.queries,
+            "statements": self.statements,
+            "statements_truncated": max(0, self.queries - len(self.statements)),
+            "repeated": self.repeated(),
+            "stacks": self.sampler.report() if self.sampler is not None else None,
+        }
+
+
+current_profile: ContextVar[Optional[Profile]] = ContextVar("profile", default=None)
+recent_profiles: deque = deque(maxlen=PROFILE_HISTORY)
+
+
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and (SLOW_QUERY_THRESHOLD is not None or current_profile.get() is not None):
+        context._profile_started = time.perf_counter()
+
+
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_profile_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed, executemany)
+    if SLOW_QUERY_THRESHOLD is not None and elapsed >= SLOW_QUERY_THRESHOLD:
+        logger.warning(
+            "slow query %.1f ms%s: %s",
+            elapsed * 1000,
+            f" [{profile.method} {profile.path}]" if profile is not None else "",
+            WHITESPACE.sub(" ", statement)
+        )
+
+
+def instrument(target=Engine):
+    event.listen(target, "before_cursor_execute", start_statement_timer)
+    event.listen(target, "after_cursor_execute", record_statement)
+
+
+def token_matches(token: Optional[bytes]) -> bool:
+    if not PROFILE_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token, PROFILE_TOKEN.encode())
+
+
+def requested_mode(scope) -> Optional[bytes]:
+    if PROFILE_TOKEN:
+        mode = token = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                mode = value.lower()
+            elif name == PROFILE_TOKEN_HEADER:
+                token = value
+        if mode is not None and token_matches(token):
+            return mode
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return b"1"
+    return None
+
+
+def save_profile(profile: Profile):
+    report = profile.report()
+    recent_profiles.append(report)
+    repeated = report["repeated"]
+    if repeated:
+        logger.warning(
+            "possible N+1 in %s %s: %s",
+            profile.method, profile.route,
+            "; ".join(f"{pattern['count']}x {pattern['sql']}" for pattern in repeated)
+        )
+    logger.info(
+        "profile %s %s %s: %.1f ms, %d queries, %.1f ms in db",
+        report["id"], profile.method, profile.route, report["total_ms"], report["queries"], report["db_ms"]
+    )
+
+
+class ProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        mode = requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None or mode in (b"0", b"off"):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], stacks=mode == b"stacks")
+        token = current_profile.set(profile)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", profile.server_timing().encode()),
+                    (b"x-profile-id", profile.id.encode()),
+                ]
+            await send(message)
+
+        if profile.sampler is not None:
+            profile.sampler.start()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            profile.finish(route_template(scope), status)
+            save_profile(profile)
+
+
+def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    if not token_matches(x_profile_token.encode() if x_profile_token is not None else None):
+        raise HTTPException(status_code=403, detail="Profiling is not available")
+
+
+router = APIRouter(
+    prefix="/debug/profiles",
+    include_in_schema=False,
+    dependencies=[Depends(require_profile_token)]
+)
+
+
+@router.get("/")
+async def list_profiles():
+    return [
+        {key: report[key] for key in ("id", "method", "path", "route", "status", "total_ms", "db_ms", "queries")}
+        | {"repeated": len(report["repeated"])}
+        for report in reversed(recent_profiles)
+    ]
+
+
+@router.get("/{profile_id}")
+async def read_profile(profile_id: str):
+    for report in recent_profiles:
+        if report["id"] == profile_id:
+            return report
+    raise HTTPException(status_code=404, detail="Profile not found")
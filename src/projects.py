@@ -1,26 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from src.database import get_db
-from src.models import Project, Link, link_project_association, User
-from src.schemas import ProjectCreate, ProjectResponse, ProjectWithLinks
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_async_db, SessionLocal
+from src.models import Project, Link, link_project_association
+from src.schemas import ProjectCreate, ProjectResponse, ProjectWithLinks, ProjectLinkResult, CurrentUser
 from src.security import get_current_user
+from src.clicks import unique_visitors
+from src import http_cache
 
 router = APIRouter(
     prefix="/projects",
     tags=["Projects"]
 )
 
+PROJECT_PAGE_SIZE = 100
+MAX_PROJECT_PAGE = 1000
+MAX_PROJECT_BATCH = 10_000
+PROJECT_BATCH_CHUNK = 500
+
+projects_table = Project.__table__
+association = link_project_association
+
+
+def unlink_counts_stmt(link_ids):
+    # Уменьшает счётчики проектов, из которых уходят ссылки link_ids
+    removed = (
+        select(func.count())
+        .select_from(association)
+        .where((association.c.project_id == projects_table.c.id) & association.c.link_id.in_(link_ids))
+        .scalar_subquery()
+    )
+    return (
+        update(projects_table)
+        .where(projects_table.c.id.in_(
+            select(association.c.project_id).where(association.c.link_id.in_(link_ids))
+        ))
+        .values(links_count=projects_table.c.links_count - removed)
+    )
+
+
+def recount_project_links(session_factory=SessionLocal):
+    # Полный пересчёт: для проектов, созданных до появления счётчика
+    with session_factory() as db:
+        db.execute(update(projects_table).values(links_count=(
+            select(func.count())
+            .select_from(association)
+            .where(association.c.project_id == projects_table.c.id)
+            .scalar_subquery()
+        )))
+        db.commit()
+
 
 @router.post("/", response_model=ProjectResponse)
-def create_project(
+async def create_project(
         project: ProjectCreate,
-        db: Session = Depends(get_db),
-        user: User = Depends(get_current_user)
+        db: AsyncSession = Depends(get_async_db),
+        user: CurrentUser = Depends(get_current_user)
 ):
-    existing = db.query(Project).filter(
+    existing = (await db.execute(select(Project).where(
         (Project.name == project.name) &
         (Project.user_id == user.id)
-    ).first()
+    ))).scalars().first()
 
     if existing:
         raise HTTPException(
@@ -33,21 +75,24 @@ def create_project(
         user_id=user.id
     )
     db.add(new_project)
-    db.commit()
-    db.refresh(new_project)
+    await db.commit()
+    await db.refresh(new_project)
     return new_project
 
 
 @router.get("/{project_id}", response_model=ProjectWithLinks)
-def get_project(
+async def get_project(
         project_id: int,
-        db: Session = Depends(get_db),
-        user: User = Depends(get_current_user)
+        request: Request,
+        response: Response,
+        limit: int = Query(PROJECT_PAGE_SIZE, ge=1, le=MAX_PROJECT_PAGE),
+        cursor: Optional[int] = Query(None, ge=0),
+        db: AsyncSession = Depends(get_async_db),
+        user: CurrentUser = Depends(get_current_user)
 ):
-    project = db.query(Project).filter(
-        (Project.id == project_id) &
-        (Project.user_id == user.id)
-    ).first()
+    project = (await db.execute(
+        select(Project).where((Project.id == project_id) & (Project.user_id == user.id))
+    )).scalars().first()
 
     if not project:
         raise HTTPException(
@@ -55,21 +100,65 @@ def get_project(
             detail="Project not found"
         )
 
-    return project
+    # Страница ссылок одним запросом через связь, по возрастанию id
+    query = (
+        select(Link)
+        .join(association, association.c.link_id == Link.id)
+        .where(association.c.project_id == project_id)
+        .order_by(Link.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(Link.id > cursor)
+    links = (await db.execute(query)).scalars().all()
+
+    next_cursor = None
+    if len(links) > limit:
+        links = links[:limit]
+        next_cursor = links[-1].id
+
+    visitors = await unique_visitors(*(link.short_code for link in links))
+
+    # ETag из тех же значений, что уходят в ответ: на 304 ничего не сериализуем
+    tag = http_cache.etag(
+        project.name, project.links_count, next_cursor,
+        *((link.id, link.original_url, link.custom_alias, link.expires_at, count) for link, count in zip(links, visitors))
+    )
+    unchanged = http_cache.not_modified(request, tag, http_cache.PRIVATE_REVALIDATE)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = http_cache.PRIVATE_REVALIDATE
+
+    return {
+        "id": project.id,
+        "name": project.name,
+        "created_at": project.created_at,
+        "links_count": project.links_count,
+        "links": [{
+            "original_url": link.original_url,
+            "custom_alias": link.custom_alias,
+            "expires_at": link.expires_at,
+            "short_url": link.short_code,
+            "created_at": link.created_at,
+            "unique_visitors": count,
+        } for link, count in zip(links, visitors)],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.post("/{project_id}/links/{short_code}")
-def add_link_to_project(
+async def add_link_to_project(
         project_id: int,
         short_code: str,
-        db: Session = Depends(get_db),
-        user: User = Depends(get_current_user)
+        db: AsyncSession = Depends(get_async_db),
+        user: CurrentUser = Depends(get_current_user)
 ):
     # Проверка прав на проект
-    project = db.query(Project).filter(
+    project = (await db.execute(select(Project).where(
         (Project.id == project_id) &
         (Project.user_id == user.id)
-    ).first()
+    ))).scalars().first()
 
     if not project:
         raise HTTPException(
@@ -78,10 +167,10 @@ def add_link_to_project(
         )
 
     # Проверка прав на ссылку
-    link = db.query(Link).filter(
+    link = (await db.execute(select(Link).where(
         (Link.short_code == short_code) &
         (Link.user_id == user.id)
-    ).first()
+    ))).scalars().first()
 
     if not link:
         raise HTTPException(
@@ -90,12 +179,12 @@ def add_link_to_project(
         )
 
     # Проверка существующей связи
-    existing = db.execute(
+    existing = (await db.execute(
         link_project_association.select().where(
             (link_project_association.c.link_id == link.id) &
             (link_project_association.c.project_id == project_id)
         )
-    ).first()
+    )).first()
 
     if existing:
         raise HTTPException(
@@ -103,11 +192,114 @@ def add_link_to_project(
             detail="Link already in project"
         )
 
-    db.execute(
+    await db.execute(
         link_project_association.insert().values(
             link_id=link.id,
             project_id=project.id
         )
     )
-    db.commit()
-    return {"message": "Link added to project"}
\ No newline at end of file
+    project.links_count = Project.links_count + 1
+    await db.commit()
+    return {"message": "Link added to project"}
+
+async def get_owned_project(db: AsyncSession, project_id: int, user: CurrentUser) -> Project:
+    project = (await db.execute(select(Project).where(
+        (Project.id == project_id) &
+        (Project.user_id == user.id)
+    ))).scalars().first()
+
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    return project
+
+
+def check_batch_size(short_codes: list[str]):
+    if len(short_codes) > MAX_PROJECT_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch size exceeds {MAX_PROJECT_BATCH} links"
+        )
+
+
+async def find_owned_links(db: AsyncSession, short_codes: list[str], user_id: int) -> dict[str, int]:
+    owned = {}
+    for start in range(0, len(short_codes), PROJECT_BATCH_CHUNK):
+        chunk = short_codes[start:start + PROJECT_BATCH_CHUNK]
+        rows = await db.execute(select(Link.short_code, Link.id).where(
+            Link.short_code.in_(chunk) & (Link.user_id == user_id)
+        ))
+        owned.update(rows.all())
+    return owned
+
+
+@router.post("/{project_id}/links:batch", response_model=list[ProjectLinkResult])
+async def add_links_to_project(
+        project_id: int,
+        short_codes: list[str],
+        db: AsyncSession = Depends(get_async_db),
+        user: CurrentUser = Depends(get_current_user)
+):
+    check_batch_size(short_codes)
+    project = await get_owned_project(db, project_id, user)
+
+    # Чужие и несуществующие ссылки отсеиваются одним запросом на пачку,
+    # уже добавленные пропускает уникальный индекс связи
+    unique_codes = list(dict.fromkeys(short_codes))
+    owned = await find_owned_links(db, unique_codes, user.id)
+    added = set()
+    rows = [{"link_id": link_id, "project_id": project_id} for link_id in owned.values()]
+    if rows:
+        result = await db.execute(
+            insert(association).on_conflict_do_nothing().returning(association.c.link_id),
+            rows
+        )
+        added.update(result.scalars().all())
+        project.links_count = Project.links_count + len(added)
+    await db.commit()
+
+    return [
+        {
+            "short_code": code,
+            "status": "not_found" if code not in owned else "added" if owned[code] in added else "already_in_project",
+        }
+        for code in short_codes
+    ]
+
+
+@router.post("/{project_id}/links:batch-remove", response_model=list[ProjectLinkResult])
+async def remove_links_from_project(
+        project_id: int,
+        short_codes: list[str],
+        db: AsyncSession = Depends(get_async_db),
+        user: CurrentUser = Depends(get_current_user)
+):
+    check_batch_size(short_codes)
+    project = await get_owned_project(db, project_id, user)
+
+    owned = await find_owned_links(db, list(dict.fromkeys(short_codes)), user.id)
+    removed = set()
+    link_ids = list(owned.values())
+    for start in range(0, len(link_ids), PROJECT_BATCH_CHUNK):
+        result = await db.execute(
+            delete(association)
+            .where(
+                (association.c.project_id == project_id) &
+                association.c.link_id.in_(link_ids[start:start + PROJECT_BATCH_CHUNK])
+            )
+            .returning(association.c.link_id)
+        )
+        removed.update(result.scalars().all())
+    if removed:
+        project.links_count = Project.links_count - len(removed)
+    await db.commit()
+
+    return [
+        {
+            "short_code": code,
+            "status": "not_found" if code not in owned else "removed" if owned[code] in removed else "not_in_project",
+        }
+        for code in short_codes
+    ]
@@ -1,7 +1,78 @@
+import uuid
+from typing import Optional
 import redis
+import redis.asyncio as aioredis
+from redis.exceptions import WatchError
 
 REDIS_URL='redis://localhost:6379/0'
 REDIS_EXPIRE=3600
+REDIS_MAX_CONNECTIONS=100
 
-redis_client = redis.Redis.from_url(REDIS_URL)
+# Обработчики не должны ждать Redis дольше, чем занял бы запрос в БД:
+# таймауты сокета и ожидания свободного соединения в пуле
+REDIS_SOCKET_TIMEOUT = 0.25
+REDIS_CONNECT_TIMEOUT = 0.25
+REDIS_POOL_TIMEOUT = 0.1
+REDIS_HEALTH_CHECK_INTERVAL = 30
+
+# Фоновым задачам спешить некуда
+REDIS_JOB_SOCKET_TIMEOUT = 5
+
+redis_client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(
+    REDIS_URL,
+    socket_timeout=REDIS_JOB_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_JOB_SOCKET_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL
+))
+
+# Общий пул соединений для асинхронных обработчиков
+async_redis_pool = aioredis.BlockingConnectionPool.from_url(
+    REDIS_URL,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL
+)
+async_redis_client = aioredis.Redis(connection_pool=async_redis_pool)
+
+# Подписка ждёт сообщений сколько угодно: таймаут сокета ей не подходит
+async_pubsub_client = aioredis.Redis.from_url(
+    REDIS_URL,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL
+)
 DEFAULT_EXPIRE = REDIS_EXPIRE or 3600
+
+
+async def close_async_clients():
+    # Соединения привязаны к event loop, в котором открыты: при остановке
+    # приложения закрываем их, следующий запуск откроет свои
+    await async_redis_client.aclose()
+    await async_redis_pool.aclose()
+    await async_pubsub_client.aclose()
+
+
+def acquire_job_lock(key: str, ttl: int) -> Optional[str]:
+    # Значение блокировки — случайный токен: снять её может только владелец
+    token = uuid.uuid4().hex
+    if redis_client.set(key, token, nx=True, ex=ttl):
+        return token
+    return None
+
+
+def release_job_lock(key: str, token: str) -> bool:
+    # Если задача работала дольше TTL, блокировку уже мог взять другой воркер:
+    # сравнение и удаление одной транзакцией, как в cache.delete_if_equals
+    with redis_client.pipeline(transaction=True) as pipe:
+        try:
+            pipe.watch(key)
+            if pipe.get(key) != token.encode():
+                pipe.unwatch()
+                return False
+            pipe.multi()
+            pipe.delete(key)
+            pipe.execute()
+            return True
+        except WatchError:
+            return False
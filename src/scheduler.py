@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Optional
+from apscheduler.schedulers.background import BackgroundScheduler
+from src.bloom import rebuild_bloom_filter, sync_unsynced_codes, BLOOM_REBUILD_INTERVAL, BLOOM_SYNC_INTERVAL
+from src.clicks import flush_clicks, rollup_clicks, CLICK_FLUSH_INTERVAL, CLICK_ROLLUP_INTERVAL
+from src.expiry import sweep_expired_links, EXPIRY_SWEEP_INTERVAL
+
+SCHEDULER_ENABLED = True
+
+scheduler: Optional[BackgroundScheduler] = None
+
+
+def start_scheduler():
+    global scheduler
+    if not SCHEDULER_ENABLED or (scheduler is not None and scheduler.running):
+        return
+
+    # Остановленный планировщик не перезапускается: пул его executor'а уже закрыт
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(
+        flush_clicks,
+        "interval",
+        seconds=CLICK_FLUSH_INTERVAL,
+        id="flush_clicks",
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        rollup_clicks,
+        "interval",
+        seconds=CLICK_ROLLUP_INTERVAL,
+        id="rollup_clicks",
+        max_instances=1,
+        coalesce=True
+    )
+    # Фильтр строится сразу при старте и периодически перестраивается,
+    # чтобы избавляться от удалённых кодов
+    scheduler.add_job(
+        rebuild_bloom_filter,
+        "interval",
+        seconds=BLOOM_REBUILD_INTERVAL,
+        next_run_time=datetime.now(),
+        id="rebuild_bloom_filter",
+        max_instances=1,
+        coalesce=True
+    )
+    # Коды, которые воркер не смог записать в фильтр при сбое Redis
+    scheduler.add_job(
+        sync_unsynced_codes,
+        "interval",
+        seconds=BLOOM_SYNC_INTERVAL,
+        id="sync_unsynced_codes",
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        sweep_expired_links,
+        "interval",
+        seconds=EXPIRY_SWEEP_INTERVAL,
+        id="sweep_expired_links",
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.start()
+
+
+def shutdown_scheduler():
+    if scheduler is None or not scheduler.running:
+        return
+    scheduler.shutdown(wait=True)
+    # Досбрасываем накопленные клики перед остановкой
+    flush_clicks()
@@ -23,10 +23,16 @@ class TokenData(BaseModel):
     email: Union[str, None] = None
 
 
+class CurrentUser(BaseModel):
+    id: int
+    email: str
+    is_active: bool
+
+
 class LinkCreate(BaseModel):
     original_url: HttpUrl
-    custom_alias: str or None = None
-    expires_at: datetime or None = None
+    custom_alias: Optional[str] = None
+    expires_at: Optional[datetime] = None
 
     @validator('expires_at')
     def set_expires_at(cls, value):
@@ -44,14 +50,38 @@ class LinkResponse(LinkCreate):
     created_at: datetime
 
 
+class BatchLinkResult(BaseModel):
+    index: int
+    status: str
+    short_url: Optional[str] = None
+    original_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    detail: Optional[str] = None
+
+
 class LinkStats(BaseModel):
     original_url: HttpUrl
     created_at: str
     clicks: int
+    unique_visitors: Optional[int] = None
     last_accessed: Optional[str]
     expires_at: Optional[str]
 
 
+class TimeseriesPoint(BaseModel):
+    bucket: datetime
+    clicks: int
+
+
+class ClickTimeseries(BaseModel):
+    short_code: str
+    granularity: str
+    start: datetime
+    end: datetime
+    points: list[TimeseriesPoint]
+    unique_visitors: Optional[int] = None
+
+
 class ArchivedLinkStats(LinkStats):
     archived_at: datetime
 
@@ -63,7 +93,18 @@ class ProjectCreate(BaseModel):
 class ProjectResponse(ProjectCreate):
     id: int
     created_at: datetime
+    links_count: int = 0
+
+
+class ProjectLinkResult(BaseModel):
+    short_code: str
+    status: str
+
+
+class ProjectLink(LinkResponse):
+    unique_visitors: Optional[int] = None
 
 
 class ProjectWithLinks(ProjectResponse):
-    links: list[LinkResponse]
+    links: list[ProjectLink]
+    next_cursor: Optional[int] = None
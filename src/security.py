@@ -1,31 +1,42 @@
+import asyncio
+import hashlib
+import json
+import time
 from datetime import datetime, timedelta
+from itertools import chain
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 from src import schemas
 from src import models
-from src.database import get_db
+from src.database import get_async_db
+from src.redis_client import redis_client
+from src import cache
+from src.passwords import hash_password_sync, verify_and_update_sync
 from typing import Optional
-from src.models import User
 
 
 SECRET_KEY = "my-secret-key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Пользователи, чьи кэшированные токены сбрасываются после коммита сессии
+CHANGED_USERS = "auth_changed_users"
+_invalidation_tasks: set[asyncio.Task] = set()
+
 
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_and_update_sync(plain_password, hashed_password)[0]
 
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return hash_password_sync(password)
 
 
 def create_access_token(data: dict):
@@ -35,27 +46,123 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(
-        token: str = Depends(oauth2_scheme),
-        db: Session = Depends(get_db)
-):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def cache_key_auth(token: str) -> str:
+    return f"auth:{hashlib.sha256(token.encode()).hexdigest()}"
+
+
+def cache_key_user_tokens(user_id: int) -> str:
+    return f"auth:user:{user_id}"
+
+
+async def cache_user(token: str, user: schemas.CurrentUser, expires: int):
+    # exp — секунды эпохи; utcnow().timestamp() считал бы наивное UTC местным временем
+    ttl = expires - int(time.time())
+    if ttl <= 0:
+        return
+    # exp хранится рядом с пользователем: запись не должна пережить токен,
+    # даже если TTL ключа разошёлся с ним
+    entry = json.dumps(user.model_dump() | {"exp": expires})
+    # Токены пользователя собираются в множество, чтобы сбросить их все разом;
+    # множество живёт не меньше самого долгого из них
+    stored = await cache.run(lambda pipe: (
+        pipe.setex(cache_key_auth(token), ttl, entry),
+        pipe.sadd(cache_key_user_tokens(user.id), cache_key_auth(token))
+    ))
+    if stored is not None:
+        await cache.extend_ttl(cache_key_user_tokens(user.id), ttl)
+
+
+async def invalidate_user_tokens(user_ids):
+    keys = [cache_key_user_tokens(user_id) for user_id in user_ids]
+    token_keys = await cache.run(lambda pipe: [pipe.smembers(key) for key in keys])
+    if token_keys is not None:
+        await cache.delete(*keys, *chain.from_iterable(token_keys))
+
+
+def invalidate_user_tokens_sync(user_ids):
+    keys = [cache_key_user_tokens(user_id) for user_id in user_ids]
+    try:
+        token_keys = chain.from_iterable(redis_client.smembers(key) for key in keys)
+        redis_client.delete(*keys, *token_keys)
+    except cache.CACHE_ERRORS:
+        # Коммит уже прошёл; неактивного пользователя и так отклонит authenticate
+        pass
+
+
+@event.listens_for(models.User, "after_update")
+def user_updated(mapper, connection, target):
+    # Внутри flush только запоминаем: Redis не должен ни блокировать
+    # event loop, ни валить UPDATE, а откаченное изменение сбрасывать незачем
+    if inspect(target).attrs.is_active.history.has_changes():
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(CHANGED_USERS, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def drop_tokens_after_commit(session):
+    user_ids = session.info.pop(CHANGED_USERS, None)
+    if not user_ids:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Синхронная сессия вне event loop: скрипты, фоновые задачи
+        invalidate_user_tokens_sync(user_ids)
+        return
+    task = loop.create_task(invalidate_user_tokens(user_ids))
+    _invalidation_tasks.add(task)
+    task.add_done_callback(_invalidation_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_changed_users(session):
+    session.info.pop(CHANGED_USERS, None)
+
+
+async def authenticate(token: str, db: AsyncSession) -> Optional[schemas.CurrentUser]:
+    # В кэше лежат только уже проверенные токены, срок записи не больше exp
+    cached = await cache.run(lambda pipe: pipe.get(cache_key_auth(token)))
+    if cached and cached[0]:
+        entry = json.loads(cached[0])
+        if entry.get("exp", 0) <= time.time() or not entry["is_active"]:
+            return None
+        return schemas.CurrentUser.model_validate(entry)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(email=email)
     except JWTError:
-        raise credentials_exception
+        return None
+    email: str = payload.get("sub")
+    if email is None:
+        return None
+    token_data = schemas.TokenData(email=email)
+
+    user = (await db.execute(
+        select(models.User.id, models.User.email, models.User.is_active)
+        .where(models.User.email == token_data.email)
+    )).first()
+    # Деактивированный пользователь не проходит, и его токен не кэшируется
+    if user is None or not user.is_active:
+        return None
+
+    current_user = schemas.CurrentUser(id=user.id, email=user.email, is_active=user.is_active)
+    if payload.get("exp"):
+        await cache_user(token, current_user, payload["exp"])
+    return current_user
+
 
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+async def get_current_user(
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_async_db)
+) -> schemas.CurrentUser:
+    user = await authenticate(token, db)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
@@ -66,16 +173,8 @@ oauth2_scheme_optional = OAuth2PasswordBearer(
 
 async def get_optional_user(
     token: Optional[str] = Depends(oauth2_scheme_optional),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
+    db: AsyncSession = Depends(get_async_db)
+) -> Optional[schemas.CurrentUser]:
     if not token:
         return None
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        user = db.query(models.User).filter(models.User.email == email).first()
-        return user
-    except (JWTError, HTTPException):
-        return None
+    return await authenticate(token, db)
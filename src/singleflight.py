@@ -0,0 +1,180 @@
+import asyncio
+import math
+import random
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from src import cache
+from src.cache import CacheUnavailable
+
+# Склейка одинаковых промахов кэша: в процессе — общий future на ключ,
+# между воркерами — короткая блокировка в Redis
+SINGLE_FLIGHT_ENABLED = True
+LOCK_TTL_MS = 5000
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.02
+
+# Вероятностное раннее обновление (XFetch): чем ближе истечение и дольше
+# пересчёт, тем вероятнее, что запрос обновит значение заранее
+EARLY_REFRESH_BETA = 1.0
+RECOMPUTE_EWMA_WEIGHT = 0.2
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        future = self._calls.get(key)
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменили ведущего (клиент отключился), а не нас: ключ уже
+                # свободен, и загрузку возьмёт на себя первый из ожидавших
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            future = self._calls.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Без ожидающих исключение иначе попадёт в лог как непрочитанное
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    def __len__(self):
+        return len(self._calls)
+
+
+group = SingleFlight()
+recompute_times: dict[str, float] = {}
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+def lock_key(cache_key: str) -> str:
+    return f"lock:{cache_key}"
+
+
+def namespace(cache_key: str) -> str:
+    return cache_key.split(":", 1)[0]
+
+
+def observe_recompute(cache_key: str, seconds: float):
+    name = namespace(cache_key)
+    previous = recompute_times.get(name)
+    recompute_times[name] = seconds if previous is None else (
+        previous + RECOMPUTE_EWMA_WEIGHT * (seconds - previous)
+    )
+
+
+def should_refresh_early(cache_key: str, ttl: float, beta: float = EARLY_REFRESH_BETA) -> bool:
+    delta = recompute_times.get(namespace(cache_key))
+    if not delta or ttl <= 0:
+        return False
+    return -delta * beta * math.log(1.0 - random.random()) >= ttl
+
+
+async def release_lock(cache_key: str, token: str):
+    # Снимаем только свою блокировку: чужую могли взять после истечения нашей
+    await cache.delete_if_equals(lock_key(cache_key), token.encode())
+
+
+async def lock_held(cache_key: str) -> bool:
+    results = await cache.run(lambda pipe: pipe.exists(lock_key(cache_key)))
+    return bool(results and results[0])
+
+
+async def fill_with_lock(
+        cache_key: str,
+        load: Callable[[], Awaitable],
+        read_cached: Optional[Callable[[], Awaitable]] = None
+):
+    token = uuid.uuid4().hex
+    try:
+        acquired, = await cache.execute(
+            lambda pipe: pipe.set(lock_key(cache_key), token, nx=True, px=LOCK_TTL_MS)
+        )
+    except CacheUnavailable:
+        # Без Redis склеиваем промахи только внутри процесса
+        return await load()
+
+    if acquired:
+        try:
+            started = time.perf_counter()
+            result = await load()
+            observe_recompute(cache_key, time.perf_counter() - started)
+            return result
+        finally:
+            await release_lock(cache_key, token)
+
+    # Значение уже считает другой воркер: ждём его в кэше, потом считаем сами.
+    # Фоновому обновлению ждать незачем — в кэше есть старое значение
+    if read_cached is None:
+        return None
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        # Блокировка проверяется до чтения кэша: ведущий снимает её после записи.
+        # Снята, а в кэше пусто — ведущий ничего не закэшировал (404, 410,
+        # ошибка), ждать дальше нечего
+        held = await lock_held(cache_key)
+        cached = await read_cached()
+        if cached is not None:
+            return cached
+        if not held:
+            break
+    return await load()
+
+
+async def coalesce(
+        cache_key: str,
+        load: Callable[[], Awaitable],
+        read_cached: Callable[[], Awaitable]
+):
+    if not SINGLE_FLIGHT_ENABLED:
+        return await load()
+    result = await group.do(cache_key, lambda: fill_with_lock(cache_key, load, read_cached))
+    # Присоединились к фоновому обновлению
+    if result is None:
+        result = await load()
+    return result
+
+
+def refresh_in_background(bind, cache_key: str, load: Callable[[AsyncSession], Awaitable]):
+    if not SINGLE_FLIGHT_ENABLED or group.in_flight(cache_key):
+        return
+
+    # Запрос отдаёт значение из кэша, а пересчёт идёт в своей сессии.
+    # Присоединившиеся промахи получат None и посчитают значение сами
+    async def reload(db: AsyncSession):
+        await load(db)
+
+    async def refresh():
+        async with AsyncSession(bind) as db:
+            await group.do(cache_key, lambda: fill_with_lock(cache_key, lambda: reload(db)))
+
+    task = asyncio.create_task(refresh())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_done)
+
+
+def _refresh_done(task: asyncio.Task):
+    _refresh_tasks.discard(task)
+    if not task.cancelled():
+        task.exception()
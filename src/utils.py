@@ -1,6 +1,14 @@
+import hashlib
+import re
 import secrets
 import string
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Адрес без порта, userinfo, фрагмента и заглавных букв в схеме и хосте уже
+# нормализован (с точностью до пустого пути) — urlsplit для него не нужен
+NORMALIZED_URL = re.compile(r"https?://[a-z0-9.-]+(/[^#\x00-\x20]*)?")
 
 
 def generate_short_code(length: int = 6) -> str:
@@ -20,3 +28,35 @@ def handle_expiration(expires_at: datetime or None) -> datetime:
         ) + timedelta(days=90)
 
     return expires_at
+
+
+def normalize_url(url: str) -> str:
+    # Регистр схемы и хоста, порт по умолчанию и фрагмент не меняют адрес
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        # Порт вне диапазона, незакрытый [IPv6 и т.п.: адрес сравнивается как есть
+        return url
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    # hostname снимает скобки с IPv6: без них порт сольётся с адресом
+    if ":" in netloc:
+        netloc = f"[{netloc}]"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{netloc}"
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def url_hash(url: str) -> str:
+    match = NORMALIZED_URL.fullmatch(url)
+    # Пустой запрос ("/path?") urlunsplit отбрасывает вместе с "?"
+    if match and not url.endswith("?"):
+        normalized = url if match.group(1) else url + "/"
+    else:
+        normalized = normalize_url(url)
+    return hashlib.sha256(normalized.encode()).hexdigest()
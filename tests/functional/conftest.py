@@ -1,9 +1,12 @@
+from datetime import datetime, timedelta
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
-from src.database import Base, get_db
+from src import main, scheduler
+from src.database import Base, get_db, get_async_db
 from src.main import app
 from src.models import User
 from src.security import get_password_hash
@@ -11,12 +14,20 @@ from src.redis_client import redis_client
 
 # Тестовая база
 TEST_DATABASE_URL = "sqlite:///././tests/test.db"
+TEST_ASYNC_DATABASE_URL = "sqlite+aiosqlite:///././tests/test.db"
 
 engine = create_engine(
     TEST_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(TEST_ASYNC_DATABASE_URL)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 
 # Переопределим зависимость
 def override_get_db():
@@ -27,8 +38,22 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 # Подключим переопределение
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+# Фоновые задачи работают с основной базой, в тестах их вызывают явно
+scheduler.SCHEDULER_ENABLED = False
+# Старт приложения готовит тестовую базу, а не data/shortener.db
+main.startup_engine = engine
+main.startup_session_factory = TestingSessionLocal
+# Соединения тестовой базы, как и основной, закрываются вместе с event loop модуля
+app.add_event_handler("shutdown", async_engine.dispose)
 
 
 # Очистка Redis перед каждым тестом
@@ -37,14 +62,23 @@ def clear_redis():
     redis_client.flushall()
 
 
-# Подключение клиента
+# Подключение клиента: один event loop на модуль, чтобы пул async-соединений
+# Redis не переживал смену цикла между запросами. При выходе из модуля
+# shutdown приложения закрывает соединения этого цикла
 @pytest.fixture(scope="module")
 def client():
     Base.metadata.create_all(bind=engine)
-    yield TestClient(app)
+    with TestClient(app) as test_client:
+        yield test_client
     Base.metadata.drop_all(bind=engine)
 
 
+# Фабрика сессий тестовой базы для фоновых задач
+@pytest.fixture
+def session_factory():
+    return TestingSessionLocal
+
+
 # Создание пользователя
 @pytest.fixture
 def test_user(client):
@@ -58,3 +92,33 @@ def test_user(client):
     db.commit()
     db.refresh(user)
     return user
+
+
+# Регистрация и вход: возвращает токен, повторная регистрация ничего не ломает
+@pytest.fixture
+def login(client):
+    def login_as(email: str = "secure@example.com", password: str = "password123") -> str:
+        client.post("/auth/register", json={"email": email, "password": password})
+        response = client.post("/auth/login", data={"username": email, "password": password})
+        return response.json()["access_token"]
+    return login_as
+
+
+# Заголовок авторизации пользователя по умолчанию
+@pytest.fixture
+def auth_header(login):
+    return {"Authorization": f"Bearer {login()}"}
+
+
+# Ссылка с алиасом, живущая сутки
+@pytest.fixture
+def create_link(client):
+    def create(alias: str, original_url: str = "https://example.com/", headers=None) -> dict:
+        response = client.post("/links/shorten", json={
+            "original_url": original_url,
+            "custom_alias": alias,
+            "expires_at": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+        }, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+    return create
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import pytest
+from src.models import ArchivedLink, User
+
+
+@pytest.fixture
+def archive_owner(session_factory, login):
+    token = login("archive@example.com")
+
+    with session_factory() as db:
+        user = db.query(User).filter_by(email="archive@example.com").one()
+        db.query(ArchivedLink).filter_by(user_id=user.id).delete()
+        archived_at = datetime.utcnow()
+        for i in range(5):
+            db.add(ArchivedLink(
+                original_url=f"https://example.com/archived/{i}",
+                short_code=f"archived{i}",
+                created_at=archived_at - timedelta(days=30),
+                clicks=i,
+                user_id=user.id,
+                # Две строки с одинаковым archived_at: порядок решает id
+                archived_at=archived_at - timedelta(minutes=min(i, 3)),
+            ))
+        db.commit()
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_archive_keyset_pagination(client, archive_owner):
+    urls = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/links/archive/", params=params, headers=archive_owner)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        urls.extend(item["original_url"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert urls == [f"https://example.com/archived/{i}" for i in (0, 1, 2, 4, 3)]
+
+
+def test_archive_rejects_bad_cursor(client, archive_owner):
+    response = client.get("/links/archive/", params={"cursor": "garbage"}, headers=archive_owner)
+    assert response.status_code == 422
+
+
+def test_archive_export_ndjson(client, archive_owner):
+    response = client.get("/links/archive/export", headers=archive_owner)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["short_code"] for row in rows] == ["archived0", "archived1", "archived2", "archived4", "archived3"]
+
+
+def test_archive_export_csv(client, archive_owner):
+    response = client.get("/links/archive/export", params={"format": "csv"}, headers=archive_owner)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 5
+    assert rows[0]["short_code"] == "archived0"
+    assert rows[0]["clicks"] == "0"
+
+
+def test_archive_page_revalidates_with_etag(client, archive_owner):
+    response = client.get("/links/archive/", params={"limit": 2}, headers=archive_owner)
+    tag = response.headers["etag"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/links/archive/", params={"limit": 2}, headers={**archive_owner, "If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.headers["X-Next-Cursor"] == cursor
+
+    response = client.get("/links/archive/", params={"limit": 3}, headers={**archive_owner, "If-None-Match": tag})
+    assert response.status_code == 200
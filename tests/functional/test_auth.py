@@ -1,24 +1,3 @@
-import pytest
-
-
-def login_and_get_token(client):
-    client.post("/auth/register", json={
-        "email": "secure@example.com",
-        "password": "password123"
-    })
-    response = client.post("/auth/login", data={
-        "username": "secure@example.com",
-        "password": "password123"
-    })
-    return response.json()["access_token"]
-
-
-@pytest.fixture
-def auth_header(client):
-    token = login_and_get_token(client)
-    return {"Authorization": f"Bearer {token}"}
-
-
 def test_update_link_unauthorized(client):
     response = client.put("/links/testalias", json={"new_url": "https://newurl.com"})
     assert response.status_code == 401
@@ -37,4 +16,22 @@ def test_archive_requires_auth(client):
 def test_project_access_forbidden(client, auth_header):
     # Попробуем получить проект, которого нет
     response = client.get("/projects/9999", headers=auth_header)
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_login_upgrades_weaker_hash(client, session_factory):
+    from src.models import User
+    from src.passwords import hash_password_sync, BCRYPT_ROUNDS
+
+    with session_factory() as db:
+        db.add(User(email="legacy@example.com", hashed_password=hash_password_sync("password123", rounds=4)))
+        db.commit()
+
+    response = client.post("/auth/login", data={
+        "username": "legacy@example.com",
+        "password": "password123"
+    })
+    assert response.status_code == 200
+
+    with session_factory() as db:
+        user = db.query(User).filter_by(email="legacy@example.com").one()
+        assert user.hashed_password.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
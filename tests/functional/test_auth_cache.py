@@ -0,0 +1,139 @@
+import asyncio
+import json
+import time
+import pytest
+from redis.exceptions import ConnectionError
+from sqlalchemy import select
+from src import schemas, security
+from src.models import User
+from src.redis_client import redis_client
+from src.security import cache_key_auth, cache_key_user_tokens, ACCESS_TOKEN_EXPIRE_MINUTES
+from tests.functional.conftest import TestingAsyncSessionLocal
+
+
+def test_verified_token_is_cached(client, login):
+    token = login("cached@example.com")
+    response = client.get("/links/archive/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+    cached = json.loads(redis_client.get(cache_key_auth(token)))
+    assert cached["email"] == "cached@example.com"
+    assert cached["is_active"] is True
+    # Запись не переживает сам токен
+    assert 0 < redis_client.ttl(cache_key_auth(token)) <= ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    assert redis_client.sismember(cache_key_user_tokens(cached["id"]), cache_key_auth(token))
+
+
+def test_user_tokens_set_outlives_every_token(client, login):
+    token = login("tokenset@example.com")
+    client.get("/links/archive/", headers={"Authorization": f"Bearer {token}"})
+    user = schemas.CurrentUser.model_validate(json.loads(redis_client.get(cache_key_auth(token))))
+    tokens_key = cache_key_user_tokens(user.id)
+
+    # Короче токена — продлевается, длиннее — не укорачивается
+    redis_client.expire(tokens_key, 10)
+    client.portal.call(security.cache_user, token, user, int(time.time()) + 600)
+    assert 500 < redis_client.ttl(tokens_key) <= 600
+
+    redis_client.expire(tokens_key, 5000)
+    client.portal.call(security.cache_user, token, user, int(time.time()) + 600)
+    assert redis_client.ttl(tokens_key) > 4000
+
+
+@pytest.fixture
+def moscow_time(monkeypatch):
+    # Часовой пояс процесса восточнее UTC: наивное utcnow() здесь на 3 часа «в прошлом»
+    monkeypatch.setenv("TZ", "Europe/Moscow")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_cache_ttl_ignores_local_timezone(client, moscow_time, login):
+    token = login("moscow@example.com")
+    assert client.get("/links/archive/", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert 0 < redis_client.ttl(cache_key_auth(token)) <= ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+
+def test_cached_entry_past_exp_is_rejected(client, login):
+    token = login("stale@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/links/archive/", headers=headers)
+
+    # Ключ ещё жив, а токен уже истёк
+    entry = json.loads(redis_client.get(cache_key_auth(token)))
+    entry["exp"] = int(time.time()) - 1
+    redis_client.set(cache_key_auth(token), json.dumps(entry), ex=3600)
+    assert client.get("/links/archive/", headers=headers).status_code == 401
+
+
+def test_invalid_token_is_not_cached(client):
+    response = client.get("/links/archive/", headers={"Authorization": "Bearer garbage"})
+    assert response.status_code == 401
+    assert not redis_client.exists(cache_key_auth("garbage"))
+
+
+def test_deactivation_drops_cached_tokens(client, session_factory, login):
+    token = login("deactivated@example.com")
+    client.get("/links/archive/", headers={"Authorization": f"Bearer {token}"})
+    assert redis_client.exists(cache_key_auth(token))
+
+    with session_factory() as db:
+        user = db.query(User).filter_by(email="deactivated@example.com").one()
+        user.is_active = False
+        db.commit()
+        user_id = user.id
+
+    assert not redis_client.exists(cache_key_auth(token))
+    assert not redis_client.exists(cache_key_user_tokens(user_id))
+
+
+def test_deactivated_user_is_rejected(client, session_factory, login):
+    token = login("inactive@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/links/archive/", headers=headers).status_code == 200
+
+    with session_factory() as db:
+        db.query(User).filter_by(email="inactive@example.com").one().is_active = False
+        db.commit()
+
+    # Токен ещё не истёк, но пользователь из БД уже неактивен и в кэш не попадает
+    assert client.get("/links/archive/", headers=headers).status_code == 401
+    assert not redis_client.exists(cache_key_auth(token))
+
+
+def test_async_deactivation_drops_tokens_after_commit(client, login):
+    token = login("asyncinactive@example.com")
+    client.get("/links/archive/", headers={"Authorization": f"Bearer {token}"})
+
+    async def deactivate():
+        async with TestingAsyncSessionLocal() as db:
+            user = (await db.execute(select(User).filter_by(email="asyncinactive@example.com"))).scalar_one()
+            user.is_active = False
+            await db.commit()
+        # Сброс идёт задачей после коммита, а не внутри flush
+        await asyncio.gather(*security._invalidation_tasks)
+
+    client.portal.call(deactivate)
+    assert not redis_client.exists(cache_key_auth(token))
+
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("Redis is down")
+        return fail
+
+
+def test_deactivation_survives_redis_outage(client, session_factory, monkeypatch, login):
+    login("outage@example.com")
+    monkeypatch.setattr(security, "redis_client", BrokenRedis())
+
+    with session_factory() as db:
+        user = db.query(User).filter_by(email="outage@example.com").one()
+        user.is_active = False
+        db.commit()
+
+    with session_factory() as db:
+        assert db.query(User).filter_by(email="outage@example.com").one().is_active is False
@@ -0,0 +1,26 @@
+import time
+from src.links import cache_key_search, search_page_field
+from src.redis_client import redis_client
+from src.singleflight import LOCK_WAIT, lock_key, release_lock
+
+
+def test_follower_stops_waiting_when_lock_is_released(client):
+    # Ведущий в другом воркере ищет неизвестный адрес: 404 ничего не кладёт
+    # в кэш, и после снятия блокировки ждать дальше нечего
+    url = "https://nowhere.example/"
+    key = lock_key(f"{cache_key_search(url)}|{search_page_field(None, None)}")
+    redis_client.set(key, "other-worker", px=200)
+
+    started = time.perf_counter()
+    response = client.get("/links/search/", params={"original_url": url})
+    assert response.status_code == 404
+    assert time.perf_counter() - started < LOCK_WAIT
+
+
+def test_release_lock_keeps_foreign_lock(client):
+    redis_client.set(lock_key("stats:abc"), "other-worker")
+    client.portal.call(release_lock, "stats:abc", "mine")
+    assert redis_client.get(lock_key("stats:abc")) == b"other-worker"
+
+    client.portal.call(release_lock, "stats:abc", "other-worker")
+    assert not redis_client.exists(lock_key("stats:abc"))
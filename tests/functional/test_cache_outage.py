@@ -0,0 +1,71 @@
+import pytest
+from redis.exceptions import ConnectionError
+from src import bloom, cache
+from src.local_cache import redirect_cache
+from src.links import is_known_code
+from src.models import Link
+
+
+class BrokenPipeline:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    async def execute(self):
+        raise ConnectionError("Redis is down")
+
+
+class BrokenRedis:
+    def pipeline(self, transaction=False):
+        return BrokenPipeline()
+
+
+@pytest.fixture
+def redis_outage(monkeypatch):
+    monkeypatch.setattr(cache, "async_redis_client", BrokenRedis())
+    yield
+    cache.breaker.reset()
+
+
+def test_redirect_falls_back_to_db(client, session_factory, redis_outage):
+    # Ссылка создаётся и в норме, и при сбое: Redis ей не нужен
+    response = client.post("/links/shorten", json={
+        "original_url": "https://example.com/outage",
+        "custom_alias": "outagealias",
+    })
+    assert response.status_code == 200
+    redirect_cache.clear()
+
+    for _ in range(cache.BREAKER_FAILURE_THRESHOLD + 2):
+        response = client.get("/links/outagealias")
+        assert response.status_code == 200
+        assert response.json() == {"Redirect": "https://example.com/outage"}
+        redirect_cache.clear()
+
+    # Клики при сбое пишутся прямо в БД
+    with session_factory() as db:
+        assert db.query(Link).filter_by(short_code="outagealias").one().clicks == cache.BREAKER_FAILURE_THRESHOLD + 2
+
+    breaker = client.get("/status").json()["redis_breaker"]
+    assert breaker["state"] == "open"
+    assert breaker["short_circuited"] > 0
+
+    assert client.get("/links/outagealias/stats").status_code == 200
+
+
+def test_codes_missed_during_outage_reach_bloom_filter(client, session_factory, monkeypatch):
+    monkeypatch.setattr(bloom, "_unsynced_codes", set())
+    bloom.rebuild_bloom_filter(session_factory)
+    with monkeypatch.context() as outage:
+        outage.setattr(cache, "async_redis_client", BrokenRedis())
+        response = client.post("/links/shorten", json={
+            "original_url": "https://example.com/unsynced",
+            "custom_alias": "unsyncedalias",
+        })
+        assert response.status_code == 200
+    cache.breaker.reset()
+    assert "unsyncedalias" in bloom._unsynced_codes
+
+    # Другие воркеры узнают код из фильтра без новых ссылок в этом воркере
+    assert bloom.sync_unsynced_codes() == 1
+    assert not bloom._unsynced_codes
+    assert client.portal.call(is_known_code, "unsyncedalias")
@@ -0,0 +1,125 @@
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from src import clicks
+from src.clicks import flush_clicks, pending_clicks, rollup_clicks
+from src.models import ClickRollup, Link
+from src.redis_client import redis_client
+
+
+def test_clicks_counted_on_cache_hits(client, create_link):
+    create_link("clicksalias")
+
+    # Первый запрос — промах кэша, остальные — попадания
+    for _ in range(3):
+        response = client.get("/links/clicksalias")
+        assert response.status_code == 200
+
+    count, last_accessed = client.portal.call(pending_clicks, "clicksalias")
+    assert count == 3
+    assert last_accessed is not None
+
+    stats = client.get("/links/clicksalias/stats").json()
+    assert stats["clicks"] == 3
+
+
+def test_flush_clicks_applies_deltas(client, session_factory, create_link):
+    create_link("flushalias")
+    for _ in range(2):
+        client.get("/links/flushalias")
+
+    assert flush_clicks(session_factory) == 1
+    assert client.portal.call(pending_clicks, "flushalias") == (0, None)
+
+    with session_factory() as db:
+        link = db.query(Link).filter_by(short_code="flushalias").first()
+        assert link.clicks == 2
+        assert link.last_accessed is not None
+
+
+def test_flush_keeps_lock_taken_after_expiry(client, session_factory, monkeypatch):
+    # Сброс затянулся дольше TTL, и блокировку взял другой воркер
+    def drain_slowly():
+        redis_client.set(clicks.FLUSH_LOCK_KEY, "other-worker")
+        return []
+    monkeypatch.setattr(clicks, "drain_pending_clicks", drain_slowly)
+
+    flush_clicks(session_factory)
+    assert redis_client.get(clicks.FLUSH_LOCK_KEY) == b"other-worker"
+    redis_client.delete(clicks.FLUSH_LOCK_KEY)
+
+
+def test_rollup_feeds_timeseries(client, session_factory, monkeypatch, create_link):
+    create_link("seriesalias")
+    for _ in range(3):
+        client.get("/links/seriesalias")
+
+    # Текущая минута не сворачивается: сдвигаем часы свёртки вперёд
+    real_time = time.time
+    monkeypatch.setattr(clicks, "time", SimpleNamespace(time=lambda: real_time() + 120))
+    assert rollup_clicks(session_factory) == 3
+    monkeypatch.undo()
+
+    now = datetime.utcnow()
+    response = client.get("/links/seriesalias/stats/timeseries", params={
+        "from": (now - timedelta(hours=1)).isoformat(),
+        "to": now.isoformat(),
+        "granularity": "minute",
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["points"]) == 61
+    assert sum(point["clicks"] for point in body["points"]) == 3
+
+    daily = client.get("/links/seriesalias/stats/timeseries", params={"granularity": "day"}).json()
+    assert daily["points"][-1]["clicks"] == 3
+
+
+def test_deleted_link_leaves_no_rollups(client, session_factory, monkeypatch, create_link, auth_header):
+    create_link("rolledalias", headers=auth_header)
+    client.get("/links/rolledalias", headers={"User-Agent": "firefox"})
+
+    real_time = time.time
+    monkeypatch.setattr(clicks, "time", SimpleNamespace(time=lambda: real_time() + 120))
+    assert rollup_clicks(session_factory) == 3
+
+    # Клик после свёртки ждёт следующей, а ссылку тем временем удаляют
+    client.get("/links/rolledalias")
+    assert client.delete("/links/rolledalias", headers=auth_header).status_code == 200
+    monkeypatch.setattr(clicks, "time", SimpleNamespace(time=lambda: real_time() + 240))
+    assert rollup_clicks(session_factory) == 0
+
+    with session_factory() as db:
+        assert db.query(ClickRollup).filter_by(short_code="rolledalias").count() == 0
+    # Вместе со ссылкой уходят и дневные HLL уникальных посетителей
+    assert redis_client.keys("uv:rolledalias*") == []
+
+
+def test_timeseries_rejects_bad_ranges(client, create_link):
+    create_link("rangealias")
+    now = datetime.utcnow()
+
+    response = client.get("/links/rangealias/stats/timeseries", params={
+        "from": now.isoformat(),
+        "to": (now - timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 422
+
+    response = client.get("/links/rangealias/stats/timeseries", params={
+        "from": (now - timedelta(days=30)).isoformat(),
+        "granularity": "minute",
+    })
+    assert response.status_code == 422
+
+
+def test_unique_visitors_are_estimated(client, create_link):
+    create_link("uniquealias")
+    for agent in ("firefox", "chrome", "firefox", "safari", "chrome"):
+        client.get("/links/uniquealias", headers={"User-Agent": agent})
+
+    stats = client.get("/links/uniquealias/stats").json()
+    assert stats["clicks"] == 5
+    assert stats["unique_visitors"] == 3
+
+    series = client.get("/links/uniquealias/stats/timeseries", params={"granularity": "day"}).json()
+    assert series["unique_visitors"] == 3
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from src.links import cache_key_stats
+from src.local_cache import redirect_cache
+from src.redis_client import redis_client
+
+
+def max_age(response):
+    directives = dict(
+        part.strip().split("=") if "=" in part else (part.strip(), None)
+        for part in response.headers["cache-control"].split(",")
+    )
+    return int(directives["max-age"])
+
+
+def test_redirect_cache_control_follows_expiry(client):
+    client.post("/links/shorten", json={
+        "original_url": "https://example.com/soon",
+        "custom_alias": "cachesoon",
+        "expires_at": (datetime.utcnow() + timedelta(seconds=20)).isoformat(),
+    })
+    # Обработчик, быстрый путь из L1 и из Redis
+    for _ in range(2):
+        response = client.get("/links/cachesoon")
+        assert response.headers["cache-control"].startswith("private, ")
+        assert 0 < max_age(response) <= 20
+    redirect_cache.clear()
+    assert 0 < max_age(client.get("/links/cachesoon")) <= 20
+
+
+def test_stats_answer_304_for_matching_etag(client):
+    client.post("/links/shorten", json={
+        "original_url": "https://example.com/etag-stats",
+        "custom_alias": "etagstats"
+    })
+    response = client.get("/links/etagstats/stats")
+    tag = response.headers["etag"]
+    assert response.json()["clicks"] == 0
+    assert 0 < max_age(response) <= 60
+
+    response = client.get("/links/etagstats/stats", headers={"If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == tag
+
+    # Новый клик виден после пересборки статистики — вместе с новым ETag
+    client.get("/links/etagstats")
+    redis_client.delete(cache_key_stats("etagstats"))
+    response = client.get("/links/etagstats/stats", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.json()["clicks"] == 1
+    assert response.headers["etag"] != tag
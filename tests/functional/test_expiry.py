@@ -0,0 +1,86 @@
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from src import clicks
+from src.expiry import sweep_expired_links
+from src.models import ArchivedLink, ClickRollup, Link
+from src.redis_client import redis_client
+
+
+def expire_link(session_factory, alias):
+    with session_factory() as db:
+        link = db.query(Link).filter_by(short_code=alias).first()
+        link.expires_at = datetime.utcnow() - timedelta(minutes=1)
+        db.commit()
+
+
+def test_expired_link_is_rejected_before_sweep(client, session_factory, create_link):
+    create_link("expiredalias")
+    expire_link(session_factory, "expiredalias")
+
+    response = client.get("/links/expiredalias")
+    assert response.status_code == 410
+
+    # Запрос больше не архивирует ссылку сам
+    with session_factory() as db:
+        assert db.query(Link).filter_by(short_code="expiredalias").first() is not None
+
+
+def test_sweeper_archives_expired_links(client, session_factory, create_link):
+    create_link("sweptalias")
+    create_link("alivealias")
+    client.get("/links/sweptalias")
+    expire_link(session_factory, "sweptalias")
+
+    archived = sweep_expired_links(session_factory, batch_size=1)
+    assert archived >= 1
+
+    with session_factory() as db:
+        assert db.query(Link).filter_by(short_code="sweptalias").first() is None
+        assert db.query(Link).filter_by(short_code="alivealias").first() is not None
+        archived_link = db.query(ArchivedLink).filter_by(short_code="sweptalias").first()
+        assert archived_link.clicks == 1
+
+    progress = client.get("/status").json()["expiry_sweeper"]
+    assert progress["running"] == "0"
+    assert int(progress["archived_in_run"]) == archived
+
+
+def test_sweeper_updates_project_counts(client, session_factory, create_link):
+    from src.models import Project, User, link_project_association
+
+    create_link("projectswept")
+    create_link("projectkept")
+    with session_factory() as db:
+        user = User(email="sweeper@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        project = Project(name="Swept", user_id=user.id, links_count=2)
+        db.add(project)
+        db.flush()
+        for link in db.query(Link).filter(Link.short_code.in_(["projectswept", "projectkept"])):
+            db.execute(link_project_association.insert().values(link_id=link.id, project_id=project.id))
+        db.commit()
+        project_id = project.id
+
+    expire_link(session_factory, "projectswept")
+    sweep_expired_links(session_factory)
+
+    with session_factory() as db:
+        assert db.get(Project, project_id).links_count == 1
+
+
+def test_sweeper_removes_click_history(client, session_factory, monkeypatch, create_link):
+    create_link("rollupswept")
+    client.get("/links/rollupswept", headers={"User-Agent": "firefox"})
+    real_time = time.time
+    monkeypatch.setattr(clicks, "time", SimpleNamespace(time=lambda: real_time() + 120))
+    clicks.rollup_clicks(session_factory)
+    monkeypatch.undo()
+
+    expire_link(session_factory, "rollupswept")
+    sweep_expired_links(session_factory)
+
+    with session_factory() as db:
+        assert db.query(ClickRollup).filter_by(short_code="rollupswept").count() == 0
+    assert redis_client.keys("uv:rollupswept*") == []
@@ -0,0 +1,45 @@
+from src import links
+from src.fast_redirect import fast_path_requests
+from src.local_cache import redirect_cache
+
+
+def fast_path_count(result):
+    return fast_path_requests.values.get((result,), 0)
+
+
+def test_cached_redirects_skip_routing(client, create_link):
+    create_link("fastalias", "https://example.com/fast")
+    misses = fast_path_count("miss")
+    assert client.get("/links/fastalias").json() == {"Redirect": "https://example.com/fast"}
+    assert fast_path_count("miss") == misses + 1
+
+    l1_hits = fast_path_count("l1")
+    response = client.get("/links/fastalias")
+    assert response.json() == {"Redirect": "https://example.com/fast"}
+    assert response.headers["content-length"] == str(len(response.content))
+    assert fast_path_count("l1") == l1_hits + 1
+
+    redirect_cache.clear()
+    redis_hits = fast_path_count("redis")
+    assert client.get("/links/fastalias").json() == {"Redirect": "https://example.com/fast"}
+    assert fast_path_count("redis") == redis_hits + 1
+
+    # Клики быстрого пути считаются так же, как в обработчике
+    assert client.get("/links/fastalias/stats").json()["clicks"] == 3
+
+
+def test_unknown_codes_fall_back_to_route(client):
+    assert client.get("/links/fastunknown").status_code == 404
+    assert client.get("/links/search/", params={"original_url": "https://example.com/nothing"}).status_code == 404
+
+
+def test_real_redirect_status(client, monkeypatch, create_link):
+    monkeypatch.setattr(links, "REDIRECT_STATUS", 307)
+    create_link("fast307", "https://example.com/пример?q=1")
+
+    for _ in range(2):
+        # Первый ответ — обработчик, второй — быстрый путь из L1
+        response = client.get("/links/fast307", follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"] == "https://example.com/%D0%BF%D1%80%D0%B8%D0%BC%D0%B5%D1%80?q=1"
+        assert response.content == b""
@@ -0,0 +1,141 @@
+import argparse
+import json
+from datetime import datetime, timedelta
+import pytest
+from src import importer
+from src.links import cache_key_redirect
+from src.redis_client import redis_client
+from tests.functional.conftest import TestingAsyncSessionLocal
+
+
+@pytest.fixture
+def importer_header(login):
+    return {"Authorization": f"Bearer {login('importer@example.com')}"}
+
+
+def make_csv(rows, header="short_code,original_url,expires_at,clicks"):
+    return "\n".join([header] + rows) + "\n"
+
+
+def test_import_csv_reports_rows(client, importer_header):
+    expires_at = (datetime.utcnow() + timedelta(days=10)).isoformat()
+    body = make_csv([
+        f"imp1,https://example.com/imported/1,{expires_at},5",
+        "imp2,https://example.com/imported/2,,",
+        "imp3,not-a-url,,",
+        "bad code,https://example.com/imported/4,,",
+        "imp5,https://example.com/imported/5,,-1",
+    ])
+    response = client.post("/links/import", content=body, headers=importer_header)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["rows"] == 5
+    assert report["inserted"] == 2
+    assert report["invalid"] == 3
+    assert [error["row"] for error in report["errors"]] == [3, 4, 5]
+    assert report["rows_per_s"] > 0
+
+    stats = client.get("/links/imp1/stats").json()
+    assert stats["clicks"] == 5
+    assert stats["expires_at"].startswith(expires_at[:16])
+    assert client.get("/links/imp1").json() == {"Redirect": "https://example.com/imported/1"}
+
+    progress = client.get("/status").json()["importer"]
+    assert progress["running"] == "0"
+    assert progress["inserted"] == "2"
+
+
+def test_import_skip_keeps_existing_links(client, importer_header):
+    body = make_csv(["impskip,https://example.com/first,,"])
+    client.post("/links/import", content=body, headers=importer_header)
+
+    body = make_csv(["impskip,https://example.com/second,,", "impskip2,https://example.com/other,,"])
+    report = client.post("/links/import", content=body, headers=importer_header).json()
+    assert (report["inserted"], report["skipped"]) == (1, 1)
+    assert report["conflicts"] == ["impskip"]
+    assert client.get("/links/impskip").json() == {"Redirect": "https://example.com/first"}
+
+
+def test_import_overwrite_invalidates_cache(client, importer_header):
+    client.post("/links/import", content=make_csv(["impover,https://example.com/old,,"]), headers=importer_header)
+    assert client.get("/links/impover").json() == {"Redirect": "https://example.com/old"}
+
+    report = client.post(
+        "/links/import",
+        params={"on_conflict": "overwrite"},
+        content=make_csv(["impover,https://example.com/new,,"]),
+        headers=importer_header
+    ).json()
+    assert report["updated"] == 1
+    assert client.get("/links/impover").json() == {"Redirect": "https://example.com/new"}
+    assert client.get("/links/search/", params={"original_url": "https://example.com/old"}).status_code == 404
+
+
+def test_import_overwrite_leaves_foreign_links(client, importer_header):
+    client.post("/links/shorten", json={
+        "original_url": "https://example.com/anonymous",
+        "custom_alias": "impforeign"
+    })
+    report = client.post(
+        "/links/import",
+        params={"on_conflict": "overwrite"},
+        content=make_csv(["impforeign,https://example.com/hijack,,"]),
+        headers=importer_header
+    ).json()
+    assert (report["updated"], report["skipped"]) == (0, 1)
+    assert client.get("/links/impforeign").json() == {"Redirect": "https://example.com/anonymous"}
+
+
+def test_import_fail_policy_rejects_conflicts(client, importer_header):
+    client.post("/links/import", content=make_csv(["impfail,https://example.com/taken,,"]), headers=importer_header)
+
+    response = client.post(
+        "/links/import",
+        params={"on_conflict": "fail"},
+        content=make_csv(["impfail2,https://example.com/fresh,,", "impfail,https://example.com/again,,"]),
+        headers=importer_header
+    )
+    assert response.status_code == 409
+    assert "impfail" in response.json()["detail"]
+    # Пачка с конфликтом не записывается целиком
+    assert client.get("/links/impfail2").status_code == 404
+
+
+def test_import_ndjson_warms_redirects(client, importer_header):
+    lines = [
+        json.dumps({"short_code": "impjson1", "original_url": "https://example.com/json/1"}),
+        "{broken",
+        json.dumps({"short_code": "impjson2", "original_url": "https://example.com/json/2", "clicks": 3}),
+    ]
+    response = client.post(
+        "/links/import",
+        params={"format": "ndjson", "warm": True},
+        content="\n".join(lines),
+        headers=importer_header
+    )
+    report = response.json()
+    assert (report["inserted"], report["invalid"]) == (2, 1)
+    assert redis_client.get(cache_key_redirect("impjson2")) == b"https://example.com/json/2"
+    assert 0 < redis_client.ttl(cache_key_redirect("impjson2")) <= 3600
+
+
+def test_import_requires_header_columns(client, importer_header):
+    response = client.post("/links/import", content="code,url\nx,https://example.com\n", headers=importer_header)
+    assert response.status_code == 422
+
+
+def test_import_requires_auth(client):
+    assert client.post("/links/import", content=make_csv([])).status_code == 401
+
+
+def test_import_cli(client, tmp_path):
+    path = tmp_path / "links.csv"
+    path.write_text(make_csv([f"impcli{i},https://example.com/cli/{i},," for i in range(25)]))
+    args = argparse.Namespace(
+        path=str(path), format=None, on_conflict="skip", user_id=None,
+        chunk_size=10, warm_redirects=False, quiet=True
+    )
+
+    report = client.portal.call(importer.run_import, args, TestingAsyncSessionLocal)
+    assert (report.inserted, report.chunks) == (25, 3)
+    assert client.get("/links/impcli24").json() == {"Redirect": "https://example.com/cli/24"}
@@ -67,17 +67,12 @@ def test_search_nonexistent_link(client):
     assert response.json()["detail"] == "Link not found"
 
 
-def login_and_get_token(client):
-    client.post("/auth/register", json={
-        "email": "secure@example.com",
-        "password": "password123"
-    })
-    response = client.post("/auth/login", data={
-        "username": "secure@example.com",
-        "password": "password123"
-    })
-    return response.json()["access_token"]
-
-
-
-
+def test_generated_codes_are_unique(client):
+    codes = set()
+    for i in range(20):
+        response = client.post("/links/shorten", json={
+            "original_url": f"https://example.com/generated-{i}",
+        })
+        assert response.status_code == 200
+        codes.add(response.json()["short_url"])
+    assert len(codes) == 20
@@ -1,24 +1,3 @@
-import pytest
-
-
-def login_and_get_token(client):
-    client.post("/auth/register", json={
-        "email": "secure@example.com",
-        "password": "password123"
-    })
-    response = client.post("/auth/login", data={
-        "username": "secure@example.com",
-        "password": "password123"
-    })
-    return response.json()["access_token"]
-
-
-@pytest.fixture
-def auth_header(client):
-    token = login_and_get_token(client)
-    return {"Authorization": f"Bearer {token}"}
-
-
 def test_update_link(client, auth_header):
     client.post("/links/shorten", json={
         "original_url": "https://example.com",
@@ -0,0 +1,81 @@
+import json
+from datetime import datetime, timedelta
+from src import links
+
+
+def expires():
+    return (datetime.utcnow() + timedelta(days=1)).isoformat()
+
+
+def test_batch_shorten_reports_each_item(client):
+    client.post("/links/shorten", json={
+        "original_url": "https://example.com/taken",
+        "custom_alias": "batchtaken",
+        "expires_at": expires(),
+    })
+
+    response = client.post("/links/shorten/batch", json=[
+        {"original_url": "https://example.com/a", "expires_at": expires()},
+        {"original_url": "https://example.com/b", "custom_alias": "batchfree"},
+        {"original_url": "https://example.com/c", "custom_alias": "batchfree"},
+        {"original_url": "https://example.com/d", "custom_alias": "batchtaken"},
+    ])
+    assert response.status_code == 200
+    results = response.json()
+
+    assert [result["status"] for result in results] == ["created", "created", "conflict", "conflict"]
+    assert results[1]["short_url"] == "batchfree"
+    assert client.get(f"/links/{results[0]['short_url']}").json()["Redirect"] == "https://example.com/a"
+
+
+def test_batch_retries_collisions_from_spare_codes(client, monkeypatch):
+    client.post("/links/shorten", json={
+        "original_url": "https://example.com/squatter",
+        "custom_alias": "squatted",
+        "expires_at": expires(),
+    })
+    calls = []
+
+    # Первый выданный код уже занят чужим алиасом
+    async def allocate(bind, count=1):
+        calls.append(count)
+        return ["squatted"] + [f"spare{i}" for i in range(count - 1)]
+    monkeypatch.setattr(links.code_allocator, "allocate", allocate)
+
+    response = client.post("/links/shorten/batch", json=[
+        {"original_url": "https://example.com/collided"},
+        {"original_url": "https://example.com/clean"},
+    ])
+    results = response.json()
+
+    assert [result["status"] for result in results] == ["created", "created"]
+    assert results[0]["short_url"] not in ("squatted", results[1]["short_url"])
+    # Запасные коды взяты заранее, посреди транзакции аренды нет
+    assert len(calls) == 1
+
+
+def test_batch_shorten_limit(client):
+    response = client.post("/links/shorten/batch", json=[
+        {"original_url": f"https://example.com/{i}"} for i in range(1001)
+    ])
+    assert response.status_code == 413
+
+
+def test_batch_shorten_stream(client):
+    lines = [
+        json.dumps({"original_url": "https://example.com/stream-1"}),
+        "not json",
+        json.dumps({"original_url": "https://example.com/stream-2", "custom_alias": "streamalias"}),
+    ]
+    response = client.post(
+        "/links/shorten/batch/stream",
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+
+    by_index = {result["index"]: result for result in results}
+    assert by_index[0]["status"] == "created"
+    assert by_index[1]["status"] == "invalid"
+    assert by_index[2]["short_url"] == "streamalias"
@@ -0,0 +1,22 @@
+from src.admission import controller
+
+
+def test_full_class_gets_fast_503(client, monkeypatch):
+    # Медленные редиректы предыдущих модулей не должны включать урезанные пределы
+    monkeypatch.setattr(controller, "redirect_latency", None)
+    listing = controller.classes["listing"]
+    monkeypatch.setattr(listing, "limit", 0)
+    monkeypatch.setattr(listing, "max_queue", 0)
+
+    response = client.get("/links/archive/")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(listing.retry_after)
+    assert response.json()["reason"] == "queue_full"
+
+    # Остальные классы и редиректы не затронуты
+    assert client.get("/links/unknowncode").status_code == 404
+
+    admission = client.get("/status").json()["admission"]
+    assert admission["classes"]["listing"]["rejected"]["queue_full"] >= 1
+    assert admission["classes"]["listing"]["in_flight"] == 0
+    assert 'admission_rejected_total{route_class="listing",reason="queue_full"}' in client.get("/metrics").text
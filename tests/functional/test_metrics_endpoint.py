@@ -0,0 +1,55 @@
+import re
+
+
+def metric_value(text, name, **labels):
+    # Строка метрики с нужными метками в любом порядке
+    for line in text.splitlines():
+        if not line.startswith(name + "{") and line.split(" ")[0] != name:
+            continue
+        if all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_record_route_templates(client):
+    client.post("/links/shorten", json={
+        "original_url": "https://example.com/metrics",
+        "custom_alias": "metricscode"
+    })
+    before = client.get("/metrics").text
+    client.get("/links/metricscode")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    route = "/links/{short_code}"
+    assert "metricscode" not in text
+    assert metric_value(text, "http_requests_total", method="GET", route=route, status="200") == \
+        metric_value(before, "http_requests_total", method="GET", route=route, status="200") + 1
+    assert metric_value(text, "http_request_duration_seconds_count", method="GET", route=route) >= 1
+    assert metric_value(text, "db_query_duration_seconds_count") > 0
+    assert re.search(r'db_pool_checked_out\{pool="async"\} \d+', text)
+
+
+def test_metrics_count_cache_namespaces(client):
+    client.post("/links/shorten", json={
+        "original_url": "https://example.com/metrics/stats",
+        "custom_alias": "metricsstats"
+    })
+    before = client.get("/metrics").text
+    client.get("/links/metricsstats/stats")
+    client.get("/links/metricsstats/stats")
+    text = client.get("/metrics").text
+
+    for result in ("hit", "miss"):
+        assert metric_value(text, "cache_requests_total", namespace="stats", result=result) == \
+            metric_value(before, "cache_requests_total", namespace="stats", result=result) + 1
+    assert metric_value(text, "http_request_db_queries_count", route="/links/{short_code}/stats") >= 2
+
+
+def test_metrics_label_unmatched_paths(client):
+    client.get("/no/such/path")
+    text = client.get("/metrics").text
+    assert metric_value(text, "http_requests_total", route="unmatched", status="404") >= 1
+    assert "/no/such/path" not in text
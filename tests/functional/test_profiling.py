@@ -0,0 +1,56 @@
+import pytest
+from src import profiler
+from src.main import app
+
+TOKEN = "profile-secret"
+PROFILE_AUTH = {"X-Profile-Token": TOKEN}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def profiling_configured():
+    # В main роутер подключается, только если PROFILE_TOKEN задан при старте
+    assert not profiler.PROFILE_TOKEN
+    routes = len(app.router.routes)
+    profiler.PROFILE_TOKEN = TOKEN
+    app.include_router(profiler.router)
+    yield
+    profiler.PROFILE_TOKEN = None
+    del app.router.routes[routes:]
+
+
+def test_profile_header_records_queries(client, auth_header):
+    project = client.post("/projects/", json={"name": "profiled"}, headers=auth_header).json()
+
+    response = client.get(f"/projects/{project['id']}", headers={**auth_header, **PROFILE_AUTH, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+    report = client.get(f"/debug/profiles/{response.headers['x-profile-id']}", headers=PROFILE_AUTH).json()
+    assert report["route"] == "/projects/{project_id}"
+    assert report["status"] == 200
+    assert report["queries"] == len(report["statements"]) > 0
+    assert report["stacks"] is None
+    summaries = client.get("/debug/profiles/", headers=PROFILE_AUTH).json()
+    assert any(summary["id"] == report["id"] for summary in summaries)
+
+
+def test_requests_without_header_are_not_profiled(client):
+    response = client.get("/")
+    assert "server-timing" not in response.headers
+    assert "x-profile-id" not in response.headers
+
+
+def test_profile_with_stack_samples(client):
+    response = client.get("/", headers={**PROFILE_AUTH, "X-Profile": "stacks"})
+    report = client.get(f"/debug/profiles/{response.headers['x-profile-id']}", headers=PROFILE_AUTH).json()
+    assert report["stacks"]["interval_ms"] > 0
+    assert client.get("/debug/profiles/missing", headers=PROFILE_AUTH).status_code == 404
+
+
+def test_profiling_requires_token(client):
+    for headers in ({"X-Profile": "stacks"}, {"X-Profile": "stacks", "X-Profile-Token": "wrong"}):
+        response = client.get("/", headers=headers)
+        assert "x-profile-id" not in response.headers
+
+    assert client.get("/debug/profiles/").status_code == 403
+    assert client.get("/debug/profiles/", headers={"X-Profile-Token": "wrong"}).status_code == 403
@@ -1,61 +1,147 @@
-import pytest
-
-
-def login_and_get_token(client):
-    client.post("/auth/register", json={
-        "email": "secure@example.com",
-        "password": "password123"
-    })
-    response = client.post("/auth/login", data={
-        "username": "secure@example.com",
-        "password": "password123"
-    })
-    return response.json()["access_token"]
-
-
-@pytest.fixture
-def project_header(client):
-    token = login_and_get_token(client)
-    return {"Authorization": f"Bearer {token}"}
-
-
-def test_create_duplicate_project(client, project_header):
-    client.post("/projects/", json={"name": "DuplicateProject"}, headers=project_header)
-    response = client.post("/projects/", json={"name": "DuplicateProject"}, headers=project_header)
+def test_create_duplicate_project(client, auth_header):
+    client.post("/projects/", json={"name": "DuplicateProject"}, headers=auth_header)
+    response = client.post("/projects/", json={"name": "DuplicateProject"}, headers=auth_header)
     assert response.status_code == 409
     assert response.json()["detail"] == "Project with this name already exists"
 
 
-def test_create_project(client, project_header):
-    response = client.post("/projects/", json={"name": "MyProject"}, headers=project_header)
+def test_create_project(client, auth_header):
+    response = client.post("/projects/", json={"name": "MyProject"}, headers=auth_header)
     assert response.status_code == 200
     data = response.json()
     assert data["name"] == "MyProject"
     assert "id" in data
 
 
-def test_add_link_to_project(client, project_header):
+def test_add_link_to_project(client, auth_header):
     # Создаём ссылку
     client.post("/links/shorten", json={
         "original_url": "https://example.com",
         "custom_alias": "testalias",
         "expires_at": "2025-05-31T12:46:57",
-    }, headers=project_header)
+    }, headers=auth_header)
 
     # Создаём проект
-    project_resp = client.post("/projects/", json={"name": "Proj1"}, headers=project_header)
+    project_resp = client.post("/projects/", json={"name": "Proj1"}, headers=auth_header)
     project_id = project_resp.json()["id"]
 
     # Добавляем ссылку
-    response = client.post(f"/projects/{project_id}/links/testalias", headers=project_header)
+    response = client.post(f"/projects/{project_id}/links/testalias", headers=auth_header)
     assert response.status_code == 200
     assert response.json()["message"] == "Link added to project"
 
 
-def test_get_project(client, project_header):
-    project_resp = client.post("/projects/", json={"name": "ProjectToRead"}, headers=project_header)
+def test_get_project(client, auth_header):
+    project_resp = client.post("/projects/", json={"name": "ProjectToRead"}, headers=auth_header)
     project_id = project_resp.json()["id"]
 
-    response = client.get(f"/projects/{project_id}", headers=project_header)
+    response = client.get(f"/projects/{project_id}", headers=auth_header)
+    assert response.status_code == 200
+    assert response.json()["name"] == "ProjectToRead"
+
+def test_project_view_shows_unique_visitors(client, auth_header):
+    client.post("/links/shorten", json={
+        "original_url": "https://example.com/visited",
+        "custom_alias": "visitedalias",
+    }, headers=auth_header)
+    project_id = client.post("/projects/", json={"name": "Visited"}, headers=auth_header).json()["id"]
+    client.post(f"/projects/{project_id}/links/visitedalias", headers=auth_header)
+
+    for agent in ("a", "b", "a"):
+        client.get("/links/visitedalias", headers={"User-Agent": agent})
+
+    response = client.get(f"/projects/{project_id}", headers=auth_header)
+    assert response.status_code == 200
+    links = response.json()["links"]
+    assert [link["short_url"] for link in links] == ["visitedalias"]
+    assert links[0]["unique_visitors"] == 2
+
+
+def test_project_links_are_paged_and_counted(client, auth_header):
+    project_id = client.post("/projects/", json={"name": "Paged"}, headers=auth_header).json()["id"]
+    for i in range(5):
+        client.post("/links/shorten", json={
+            "original_url": f"https://example.com/paged/{i}",
+            "custom_alias": f"projpaged{i}",
+        }, headers=auth_header)
+        client.post(f"/projects/{project_id}/links/projpaged{i}", headers=auth_header)
+
+    codes = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get(f"/projects/{project_id}", params=params, headers=auth_header).json()
+        assert body["links_count"] == 5
+        assert len(body["links"]) <= 2
+        codes.extend(link["short_url"] for link in body["links"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert codes == [f"projpaged{i}" for i in range(5)]
+
+    # Удаление ссылки уменьшает счётчик проекта
+    assert client.delete("/links/projpaged0", headers=auth_header).status_code == 200
+    body = client.get(f"/projects/{project_id}", headers=auth_header).json()
+    assert body["links_count"] == 4
+    assert len(body["links"]) == 4
+
+
+def test_batch_add_and_remove_links(client, auth_header):
+    project_id = client.post("/projects/", json={"name": "Campaign"}, headers=auth_header).json()["id"]
+    for i in range(3):
+        client.post("/links/shorten", json={
+            "original_url": f"https://example.com/campaign/{i}",
+            "custom_alias": f"campaign{i}",
+        }, headers=auth_header)
+    # Чужая ссылка без владельца
+    client.post("/links/shorten", json={"original_url": "https://example.com/foreign", "custom_alias": "foreign1"})
+    client.post(f"/projects/{project_id}/links/campaign0", headers=auth_header)
+
+    response = client.post(
+        f"/projects/{project_id}/links:batch",
+        json=["campaign0", "campaign1", "campaign2", "foreign1", "missing1"],
+        headers=auth_header
+    )
+    assert response.status_code == 200
+    assert {item["short_code"]: item["status"] for item in response.json()} == {
+        "campaign0": "already_in_project",
+        "campaign1": "added",
+        "campaign2": "added",
+        "foreign1": "not_found",
+        "missing1": "not_found",
+    }
+    assert client.get(f"/projects/{project_id}", headers=auth_header).json()["links_count"] == 3
+
+    response = client.post(
+        f"/projects/{project_id}/links:batch-remove",
+        json=["campaign1", "campaign1", "missing1"],
+        headers=auth_header
+    )
+    assert [item["status"] for item in response.json()] == ["removed", "removed", "not_found"]
+    body = client.get(f"/projects/{project_id}", headers=auth_header).json()
+    assert body["links_count"] == 2
+    assert [link["short_url"] for link in body["links"]] == ["campaign0", "campaign2"]
+
+
+def test_batch_add_to_foreign_project(client, auth_header):
+    response = client.post("/projects/999999/links:batch", json=["campaign0"], headers=auth_header)
+    assert response.status_code == 404
+
+
+def test_project_view_revalidates_with_etag(client, auth_header):
+    project_id = client.post("/projects/", json={"name": "EtagProject"}, headers=auth_header).json()["id"]
+    response = client.get(f"/projects/{project_id}", headers=auth_header)
+    tag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = client.get(f"/projects/{project_id}", headers={**auth_header, "If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    code = client.post("/links/shorten", json={"original_url": "https://example.com/etag"}, headers=auth_header).json()["short_url"]
+    client.post(f"/projects/{project_id}/links/{code}", headers=auth_header)
+    response = client.get(f"/projects/{project_id}", headers={**auth_header, "If-None-Match": tag})
     assert response.status_code == 200
-    assert response.json()["name"] == "ProjectToRead"
\ No newline at end of file
+    assert response.headers["etag"] != tag
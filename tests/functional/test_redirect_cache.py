@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta
+from src.local_cache import redirect_cache
+
+
+def test_redirect_served_from_l1_and_invalidated_on_update(client, auth_header):
+    client.post("/links/shorten", json={
+        "original_url": "https://example.com/old",
+        "custom_alias": "l1alias",
+        "expires_at": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+    }, headers=auth_header)
+
+    assert client.get("/links/l1alias").json()["Redirect"] == "https://example.com/old"
+    hits = redirect_cache.hits
+    assert client.get("/links/l1alias").json()["Redirect"] == "https://example.com/old"
+    assert redirect_cache.hits == hits + 1
+
+    client.put("/links/l1alias", json={"new_url": "https://example.com/new"}, headers=auth_header)
+    assert client.get("/links/l1alias").json()["Redirect"] == "https://example.com/new"
+
+
+def test_status_exposes_cache_counters(client):
+    response = client.get("/status")
+    assert response.status_code == 200
+    assert {"hits", "misses", "evictions"} <= response.json()["redirect_cache"].keys()
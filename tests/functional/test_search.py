@@ -0,0 +1,56 @@
+from src.links import cache_key_search
+from src.redis_client import redis_client
+
+
+def search(client, url, **params):
+    return client.get("/links/search/", params={"original_url": url, **params})
+
+
+def test_search_matches_normalized_url(client, create_link):
+    create_link("search1", "https://search.example/page")
+
+    response = search(client, "HTTPS://Search.Example:443/page")
+    assert response.status_code == 200
+    assert [item["short_code"] for item in response.json()] == ["search1"]
+
+
+def test_mutations_invalidate_search_cache(client, create_link):
+    create_link("cached1", "https://cached.example/")
+    assert len(search(client, "https://cached.example/").json()) == 1
+    assert redis_client.exists(cache_key_search("https://cached.example/"))
+
+    # Новая ссылка на тот же адрес сразу видна в выдаче
+    create_link("cached2", "https://cached.example/")
+    assert len(search(client, "https://cached.example/").json()) == 2
+
+    client.post("/links/shorten/batch", json=[{"original_url": "https://cached.example/", "custom_alias": "cached3"}])
+    assert len(search(client, "https://cached.example/").json()) == 3
+
+
+def test_search_pagination(client, create_link):
+    for i in range(5):
+        create_link(f"paged{i}", "https://paged.example/")
+
+    codes = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = search(client, "https://paged.example/", **params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        codes.extend(item["short_code"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert codes == [f"paged{i}" for i in range(5)]
+    # Все страницы лежат в одном хеше
+    assert redis_client.hlen(cache_key_search("https://paged.example/")) == 3
+
+
+def test_search_with_unparseable_url(client):
+    # Порт вне диапазона и незакрытый IPv6 — просто ничего не найдено
+    for url in ("http://a.com:99999/", "http://[::1"):
+        assert search(client, url).status_code == 404
@@ -0,0 +1,51 @@
+from src.bloom import bloom_add, rebuild_bloom_filter
+from src.links import cache_key_notfound, is_known_code
+from src.redis_client import redis_client
+
+
+def test_unknown_code_is_negatively_cached(client):
+    # Код есть в фильтре (ложное срабатывание), но не в БД
+    client.portal.call(bloom_add, "nosuchcode")
+
+    response = client.get("/links/nosuchcode")
+    assert response.status_code == 404
+    assert redis_client.exists(cache_key_notfound("nosuchcode"))
+
+    response = client.get("/links/nosuchcode/stats")
+    assert response.status_code == 404
+
+
+def test_create_clears_negative_cache(client, create_link):
+    client.portal.call(bloom_add, "latecode")
+    client.get("/links/latecode")
+    assert redis_client.exists(cache_key_notfound("latecode"))
+
+    create_link("latecode")
+    assert not redis_client.exists(cache_key_notfound("latecode"))
+    assert client.get("/links/latecode").status_code == 200
+
+
+def test_bloom_filter_rejects_unknown_codes(client, session_factory, create_link):
+    create_link("bloomknown")
+    rebuild_bloom_filter(session_factory)
+
+    assert client.portal.call(is_known_code, "bloomknown")
+    assert not client.portal.call(is_known_code, "bloomunknown")
+
+    # Новые ссылки попадают в фильтр сразу
+    create_link("bloomfresh")
+    assert client.portal.call(is_known_code, "bloomfresh")
+    assert client.get("/links/bloomfresh").status_code == 200
+
+
+def test_codes_added_during_rebuild_survive_swap(client, session_factory):
+    # Код создан, пока перестройка читает БД: в выборку он не попал,
+    # но в подменённом фильтре должен быть
+    def factory_adding_code():
+        client.portal.call(bloom_add, "midrebuild")
+        return session_factory()
+
+    rebuild_bloom_filter(factory_adding_code)
+
+    assert client.portal.call(is_known_code, "midrebuild")
+    assert not client.portal.call(is_known_code, "bloomunknown")
@@ -0,0 +1,49 @@
+"""
+Локальная замена Redis для нагрузочных прогонов без сети: fakeredis,
+слушающий TCP-порт из REDIS_URL. Данные живут в памяти процесса.
+
+    pip install fakeredis
+    python -m tests.load.redis_standin
+
+Это не Redis: fakeredis однопоточный и написан на Python, поэтому задержки
+Redis в таком прогоне больше настоящих. Для сравнения между собой сценариев
+и версий кода этого достаточно, для абсолютных цифр — нет.
+
+Bloom-фильтр коротких кодов (битовая строка на 14 млн бит) на замене не
+построить: каждый SETBIT стоит около миллисекунды, запись 1000 кодов одной
+транзакцией не укладывается в CACHE_OPERATION_TIMEOUT и открывает
+предохранитель, а перестройка по миллиону кодов заняла бы часы. Поэтому
+tests.load.seed запускается с --skip-bloom, и фильтр пропускает все коды.
+"""
+import argparse
+import sys
+from urllib.parse import urlsplit
+from src.redis_client import REDIS_URL
+
+
+def main(argv=None) -> int:
+    target = urlsplit(REDIS_URL)
+    parser = argparse.ArgumentParser(description="Serve an in-memory Redis stand-in over TCP")
+    parser.add_argument("--host", default=target.hostname or "127.0.0.1")
+    parser.add_argument("--port", type=int, default=target.port or 6379)
+    args = parser.parse_args(argv)
+
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        print("fakeredis is required for the Redis stand-in: pip install fakeredis", file=sys.stderr)
+        return 1
+
+    server = TcpFakeServer((args.host, args.port), server_type="redis")
+    print(f"Redis stand-in listening on {args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
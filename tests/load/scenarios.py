@@ -0,0 +1,293 @@
+"""
+Библиотека нагрузочных сценариев Locust. Сценарий — класс пользователя,
+выбирается в командной строке; несколько классов смешиваются по весам.
+
+    python -m tests.load.redis_standin &              # если нет Redis
+    python -m tests.load.seed --links 1000000 --users 200   # с заменой Redis: --skip-bloom
+    uvicorn src.main:app --workers 4 &
+
+    locust -f tests/load/scenarios.py --headless -H http://localhost:8000 \\
+        -u 200 -r 50 -t 2m --summary-path load-zipf.json ZipfRedirectUser
+
+Сценарии:
+    ZipfRedirectUser    редиректы по Zipf(--zipf-s) над --seeded-links кодами
+    NotFoundFloodUser   редиректы по несуществующим кодам
+    CreateBurstUser     создание ссылок по одной и пачками без пауз
+    MixedAuthUser       вход, свои ссылки, статистика, поиск, проекты, архив
+    ExpiryStormUser     горячие коды, кэш которых раз в --storm-interval
+                        сбрасывается разом в Redis и L1 всех воркеров
+
+По завершении в --summary-path пишется JSON: пропускная способность и
+p50/p95/p99 на каждый эндпоинт.
+"""
+import bisect
+import itertools
+import json
+import random
+import uuid
+from array import array
+from datetime import datetime
+import gevent
+import redis
+from locust import HttpUser, between, constant, events, task
+from locust.runners import WorkerRunner
+from src.links import cache_key_redirect
+from src.local_cache import INVALIDATION_CHANNEL
+from src.redis_client import REDIS_URL
+from tests.load.seed import DEFAULT_LINKS, DEFAULT_USERS, LOAD_PASSWORD, USER_EMAIL, seed_code
+
+HOT_CODES = 100
+STORM_INTERVAL = 30
+ZIPF_S = 1.1
+BATCH_SIZE = 50
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument("--seeded-links", type=int, default=DEFAULT_LINKS, help="codes created by tests.load.seed")
+    parser.add_argument("--seeded-users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--zipf-s", type=float, default=ZIPF_S, help="Zipf exponent of redirect popularity")
+    parser.add_argument("--hot-codes", type=int, default=HOT_CODES, help="codes hit by ExpiryStormUser")
+    parser.add_argument("--storm-interval", type=float, default=STORM_INTERVAL)
+    parser.add_argument("--redis-url", default=REDIS_URL, help="Redis used by the service, for expiry storms")
+    parser.add_argument("--summary-path", default="load-summary.json")
+
+
+class ZipfSampler:
+    # Ранг k выпадает с вероятностью ~ 1/k^s: накопленные веса и бинарный поиск
+    def __init__(self, count: int, s: float):
+        self.cumulative = array("d", itertools.accumulate(1 / rank ** s for rank in range(1, count + 1)))
+        self.total = self.cumulative[-1]
+
+    def sample(self) -> int:
+        return bisect.bisect_left(self.cumulative, random.random() * self.total)
+
+
+samplers: dict[tuple[int, float], ZipfSampler] = {}
+
+
+def zipf_sampler(count: int, s: float) -> ZipfSampler:
+    # Один на процесс: на миллион кодов таблица весов весит ~8 МБ
+    key = (count, s)
+    if key not in samplers:
+        samplers[key] = ZipfSampler(count, s)
+    return samplers[key]
+
+
+def check_redirect(response):
+    if response.status_code == 200:
+        response.success()
+    else:
+        response.failure(f"Expected 200 but got {response.status_code}")
+
+
+class ZipfRedirectUser(HttpUser):
+    wait_time = between(0.05, 0.2)
+
+    def on_start(self):
+        options = self.environment.parsed_options
+        self.sampler = zipf_sampler(options.seeded_links, options.zipf_s)
+
+    @task
+    def redirect(self):
+        code = seed_code(self.sampler.sample())
+        with self.client.get(f"/links/{code}", name="/links/[code]", catch_response=True) as response:
+            check_redirect(response)
+
+
+class NotFoundFloodUser(HttpUser):
+    wait_time = constant(0)
+
+    @task
+    def unknown_code(self):
+        code = uuid.uuid4().hex[:10]
+        with self.client.get(f"/links/{code}", name="/links/[unknown]", catch_response=True) as response:
+            if response.status_code == 404:
+                response.success()
+            else:
+                response.failure(f"Expected 404 but got {response.status_code}")
+
+
+class CreateBurstUser(HttpUser):
+    wait_time = constant(0)
+
+    @task(5)
+    def shorten(self):
+        self.client.post("/links/shorten", json={
+            "original_url": f"https://burst.example.com/{uuid.uuid4().hex}"
+        })
+
+    @task(1)
+    def shorten_batch(self):
+        self.client.post("/links/shorten/batch", json=[
+            {"original_url": f"https://burst.example.com/batch/{uuid.uuid4().hex}"}
+            for _ in range(BATCH_SIZE)
+        ])
+
+
+class MixedAuthUser(HttpUser):
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        options = self.environment.parsed_options
+        self.sampler = zipf_sampler(options.seeded_links, options.zipf_s)
+        email = USER_EMAIL.format(random.randrange(options.seeded_users))
+        response = self.client.post("/auth/login", data={"username": email, "password": LOAD_PASSWORD})
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"} if response.ok else {}
+        self.own_codes: list[str] = []
+        self.project_id = None
+
+    @task(6)
+    def redirect(self):
+        code = seed_code(self.sampler.sample())
+        with self.client.get(f"/links/{code}", name="/links/[code]", catch_response=True) as response:
+            check_redirect(response)
+
+    @task(3)
+    def create_link(self):
+        response = self.client.post("/links/shorten", json={
+            "original_url": f"https://mixed.example.com/{uuid.uuid4().hex}"
+        }, headers=self.headers)
+        if response.ok:
+            self.own_codes.append(response.json()["short_url"])
+
+    @task(3)
+    def stats(self):
+        code = seed_code(self.sampler.sample())
+        self.client.get(f"/links/{code}/stats", name="/links/[code]/stats")
+
+    @task(2)
+    def search(self):
+        rank = self.sampler.sample()
+        self.client.get(
+            "/links/search/",
+            params={"original_url": f"https://load.example.com/{rank % 50_000}/{rank}"},
+            name="/links/search/"
+        )
+
+    @task(1)
+    def update_link(self):
+        if self.own_codes:
+            self.client.put(
+                f"/links/{random.choice(self.own_codes)}",
+                json={"new_url": f"https://mixed.example.com/updated/{uuid.uuid4().hex}"},
+                headers=self.headers,
+                name="/links/[code] (update)"
+            )
+
+    @task(1)
+    def delete_link(self):
+        if len(self.own_codes) > 10:
+            code = self.own_codes.pop(0)
+            self.client.delete(f"/links/{code}", headers=self.headers, name="/links/[code] (delete)")
+
+    @task(1)
+    def add_to_project(self):
+        if self.project_id is None:
+            response = self.client.post("/projects/", json={"name": f"load-{uuid.uuid4().hex[:8]}"}, headers=self.headers)
+            if not response.ok:
+                return
+            self.project_id = response.json()["id"]
+        if self.own_codes:
+            self.client.post(
+                f"/projects/{self.project_id}/links/{self.own_codes[-1]}",
+                headers=self.headers,
+                name="/projects/[id]/links/[code]"
+            )
+        self.client.get(f"/projects/{self.project_id}", headers=self.headers, name="/projects/[id]")
+
+    @task(1)
+    def archive(self):
+        self.client.get("/links/archive/", headers=self.headers)
+
+
+class ExpiryStormUser(HttpUser):
+    wait_time = constant(0)
+
+    def on_start(self):
+        self.hot_codes = [seed_code(rank) for rank in range(self.environment.parsed_options.hot_codes)]
+
+    @task
+    def redirect_hot(self):
+        code = random.choice(self.hot_codes)
+        with self.client.get(f"/links/{code}", name="/links/[hot code]", catch_response=True) as response:
+            check_redirect(response)
+
+
+def expire_hot_codes(environment):
+    # Все горячие ключи пропадают одновременно — как при общем TTL после прогрева
+    options = environment.parsed_options
+    client = redis.Redis.from_url(options.redis_url)
+    codes = [seed_code(rank) for rank in range(options.hot_codes)]
+    while True:
+        gevent.sleep(options.storm_interval)
+        pipe = client.pipeline(transaction=False)
+        pipe.delete(*(cache_key_redirect(code) for code in codes))
+        pipe.publish(INVALIDATION_CHANNEL, json.dumps(codes))
+        pipe.execute()
+        environment.events.request.fire(
+            request_type="STORM",
+            name="expire hot codes",
+            response_time=0,
+            response_length=len(codes),
+            exception=None,
+            context={}
+        )
+
+
+storm = None
+
+
+@events.test_start.add_listener
+def start_storms(environment, **kwargs):
+    global storm
+    # Сбросом кэша занимается один процесс, а не каждый воркер
+    if isinstance(environment.runner, WorkerRunner) or storm is not None:
+        return
+    if any(user_class is ExpiryStormUser for user_class in environment.user_classes):
+        storm = gevent.spawn(expire_hot_codes, environment)
+
+
+def entry_summary(entry) -> dict:
+    return {
+        "requests": entry.num_requests,
+        "failures": entry.num_failures,
+        "rps": round(entry.total_rps, 2),
+        "p50_ms": entry.get_response_time_percentile(0.5),
+        "p95_ms": entry.get_response_time_percentile(0.95),
+        "p99_ms": entry.get_response_time_percentile(0.99),
+        "mean_ms": round(entry.avg_response_time, 2),
+        "max_ms": entry.max_response_time,
+    }
+
+
+@events.test_stop.add_listener
+def write_summary(environment, **kwargs):
+    global storm
+    if storm is not None:
+        storm.kill()
+        storm = None
+    if isinstance(environment.runner, WorkerRunner):
+        return
+
+    stats = environment.stats
+    options = environment.parsed_options
+    summary = {
+        "scenarios": [user_class.__name__ for user_class in environment.user_classes],
+        "finished_at": datetime.utcnow().isoformat(),
+        "duration_s": round(stats.last_request_timestamp - stats.start_time, 1) if stats.last_request_timestamp else 0,
+        "users": environment.runner.user_count if environment.runner else None,
+        "options": {
+            "seeded_links": options.seeded_links,
+            "zipf_s": options.zipf_s,
+            "hot_codes": options.hot_codes,
+            "storm_interval": options.storm_interval,
+        },
+        "endpoints": {
+            f"{entry.method} {entry.name}": entry_summary(entry)
+            for entry in sorted(stats.entries.values(), key=lambda entry: (entry.name, entry.method))
+        },
+        "total": entry_summary(stats.total),
+    }
+    with open(options.summary_path, "w") as output:
+        json.dump(summary, output, indent=2)
@@ -0,0 +1,108 @@
+"""
+Наполнение базы для нагрузочных сценариев (tests/load/scenarios.py).
+
+Ссылки z0 … z{N-1} импортируются через src/importer.py, пользователи
+load0@example.com … с паролем LOAD_PASSWORD создаются с одним заранее
+посчитанным хешем. Затем Bloom-фильтр строится заново по всей базе
+небольшими пачками через синхронный клиент с длинным таймаутом: bloom_add
+импорта с короткими таймаутами обработчиков на большом наборе может не
+успеть, а коды, которые он не записал, живут только в памяти этого процесса.
+
+    python -m tests.load.seed --links 1000000 --users 200
+
+Запускать до старта сервиса или при запущенном — с тем же Redis.
+
+С заменой Redis из tests/load/redis_standin.py фильтр не строится: SETBIT
+по битовой строке фильтра стоит в fakeredis около миллисекунды, и миллион
+кодов заняли бы часы. Для неё нужен --skip-bloom: фильтр помечается
+непостроенным и пропускает все коды, пока его не перестроят. Перестройка
+при старте сервиса на замене тоже не успеет и оставит фильтр непостроенным,
+но нагрузит её на время прогона — сравнивайте с этим в уме.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import insert, select
+from src import bloom, importer
+from src.database import AsyncSessionLocal, SessionLocal, init_db
+from src.models import User
+from src.security import get_password_hash
+
+CODE_PREFIX = "z"
+USER_EMAIL = "load{}@example.com"
+LOAD_PASSWORD = "load-password"
+DEFAULT_LINKS = 1_000_000
+DEFAULT_USERS = 200
+# 100 кодов — около тысячи SETBIT на один запрос к Redis
+BLOOM_SEED_CHUNK = 100
+
+
+def seed_code(rank: int) -> str:
+    return f"{CODE_PREFIX}{rank}"
+
+
+async def link_lines(count: int):
+    # Файл не нужен: строки NDJSON генерируются на лету
+    expires_at = (datetime.utcnow() + timedelta(days=30)).isoformat()
+    for rank in range(count):
+        yield json.dumps({
+            "short_code": seed_code(rank),
+            "original_url": f"https://load.example.com/{rank % 50_000}/{rank}",
+            "expires_at": expires_at,
+        })
+
+
+async def seed_links(count: int) -> importer.ImportReport:
+    async with AsyncSessionLocal() as db:
+        return await importer.import_links(
+            db,
+            link_lines(count),
+            "ndjson",
+            "skip",
+            progress=importer.print_progress
+        )
+
+
+def seed_users(count: int, session_factory=SessionLocal) -> int:
+    emails = [USER_EMAIL.format(i) for i in range(count)]
+    hashed = get_password_hash(LOAD_PASSWORD)
+    with session_factory() as db:
+        existing = set(db.execute(select(User.email).where(User.email.in_(emails))).scalars())
+        rows = [
+            {"email": email, "hashed_password": hashed, "is_active": True, "created_at": datetime.utcnow()}
+            for email in emails if email not in existing
+        ]
+        if rows:
+            db.execute(insert(User), rows)
+            db.commit()
+    return len(rows)
+
+
+def seed_bloom_filter(skip: bool) -> Optional[int]:
+    if skip:
+        # Без отметки о готовности фильтр пропускает все коды
+        bloom.redis_client.delete(bloom.BLOOM_READY_KEY)
+        return None
+    return bloom.rebuild_bloom_filter(chunk_size=BLOOM_SEED_CHUNK)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Seed links and users for the load scenarios")
+    parser.add_argument("--links", type=int, default=DEFAULT_LINKS)
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--skip-bloom", action="store_true", help="leave the Bloom filter unbuilt (Redis stand-in)")
+    args = parser.parse_args(argv)
+
+    init_db()
+    report = asyncio.run(importer.then_dispose_engine(seed_links(args.links)))
+    users = seed_users(args.users)
+    bloom_codes = seed_bloom_filter(args.skip_bloom)
+    print(json.dumps({"links": report.stats(), "users_created": users, "bloom_codes": bloom_codes}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import asyncio
+from src.admission import AdmissionController, RouteClass, ROUTE_CLASS_LIMITS
+
+
+class TestRouteClassification:
+    def test_routes_map_to_classes(self):
+        controller = AdmissionController(ROUTE_CLASS_LIMITS)
+        assert controller.route_class("GET", "/links/abc123").name == "redirect"
+        assert controller.route_class("GET", "/links/abc123/stats").name == "default"
+        assert controller.route_class("POST", "/auth/login").name == "auth"
+        assert controller.route_class("POST", "/links/shorten/batch").name == "bulk"
+        assert controller.route_class("POST", "/projects/7/links:batch-remove").name == "bulk"
+        assert controller.route_class("GET", "/links/archive/").name == "listing"
+        assert controller.route_class("GET", "/projects/7").name == "listing"
+        assert controller.route_class("GET", "/metrics") is None
+
+
+class TestRouteClass:
+    def test_queues_then_sheds(self):
+        async def scenario():
+            route_class = RouteClass("bulk", limit=1, max_queue=1, queue_timeout=1.0)
+            assert await route_class.acquire(False) is None
+            waiting = asyncio.create_task(route_class.acquire(False))
+            await asyncio.sleep(0)
+            assert await route_class.acquire(False) == "queue_full"
+
+            route_class.release(False)
+            assert await waiting is None
+            assert route_class.in_flight == 1
+            return route_class.stats(False)
+
+        stats = asyncio.run(scenario())
+        assert (stats["admitted"], stats["queued"], stats["rejected"]) == (2, 1, {"queue_full": 1})
+
+    def test_queue_wait_is_bounded(self):
+        async def scenario():
+            route_class = RouteClass("listing", limit=1, max_queue=4, queue_timeout=0.01)
+            await route_class.acquire(False)
+            reason = await route_class.acquire(False)
+            return reason, route_class
+
+        reason, route_class = asyncio.run(scenario())
+        assert reason == "queue_timeout"
+        assert not route_class.waiters
+        assert route_class.in_flight == 1
+
+
+    def test_cancelled_waiter_returns_granted_slot(self):
+        async def scenario():
+            route_class = RouteClass("bulk", limit=1, max_queue=2, queue_timeout=1.0)
+            await route_class.acquire(False)
+            waiting = asyncio.create_task(route_class.acquire(False))
+            await asyncio.sleep(0)
+            # Слот передан ожидающему, но отмена приходит раньше, чем он проснулся
+            route_class.release(False)
+            waiting.cancel()
+            try:
+                # До Python 3.12 wait_for проглатывает такую отмену и отдаёт
+                # слот запросу — тогда вернуть его должен он сам
+                if await waiting is None:
+                    route_class.release(False)
+            except asyncio.CancelledError:
+                pass
+            return route_class
+
+        route_class = asyncio.run(scenario())
+        assert route_class.in_flight == 0
+        assert not route_class.waiters
+
+
+class TestOverload:
+    def test_slow_redirects_shed_lower_priority_work(self):
+        async def scenario():
+            controller = AdmissionController({
+                "redirect": {"limit": None},
+                "bulk": {"limit": 4, "pressure_limit": 0, "max_queue": 4, "queue_timeout": 1.0},
+            }, latency_budget=0.05)
+            controller.record_redirect(0.2)
+            assert controller.overloaded
+            bulk = await controller.classes["bulk"].acquire(controller.overloaded)
+            redirect = await controller.classes["redirect"].acquire(controller.overloaded)
+
+            for _ in range(20):
+                controller.record_redirect(0.001)
+            return bulk, redirect, controller.overloaded, controller.overloads
+
+        assert asyncio.run(scenario()) == ("overload", None, False, 1)
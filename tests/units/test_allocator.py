@@ -0,0 +1,34 @@
+import pytest
+from src.allocator import CodeAllocator, CodeSpaceExhausted, encode_id
+
+
+class TestEncodeId:
+    def test_fixed_length(self):
+        assert encode_id(0, length=6, alphabet="ab") == "aaaaaa"
+        assert encode_id(5, length=4, alphabet="0123456789") == "0005"
+
+    def test_overflow(self):
+        with pytest.raises(CodeSpaceExhausted):
+            encode_id(100, length=2, alphabet="0123456789")
+
+
+class TestCodeAllocator:
+    def test_permutation_is_collision_free(self):
+        """
+        Обфусцированные коды — перестановка: все коды пространства различны.
+        """
+        allocator = CodeAllocator(length=3, alphabet="abcdefghij", obfuscate=True)
+        codes = {allocator.encode(i) for i in range(allocator.space)}
+        assert len(codes) == allocator.space
+
+    def test_obfuscated_codes_are_not_sequential(self):
+        allocator = CodeAllocator(obfuscate=True)
+        plain = CodeAllocator(obfuscate=False)
+        assert plain.encode(1) == "aaaaab"
+        assert allocator.encode(1) != "aaaaab"
+        assert len(allocator.encode(1)) == allocator.length
+
+    def test_space_exhausted(self):
+        allocator = CodeAllocator(length=2, alphabet="ab")
+        with pytest.raises(CodeSpaceExhausted):
+            allocator.encode(4)
@@ -0,0 +1,29 @@
+from src.bloom import bloom_size, bloom_offsets, contains_from_results
+
+
+class TestBloomSize:
+    def test_bloom_size_matches_error_rate(self):
+        bits, hashes = bloom_size(1_000_000, 0.001)
+        # ~14.4 бита на элемент и 10 хеш-функций для 0.1% ложных срабатываний
+        assert 14_000_000 < bits < 14_500_000
+        assert hashes == 10
+
+
+class TestBloomOffsets:
+    def test_offsets_are_deterministic_and_in_range(self):
+        offsets = bloom_offsets("abc123", bits=1000, hashes=7)
+        assert offsets == bloom_offsets("abc123", bits=1000, hashes=7)
+        assert len(offsets) == 7
+        assert all(0 <= offset < 1000 for offset in offsets)
+
+    def test_different_codes_get_different_offsets(self):
+        assert bloom_offsets("abc123") != bloom_offsets("abc124")
+
+
+class TestContainsFromResults:
+    def test_not_ready_filter_accepts_everything(self):
+        assert contains_from_results([0, 0, 0])
+
+    def test_ready_filter_requires_all_bits(self):
+        assert contains_from_results([1, 1, 1])
+        assert not contains_from_results([1, 1, 0])
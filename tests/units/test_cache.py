@@ -0,0 +1,53 @@
+import asyncio
+import time
+from src.cache import CircuitBreaker
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.record_failure(ConnectionError())
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        breaker.record_failure(asyncio.TimeoutError())
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        assert breaker.stats()["short_circuited"] == 1
+        assert breaker.stats()["timeouts"] == 1
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure(ConnectionError())
+        breaker.record_success()
+        breaker.record_failure(ConnectionError())
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_lets_one_probe_through(self):
+        """
+        После паузы пропускается один пробный запрос: успех закрывает
+        предохранитель, остальные запросы до ответа идут мимо кэша.
+        """
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure(ConnectionError())
+        time.sleep(0.02)
+
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.01)
+        for _ in range(5):
+            breaker.record_failure(ConnectionError())
+        time.sleep(0.02)
+
+        assert breaker.allow()
+        breaker.record_failure(ConnectionError())
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()["opened"] == 2
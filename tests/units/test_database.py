@@ -1,6 +1,8 @@
 import pytest
-from sqlalchemy import inspect, text
-from src.database import get_db, init_db, Base, engine
+from sqlalchemy import create_engine, inspect, text
+from src.database import get_db, init_db
+# Таблицы попадают в Base.metadata при импорте моделей
+from src import models  # noqa: F401
 
 
 def test_get_db_yields_session():
@@ -16,11 +18,40 @@ def test_get_db_yields_session():
         pytest.fail("get_db должен завершиться после закрытия")
 
 
-def test_init_db_creates_tables():
-    Base.metadata.drop_all(bind=engine)
-    init_db()
+# Отдельная база на тест: data/shortener.db не трогаем
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'init.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_init_db_creates_tables(engine):
+    init_db(engine)
     inspector = inspect(engine)
     tables = inspector.get_table_names()
     assert "users" in tables
     assert "links" in tables
     assert "archived_links" in tables
+
+
+def test_init_db_adds_missing_columns(engine):
+    """
+    Столбцы, появившиеся в модели позже, добавляются в существующую таблицу.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE links (id INTEGER PRIMARY KEY, original_url VARCHAR NOT NULL, "
+            "short_code VARCHAR UNIQUE)"
+        ))
+    added = init_db(engine)
+    assert {"links.url_hash", "links.custom_alias", "links.expires_at"} <= added
+    columns = {column["name"] for column in inspect(engine).get_columns("links")}
+    assert {"url_hash", "custom_alias", "expires_at"} <= columns
+    indexes = {index["name"] for index in inspect(engine).get_indexes("links")}
+    assert "ix_links_url_hash" in indexes
+
+
+def test_init_db_reports_nothing_on_current_schema(engine):
+    init_db(engine)
+    assert init_db(engine) == set()
@@ -0,0 +1,31 @@
+from src import http_cache
+from src.http_cache import etag, etag_matches, redirect_cache_control, stats_cache_control
+
+
+class TestEtag:
+    def test_depends_on_every_part(self):
+        assert etag(b"payload") == etag(b"payload")
+        assert etag(1, 23) != etag(12, 3)
+        assert etag(b"payload").startswith('W/"')
+
+    def test_if_none_match_uses_weak_comparison(self):
+        tag = etag(b"payload")
+        assert etag_matches(tag, tag)
+        assert etag_matches(f'"other", {tag.removeprefix("W/")}', tag)
+        assert etag_matches("*", tag)
+        assert not etag_matches('"other"', tag)
+        assert not etag_matches(None, tag)
+
+
+class TestCacheControl:
+    def test_redirect_max_age_is_bounded_by_cache_ttl(self, monkeypatch):
+        monkeypatch.setattr(http_cache, "REDIRECT_MAX_AGE", 60)
+        assert redirect_cache_control(None) == "private, max-age=60"
+        assert redirect_cache_control(12.7) == "private, max-age=12"
+        assert redirect_cache_control(0.4) == "no-cache"
+
+    def test_caching_can_be_disabled(self, monkeypatch):
+        monkeypatch.setattr(http_cache, "REDIRECT_MAX_AGE", 0)
+        monkeypatch.setattr(http_cache, "STATS_MAX_AGE", 0)
+        assert redirect_cache_control(3600) == "no-cache"
+        assert stats_cache_control(30) == "no-cache"
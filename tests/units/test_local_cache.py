@@ -0,0 +1,40 @@
+import time
+from src.local_cache import TTLCache
+
+
+class TestTTLCache:
+    def test_get_after_set(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("abc", "https://example.com/")
+        assert cache.get("abc") == "https://example.com/"
+        assert cache.get("missing") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_eviction(self):
+        """
+        При переполнении вытесняется запись, к которой дольше всего не обращались.
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("short", "1", ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("short") is None
+        assert cache.stats()["expirations"] == 1
+        assert len(cache) == 0
+
+    def test_invalidate(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", "1")
+        cache.invalidate("a", "unknown")
+        assert cache.get("a") is None
+        assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,41 @@
+from src.metrics import Callback, Counter, Histogram, format_labels, render, registry
+
+
+class TestCounter:
+    def test_counts_per_label_values(self):
+        counter = Counter("things_total", "Things", ("kind",))
+        counter.inc("a")
+        counter.inc("a")
+        counter.inc("b", amount=3)
+        assert dict((labels, value) for _, labels, value in counter.samples()) == {
+            '{kind="a"}': 2,
+            '{kind="b"}': 3,
+        }
+
+    def test_escapes_label_values(self):
+        assert format_labels(("route",), ('say "hi"\\\n',)) == '{route="say \\"hi\\"\\\\\\n"}'
+
+
+class TestHistogram:
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "/x")
+        samples = {(name, labels): value for name, labels, value in histogram.samples()}
+        assert samples[("latency_seconds_bucket", '{route="/x",le="0.1"}')] == 2
+        assert samples[("latency_seconds_bucket", '{route="/x",le="1.0"}')] == 3
+        assert samples[("latency_seconds_bucket", '{route="/x",le="+Inf"}')] == 4
+        assert samples[("latency_seconds_count", '{route="/x"}')] == 4
+        assert samples[("latency_seconds_sum", '{route="/x"}')] == 3.65
+
+
+class TestRender:
+    def test_renders_help_type_and_callbacks(self):
+        gauge = Callback("queue_depth", "Items waiting", (), lambda: {(): 7})
+        registry.append(gauge)
+        try:
+            text = render()
+        finally:
+            registry.remove(gauge)
+        assert "# HELP queue_depth Items waiting\n# TYPE queue_depth gauge\nqueue_depth 7\n" in text
+        assert "# TYPE http_request_duration_seconds histogram" in text
@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src import passwords
+from src.passwords import hash_password_sync, verify_and_update_sync
+
+
+class TestVerifyAndUpdate:
+    def test_current_cost_needs_no_update(self):
+        hashed = hash_password_sync("secret", rounds=5)
+        assert verify_and_update_sync("secret", hashed, rounds=5) == (True, None)
+
+    def test_weaker_hash_is_upgraded(self):
+        """
+        Хеш с меньшим числом раундов пересчитывается с текущей стоимостью.
+        """
+        hashed = hash_password_sync("secret", rounds=4)
+        verified, new_hash = verify_and_update_sync("secret", hashed, rounds=5)
+        assert verified
+        assert new_hash.startswith("$2b$05$")
+
+    def test_wrong_password(self):
+        hashed = hash_password_sync("secret", rounds=4)
+        assert verify_and_update_sync("wrong", hashed, rounds=4) == (False, None)
+
+
+class TestRunInPool:
+    def test_sheds_load_when_queue_is_full(self, monkeypatch):
+        monkeypatch.setattr(passwords, "HASH_MAX_PENDING", 0)
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(passwords.hash_password("secret"))
+        assert error.value.status_code == 503
+        assert error.value.headers["Retry-After"] == str(passwords.HASH_RETRY_AFTER)
+
+    def test_pool_processes_are_spawned(self, monkeypatch):
+        monkeypatch.setattr(passwords, "_executor", None)
+        try:
+            assert passwords.get_executor()._mp_context.get_start_method() == "spawn"
+            hashed = asyncio.run(passwords.run_in_pool(hash_password_sync, "secret", 4))
+            assert verify_and_update_sync("secret", hashed, rounds=4) == (True, None)
+        finally:
+            passwords.shutdown_executor()
@@ -0,0 +1,61 @@
+import logging
+from sqlalchemy import create_engine, text
+from src import profiler
+# Хуки профиля вешаются на Engine при импорте src.database
+from src import database  # noqa: F401
+from src.profiler import Profile, current_profile, statement_pattern
+
+
+class TestStatementPattern:
+    def test_collapses_in_lists_and_whitespace(self):
+        assert statement_pattern("SELECT *\n  FROM links WHERE id IN (?, ?, ?)") == \
+            statement_pattern("SELECT * FROM links WHERE id IN (?,?)")
+
+
+class TestProfile:
+    def test_reports_repeated_statements(self):
+        profile = Profile("GET", "/projects/1")
+        for i in range(profiler.N_PLUS_ONE_THRESHOLD):
+            profile.record("SELECT * FROM links WHERE id = ?", 0.001, False)
+        profile.record("SELECT * FROM projects WHERE id = ?", 0.002, False)
+        profile.finish("/projects/{project_id}", 200)
+
+        report = profile.report()
+        assert report["queries"] == profiler.N_PLUS_ONE_THRESHOLD + 1
+        assert [pattern["sql"] for pattern in report["repeated"]] == ["SELECT * FROM links WHERE id = ?"]
+        assert report["other_ms"] == round(report["total_ms"] - report["db_ms"], 3)
+
+    def test_engine_hooks_record_only_profiled_code(self):
+        engine = create_engine("sqlite://")
+        profile = Profile("GET", "/x")
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            token = current_profile.set(profile)
+            try:
+                conn.execute(text("SELECT 2"))
+            finally:
+                current_profile.reset(token)
+        assert [statement["sql"] for statement in profile.statements] == ["SELECT 2"]
+
+    def test_slow_queries_are_logged(self, monkeypatch, caplog):
+        monkeypatch.setattr(profiler, "SLOW_QUERY_THRESHOLD", 0)
+        engine = create_engine("sqlite://")
+        with caplog.at_level(logging.WARNING, logger=profiler.__name__):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 42"))
+        assert any("slow query" in record.message and "SELECT 42" in record.message for record in caplog.records)
+
+
+class TestRequestedMode:
+    @staticmethod
+    def scope(*headers):
+        return {"headers": list(headers)}
+
+    def test_header_needs_configured_token(self, monkeypatch):
+        request = self.scope((b"x-profile", b"stacks"), (b"x-profile-token", b"secret"))
+        assert profiler.requested_mode(request) is None
+
+        monkeypatch.setattr(profiler, "PROFILE_TOKEN", "secret")
+        assert profiler.requested_mode(request) == b"stacks"
+        assert profiler.requested_mode(self.scope((b"x-profile", b"1"))) is None
+        assert profiler.requested_mode(self.scope((b"x-profile", b"1"), (b"x-profile-token", b"other"))) is None
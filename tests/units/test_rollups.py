@@ -0,0 +1,39 @@
+import calendar
+from datetime import datetime, timedelta
+from src.clicks import UNIQUE_DAY_RETENTION, bucket_start, daily_visitors_key, daily_visitors_keys, rollup_rows
+
+
+class TestBucketStart:
+    def test_truncates_to_granularity(self):
+        moment = datetime(2026, 3, 14, 15, 9, 26, 535)
+        assert bucket_start(moment, "minute") == datetime(2026, 3, 14, 15, 9)
+        assert bucket_start(moment, "hour") == datetime(2026, 3, 14, 15)
+        assert bucket_start(moment, "day") == datetime(2026, 3, 14)
+
+
+class TestRollupRows:
+    def test_minutes_are_summed_into_hours_and_days(self):
+        """
+        Две минуты одного часа дают две минутные строки и по одной часовой и суточной.
+        """
+        minute = calendar.timegm(datetime(2026, 3, 14, 15, 9).timetuple()) // 60
+        rows = rollup_rows({minute: {"abc": 2}, minute + 1: {"abc": 3, "xyz": 1}})
+        totals = {(row["short_code"], row["granularity"], row["bucket"]): row["clicks"] for row in rows}
+
+        assert totals[("abc", "minute", datetime(2026, 3, 14, 15, 9))] == 2
+        assert totals[("abc", "minute", datetime(2026, 3, 14, 15, 10))] == 3
+        assert totals[("abc", "hour", datetime(2026, 3, 14, 15))] == 5
+        assert totals[("abc", "day", datetime(2026, 3, 14))] == 5
+        assert totals[("xyz", "day", datetime(2026, 3, 14))] == 1
+        assert len(rows) == 7
+
+
+class TestDailyVisitorsKeys:
+    def test_covers_days_since_creation(self):
+        keys = daily_visitors_keys("abc", datetime.utcnow() - timedelta(days=2, hours=1))
+        assert len(keys) in (3, 4)
+        assert keys[-1] == daily_visitors_key("abc", datetime.utcnow())
+
+    def test_old_links_stop_at_retention(self):
+        keys = daily_visitors_keys("abc", datetime(2000, 1, 1))
+        assert len(keys) == UNIQUE_DAY_RETENTION // 86400 + 1
@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from src import singleflight
+from src.singleflight import SingleFlight, should_refresh_early, observe_recompute
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_load(self):
+        """
+        Одновременные вызовы по одному ключу выполняют загрузку один раз.
+        """
+        group = SingleFlight()
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def run():
+            return await asyncio.gather(*(group.do("key", load) for _ in range(20)))
+
+        assert asyncio.run(run()) == ["value"] * 20
+        assert calls == 1
+        assert len(group) == 0
+
+    def test_exception_is_shared(self):
+        group = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def run():
+            return await asyncio.gather(*(group.do("key", load) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(result, ValueError) for result in results)
+        assert not group.in_flight("key")
+
+
+    def test_cancelled_leader_hands_over_to_follower(self):
+        """
+        Отмена ведущего (клиент отключился) не отменяет ожидавших: загрузку
+        повторяет один из них.
+        """
+        group = SingleFlight()
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "value"
+
+        async def run():
+            leader = asyncio.create_task(group.do("key", load))
+            await asyncio.sleep(0)
+            followers = [asyncio.create_task(group.do("key", load)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await asyncio.gather(*followers)
+
+        assert asyncio.run(run()) == ["value"] * 3
+        assert calls == 2
+        assert not group.in_flight("key")
+
+    def test_cancelled_follower_is_cancelled(self):
+        group = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.05)
+            return "value"
+
+        async def run():
+            leader = asyncio.create_task(group.do("key", load))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(group.do("key", load))
+            await asyncio.sleep(0.01)
+            follower.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await follower
+            return await leader
+
+        assert asyncio.run(run()) == "value"
+
+
+class TestEarlyRefresh:
+    @pytest.fixture(autouse=True)
+    def reset_recompute_times(self):
+        singleflight.recompute_times.clear()
+        yield
+        singleflight.recompute_times.clear()
+
+    def test_no_refresh_without_observations(self):
+        assert not should_refresh_early("redirect:abc", 0.001)
+
+    def test_refresh_probability_grows_near_expiry(self):
+        observe_recompute("redirect:abc", 0.05)
+        near = sum(should_refresh_early("redirect:abc", 0.01) for _ in range(1000))
+        far = sum(should_refresh_early("redirect:abc", 60) for _ in range(1000))
+        assert near > 700
+        assert far == 0
+
+    def test_recompute_time_is_smoothed(self):
+        observe_recompute("stats:a", 1.0)
+        observe_recompute("stats:b", 0.0)
+        assert singleflight.recompute_times["stats"] == pytest.approx(0.8)
@@ -1,6 +1,7 @@
+import hashlib
 import pytest
 from datetime import datetime, timedelta
-from src.utils import generate_short_code, handle_expiration
+from src.utils import generate_short_code, handle_expiration, normalize_url, url_hash
 
 class TestGenerateShortCode:
     def test_generate_short_code_length(self):
@@ -35,3 +36,52 @@ class TestHandleExpiration:
         expires_at = now + timedelta(minutes=expires_in_minutes)
         result = handle_expiration(expires_at)
         assert result == expires_at, "handle_expiration должна возвращать исходную дату"
+
+
+class TestNormalizeUrl:
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "https://example.com",
+            "HTTPS://Example.COM/",
+            "https://example.com:443/",
+            "https://example.com/#section",
+        ]
+    )
+    def test_equivalent_urls_normalize_the_same(self, url):
+        assert normalize_url(url) == "https://example.com/"
+        assert url_hash(url) == url_hash("https://example.com/")
+
+    @pytest.mark.parametrize("url", ["http://a.com:99999/", "http://[::1", " http://a.com:port/ "])
+    def test_unparseable_url_is_kept_as_is(self, url):
+        assert normalize_url(url) == url.strip()
+        assert url_hash(url) == hashlib.sha256(url.strip().encode()).hexdigest()
+
+    def test_path_and_query_are_kept(self):
+        assert normalize_url("http://example.com:8080/Path?q=1") == "http://example.com:8080/Path?q=1"
+        assert url_hash("https://example.com/a") != url_hash("https://example.com/b")
+
+    def test_ipv6_host_keeps_brackets(self):
+        assert normalize_url("http://[::1]:8080/") == "http://[::1]:8080/"
+        assert normalize_url("HTTP://[FE80::1]:80/a") == "http://[fe80::1]/a"
+        assert normalize_url("http://[::1:8080]/") == "http://[::1:8080]/"
+        assert url_hash("http://[::1]:8080/") != url_hash("http://[::1:8080]/")
+
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "https://example.com",
+            "https://example.com/a/b?q=1&r=2",
+            "https://example.com/a?",
+            "https://example.com/a?b?",
+            "http://sub.example.com/%20x;p=1",
+            "https://example.com//double",
+            "https://Example.com/a",
+            "https://user@example.com/a",
+            "https://example.com:443/a",
+            "https://example.com/a\tb",
+            " https://example.com/a ",
+        ]
+    )
+    def test_url_hash_fast_path_matches_normalize(self, url):
+        assert url_hash(url) == hashlib.sha256(normalize_url(url).encode()).hexdigest()